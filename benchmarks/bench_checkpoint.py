@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Save and restore time of a checkpoint of a plant with about 100k values.
+
+    python benchmarks/bench_checkpoint.py
+"""
+import os
+import tempfile
+import timeit
+
+from plant import build_plant, count_values
+from iomodel.common.checkpoint import Checkpoint
+
+
+if __name__ == "__main__":
+
+    plant = build_plant(3, 900)
+    plant.loop(0.1)
+    checkpoint = Checkpoint(plant)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plant.chk")
+
+        save = min(timeit.repeat(lambda: checkpoint.save(path), number = 1, repeat = 5))
+        restore = min(timeit.repeat(lambda: checkpoint.restore(path), number = 1, repeat = 5))
+
+        print("values: {}  file: {} kB  save: {:.1f} ms  restore: {:.1f} ms".format(
+            count_values(plant), os.path.getsize(path) // 1024, save * 1000, restore * 1000))
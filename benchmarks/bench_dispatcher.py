@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Fires per second of Dispatcher.fire with 0, 1 and 10 listeners, and of a
+value change of a ModelValue with the same number of value changed
+listeners (callback, source) and change listeners (source, old, new).
+
+    python benchmarks/bench_dispatcher.py
+"""
+import timeit
+
+import plant  # noqa: F401, sets the import path
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant
+from iomodel.common.util_callback import Dispatcher, CallbackValueChanged
+
+
+def listener(event, source):
+    pass
+
+
+def change_listener(source, old_value, new_value):
+    pass
+
+
+def rate(function, number = 200000):
+    return number / min(timeit.repeat(function, number = number, repeat = 5))
+
+
+if __name__ == "__main__":
+    event = CallbackValueChanged(0, 1)
+
+    for count in (0, 1, 10):
+        dispatcher = Dispatcher()
+        for _ in range(count):
+            dispatcher.add_listener("value_changed", listener)
+
+        value = Variant("Value", ModelDevice("Device"), 0, ValueDataType.Int)
+        direct = Variant("Direct", ModelDevice("Device"), 0, ValueDataType.Int)
+        for _ in range(count):
+            value.add_value_changed_listener(listener)
+            direct.add_change_listener(change_listener)
+
+        def toggle(model_value):
+            return lambda: setattr(model_value, "value", model_value.value ^ 1)
+
+        print("listeners: {:3d}  fire: {:6.2f} M/s  value change: {:6.2f} M/s  direct: {:6.2f} M/s".format(
+            count, rate(lambda: dispatcher.fire("value_changed", event, None)) / 1e6,
+            rate(toggle(value)) / 1e6, rate(toggle(direct)) / 1e6))
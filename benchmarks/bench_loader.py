@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Startup time of a plant of 10k conveyors loaded from a JSON spec: first
+start compiling the spec, repeated start from the cached compiled form,
+and the same plant built by Python code.
+
+    python benchmarks/bench_loader.py
+"""
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import plant
+from iomodel.common.loader import ModelLoader
+
+
+def conveyor_spec():
+    return [{"name": name, "class": spec.cls.__name__} for name, spec in zip(plant.CONVEYOR.names, plant.CONVEYOR._specs)]
+
+
+def flat_spec(areas, conveyors):
+    """
+    Spec without templates, every value is a node of its own
+    """
+    return {
+        "model": {"name": "Plant", "children": [
+            {"name": str(a + 1) + "_A" + str(a + 1), "children": [
+                {"name": str(c) + "/" + entry["name"], "class": entry["class"]}
+                for c in range(conveyors) for entry in conveyor_spec()]}
+            for a in range(areas)]}
+    }
+
+
+def plant_spec(areas, conveyors):
+    return {
+        "templates": {"Conveyor": conveyor_spec()},
+        "model": {"name": "Plant", "children": [
+            {"name": str(a + 1) + "_A" + str(a + 1), "children": [
+                {"name": "ReferenceDesignation", "initial": "S1-A" + str(a + 1), "datatype": "String"},
+                {"name": "Type", "initial": "Area", "datatype": "String"},
+                {"template": "Conveyor", "prefixes": [str(c) + "/" for c in range(conveyors)]}]}
+            for a in range(areas)]}
+    }
+
+
+def timed(function):
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    loader = ModelLoader()
+
+    try:
+        for name, spec in (("templates", plant_spec(10, 1000)), ("flat", flat_spec(2, 1000))):
+            path = os.path.join(directory, name + ".json")
+            with open(path, "w") as f:
+                json.dump(spec, f)
+
+            compiled, first = timed(lambda: loader.compile_file(path))
+            _, cached = timed(lambda: loader.compile_file(path))
+            model, build = timed(lambda: compiled.build())
+
+            print("{:<10} values: {:7d}  compile: {:7.3f} s  cached: {:7.3f} s  build: {:7.3f} s".format(
+                name, plant.count_values(model), first, cached, build))
+            del model
+
+        _, python = timed(lambda: plant.build_plant(10, 1000))
+        print("python code, 10 areas: {:7.3f} s".format(python))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Tick cost of ModelDevice.loop with a recursive walk of all children
+compared to the compiled loop schedule.
+
+    python benchmarks/bench_loop_schedule.py
+"""
+import timeit
+
+from plant import build_plant, count_values
+from iomodel.common.base import ModelDevice
+
+
+def recursive_loop(self, tick):
+    for child in self._children:
+        child.loop(tick)
+
+
+def measure(plant, repeat = 200):
+    return min(timeit.repeat(lambda: plant.loop(0.1), number = 1, repeat = repeat))
+
+
+if __name__ == "__main__":
+
+    for conveyors in (10, 100, 1000):
+        plant = build_plant(3, conveyors)
+
+        compiled_loop = ModelDevice.loop
+        ModelDevice.loop = recursive_loop
+        before = measure(plant)
+        ModelDevice.loop = compiled_loop
+        after = measure(plant)
+
+        print("values: {:7d}  recursive: {:8.3f} ms  compiled: {:8.3f} ms  speedup: {:5.1f}x".format(
+            count_values(plant), before * 1000, after * 1000, before / after))
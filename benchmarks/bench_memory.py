@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Memory per data point of the component classes, measured with tracemalloc.
+The name of each value is part of the measurement.
+
+    python benchmarks/bench_memory.py
+"""
+import gc
+import tracemalloc
+
+import plant
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Command, CommandToggle, CommandTap, Switch, Variant, \
+    VariantDataSet, VariantDataMap, LevelSensor, TemperatureSensor, TemperatureSensorBA
+
+
+COMPONENTS = [
+    ("Variant", lambda name, parent: Variant(name, parent, 0, ValueDataType.Int)),
+    ("Switch", lambda name, parent: Switch(name, parent, False, False)),
+    ("Command", lambda name, parent: Command(name, parent)),
+    ("CommandToggle", lambda name, parent: CommandToggle(name, parent)),
+    ("CommandTap", lambda name, parent: CommandTap(name, parent)),
+    ("LevelSensor", lambda name, parent: LevelSensor(name, parent)),
+    ("TemperatureSensor", lambda name, parent: TemperatureSensor(name, parent)),
+    ("TemperatureSensorBA", lambda name, parent: TemperatureSensorBA(name, parent)),
+    ("VariantDataSet", lambda name, parent: VariantDataSet(name, parent)),
+    ("VariantDataMap", lambda name, parent: VariantDataMap(name, parent)),
+]
+
+
+def measure(build):
+    """
+    Return: model built by build and its size in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    model = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return model, after - before
+
+
+def build_component(factory, count):
+    device = ModelDevice("Device")
+    for i in range(count):
+        factory("Conv" + str(i) + "/Drive/Value", device)
+    return device
+
+
+if __name__ == "__main__":
+    count = 20000
+
+    for name, factory in COMPONENTS:
+        model, size = measure(lambda: build_component(factory, count))
+        print("{:<20} {:8.0f} bytes per value".format(name, size / count))
+        del model
+
+    model, size = measure(lambda: plant.build_plant(3, 600))
+    values = plant.count_values(model)
+    print("{:<20} {:8.0f} bytes per value ({} values, {:.1f} MB)".format("Plant", size / values, values, size / 1e6))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Tick cost of a plant depending on the fraction of moving conveyors.
+Idle conveyors sleep and are skipped by the schedule of their area.
+
+    python benchmarks/bench_sleep.py
+"""
+import timeit
+
+from plant import build_plant, count_values
+
+
+def measure(plant, repeat = 200):
+    plant.loop(0.1)
+    return min(timeit.repeat(lambda: plant.loop(0.1), number = 1, repeat = repeat))
+
+
+if __name__ == "__main__":
+
+    for active in (1.0, 0.1, 0.01):
+        plant = build_plant(3, 1000, active = active)
+        duration = measure(plant)
+
+        print("values: {:7d}  active: {:5.1f} %  tick: {:8.3f} ms".format(
+            count_values(plant), active * 100, duration * 1000))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Construction time and memory of 10k conveyors, built value by value,
+stamped from a DeviceTemplate and as lazy instances of the template.
+The lazy instances are also measured after a first tick, which creates
+the values looped or used by the conveyors.
+
+    python benchmarks/bench_template.py
+"""
+import gc
+import time
+
+import plant
+from bench_memory import measure
+
+
+def build(template):
+    return plant.build_plant(10, 1000, template = template)
+
+
+if __name__ == "__main__":
+
+    for template in (False, True, "lazy"):
+        # not timing the collection of the previous model
+        gc.collect()
+        start = time.perf_counter()
+        model = build(template)
+        duration = time.perf_counter() - start
+        del model
+
+        model, size = measure(lambda: build(template))
+        _, ticked = measure(lambda: model.loop(0.1))
+        values = plant.count_values(model)
+        del model
+
+        print("template: {:<5}  values: {:7d}  build: {:7.3f} s  {:6.2f} us/value  memory: {:6.1f} MB  {:4.0f} bytes/value  after tick: {:4.0f} bytes/value".format(
+            str(template), values, duration, duration / values * 1e6, size / 1e6, size / values, (size + ticked) / values))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic plant for benchmarks.
+
+Mirrors the structure of examples/smart_delivery.py: areas own the data
+points of their conveyors, the conveyors themselves are plain objects
+looped by the area.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ValueDataType, Sleepable, SleepSchedule
+from iomodel.common.components import Variant, Switch, CommandToggle, CommandTap, VariantDataMap
+from iomodel.common.template import DeviceTemplate
+
+
+def _conveyor_template():
+    template = DeviceTemplate("Conveyor")
+
+    for prefix in ("", "Drive/"):
+        template.add(Variant, prefix + "ErrorSource", "", ValueDataType.String)
+        template.add(Variant, prefix + "ErrorActive", False, ValueDataType.Boolean)
+        template.add(Variant, prefix + "ErrorMessage", "", ValueDataType.String)
+        template.add(Variant, prefix + "ChildErrorActive", False, ValueDataType.Boolean)
+        template.add(VariantDataMap, prefix + "ChildErrors", [("Reference Designation", ValueDataType.String), ("Error MSG", ValueDataType.String)])
+        template.add(Variant, prefix + "ReferenceDesignation", "", ValueDataType.String)
+        template.add(Variant, prefix + "Type", "Conveyor", ValueDataType.String)
+
+    template.add(CommandToggle, "Cmd_Interrupt_Toggle", False)
+    template.add(Variant, "Length", 1000, ValueDataType.Int)
+    template.add(Variant, "BoxPosition", 0.0, ValueDataType.Float)
+    template.add(Variant, "BoxId", "", ValueDataType.String)
+    for signal in ("Occupied", "TransportAllowed", "ReadyHandover", "ReadyTakeover", "Photoeye"):
+        template.add(Switch, signal, False, False)
+    template.add(Variant, "SourceName", "", ValueDataType.String)
+    template.add(Variant, "TargetName", "", ValueDataType.String)
+    template.add(CommandTap, "Cmd_ResetError_Tap", False)
+
+    template.add(CommandToggle, "Drive/Cmd_ManualOn_Toggle", False)
+    template.add(Switch, "Drive/ManualMode", False, False)
+    template.add(Switch, "Drive/DriveOn", False, False)
+    template.add(Variant, "Drive/CurrentSpeed", 0, ValueDataType.Int)
+    template.add(Variant, "Drive/SetpointSpeed", 200, ValueDataType.Int)
+    template.add(Variant, "Drive/Current", 0.0, ValueDataType.Float)
+    template.add(Variant, "Drive/Encoder", 0.0, ValueDataType.Float)
+
+    template.add(CommandToggle, "Sim/AutoClear_Toggle", False)
+    template.add(CommandTap, "Sim/AddBox_Tap", False)
+    template.add(CommandTap, "Sim/DriveErrorTap", False)
+    template.add(CommandTap, "Sim/JamErrorTap", False)
+    return template
+
+
+CONVEYOR = _conveyor_template()
+
+REFERENCE_DESIGNATIONS = (CONVEYOR.position("ReferenceDesignation"), CONVEYOR.position("Drive/ReferenceDesignation"))
+INTERRUPT = CONVEYOR.position("Cmd_Interrupt_Toggle")
+BOX_POSITION = CONVEYOR.position("BoxPosition")
+SPEED = CONVEYOR.position("Drive/CurrentSpeed")
+CURRENT = CONVEYOR.position("Drive/Current")
+ENCODER = CONVEYOR.position("Drive/Encoder")
+
+
+class Conveyor(Sleepable):
+
+    def __init__(self, name, area, active = True, template = False):
+        self._active = active
+        self._device = None
+
+        if template == "lazy":
+            # the values are created by the first loop
+            designation = "S1-A1-" + name
+            self._device = CONVEYOR.instantiate(name, area, lazy = True,
+                                                initials = {position: designation for position in REFERENCE_DESIGNATIONS})
+            return
+
+        if template:
+            values = CONVEYOR.stamp(area, name + "/")
+            for position in REFERENCE_DESIGNATIONS:
+                values[position].set_value_silent("S1-A1-" + name)
+            self._bind(values.__getitem__)
+            return
+
+        for prefix in ("", "Drive/"):
+            Variant(name + "/" + prefix + "ErrorSource", area, "", ValueDataType.String)
+            Variant(name + "/" + prefix + "ErrorActive", area, False, ValueDataType.Boolean)
+            Variant(name + "/" + prefix + "ErrorMessage", area, "", ValueDataType.String)
+            Variant(name + "/" + prefix + "ChildErrorActive", area, False, ValueDataType.Boolean)
+            VariantDataMap(name + "/" + prefix + "ChildErrors", area, [("Reference Designation", ValueDataType.String), ("Error MSG", ValueDataType.String)])
+            Variant(name + "/" + prefix + "ReferenceDesignation", area, "S1-A1-" + name, ValueDataType.String)
+            Variant(name + "/" + prefix + "Type", area, "Conveyor", ValueDataType.String)
+
+        self._interrupt = CommandToggle(name + "/Cmd_Interrupt_Toggle", area, False)
+        Variant(name + "/Length", area, 1000, ValueDataType.Int)
+        self._box_position = Variant(name + "/BoxPosition", area, 0.0, ValueDataType.Float)
+        Variant(name + "/BoxId", area, "", ValueDataType.String)
+        for signal in ("Occupied", "TransportAllowed", "ReadyHandover", "ReadyTakeover", "Photoeye"):
+            Switch(name + "/" + signal, area, False, False)
+        Variant(name + "/SourceName", area, "", ValueDataType.String)
+        Variant(name + "/TargetName", area, "", ValueDataType.String)
+        CommandTap(name + "/Cmd_ResetError_Tap", area, False)
+
+        CommandToggle(name + "/Drive/Cmd_ManualOn_Toggle", area, False)
+        Switch(name + "/Drive/ManualMode", area, False, False)
+        Switch(name + "/Drive/DriveOn", area, False, False)
+        self._speed = Variant(name + "/Drive/CurrentSpeed", area, 0, ValueDataType.Int)
+        Variant(name + "/Drive/SetpointSpeed", area, 200, ValueDataType.Int)
+        self._current = Variant(name + "/Drive/Current", area, 0.0, ValueDataType.Float)
+        self._encoder = Variant(name + "/Drive/Encoder", area, 0.0, ValueDataType.Float)
+
+        CommandToggle(name + "/Sim/AutoClear_Toggle", area, False)
+        CommandTap(name + "/Sim/AddBox_Tap", area, False)
+        CommandTap(name + "/Sim/DriveErrorTap", area, False)
+        CommandTap(name + "/Sim/JamErrorTap", area, False)
+
+    def _bind(self, value):
+        self._interrupt = value(INTERRUPT)
+        self._box_position = value(BOX_POSITION)
+        self._speed = value(SPEED)
+        self._current = value(CURRENT)
+        self._encoder = value(ENCODER)
+
+    def loop(self, tick):
+        if self._device is not None:
+            self._bind(self._device.value)
+            self._device = None
+
+        if not self._active:
+            self.sleep(self._interrupt)
+            return
+
+        self._speed.value = 200
+        self._current.value = 3.5
+        self._encoder.value = self._encoder.value + 200 * tick
+        self._box_position.value = (self._box_position.value + 200 * tick) % 1000
+
+
+class Area(ModelDevice):
+
+    def __init__(self, name, parent, conveyors, active = 1.0, template = False):
+        super().__init__(name, parent)
+        Variant("ReferenceDesignation", self, "S1-" + name, ValueDataType.String)
+        Variant("Type", self, "Area", ValueDataType.String)
+        self._conveyors = [Conveyor(str(i), self, i < conveyors * active, template) for i in range(conveyors)]
+        self._conveyor_schedule = SleepSchedule(self._conveyors)
+
+    def loop(self, tick):
+        super().loop(tick)
+
+        self._conveyor_schedule.loop(tick)
+
+
+def build_plant(areas = 3, conveyors = 100, name = "Plant", active = 1.0, template = False):
+    """
+    Build a plant of areas with conveyors. Only the given fraction of
+    conveyors of each area is moving, the others are idle and sleep.
+    With template the values of the conveyors are stamped from CONVEYOR,
+    with template "lazy" every conveyor is a lazy instance of CONVEYOR.
+
+    """
+    plant = ModelDevice(name)
+    for i in range(areas):
+        Area(str(i + 1) + "_A" + str(i + 1), plant, conveyors, active, template)
+    return plant
+
+
+def count_values(device):
+    count = 0
+    for child in device.children:
+        if isinstance(child, ModelDevice):
+            count += count_values(child)
+        else:
+            count += 1
+    return count
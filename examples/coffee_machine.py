@@ -12,8 +12,8 @@ from iomodel.common.base import ModelDevice, ValueDataType
 from iomodel.common.components import Switch, TemperatureSensor, ModelValue, LevelSensor, CommandTap, Variant
 from iomodel.sparkplug.connector import NodeConnector
 from iomodel.common.runner import ModelRunner
+from iomodel.common.clock import SimulationClock, get_default_clock
 from enum import Enum
-from timeit import default_timer as timer
 
 
 __version__ = "1.1.2"
@@ -38,9 +38,11 @@ class CoffeeMachine(ModelDevice):
     """
     COFFEE_COUNTER = 0
 
-    def __init__(self, name, parent = None):
+    def __init__(self, name, parent = None, clock = None):
         super().__init__(name, parent)
         
+        self._clock = clock if clock is not None else get_default_clock()
+        
         # states
         self._state_on = Variant("1_State/SwitchedOn", self, False, ValueDataType.Boolean)
         
@@ -92,7 +94,7 @@ class CoffeeMachine(ModelDevice):
         
         self._state = OperationState.Off
         
-        self._t = timer()
+        self._t = self._clock.monotonic()
         
         PaymentSystem("20_PaymentSystem", self)
     
@@ -151,7 +153,7 @@ class CoffeeMachine(ModelDevice):
     def clean(self, value):
         if self._state == OperationState.ServiceRequired or self._state == OperationState.Ready:
             self._state = OperationState.Cleaning
-            self._t =  timer()
+            self._t =  self._clock.monotonic()
         
     def order(self, value):
         if self._state == OperationState.Ready:
@@ -195,18 +197,18 @@ class CoffeeMachine(ModelDevice):
         if self._state == OperationState.HeatUp_Grind:
             if self._temp.value > 80:
                 self._state = OperationState.Output
-                self._t =  timer()
+                self._t =  self._clock.monotonic()
         
         # cleaning
         if self._state == OperationState.Cleaning:
             
-            if timer() - self._t >= self._param_time_cleaning.value:
+            if self._clock.monotonic() - self._t >= self._param_time_cleaning.value:
                 self._state = OperationState.ServiceRequired
         
         # output
         if self._state == OperationState.Output:
             
-            if timer() - self._t >= self._param_time_coffee.value:
+            if self._clock.monotonic() - self._t >= self._param_time_coffee.value:
                 self._order_end()
                 self._state = OperationState.ServiceRequired
         
@@ -233,13 +235,14 @@ if __name__ == "__main__":
     print(" ")
     print("#####################################################")
     
-    options, args = getopt.getopt(sys.argv[1:], "g:h:p:l:n:",
-                               ["group =","host =","port =", "node =", "log ="])
+    options, args = getopt.getopt(sys.argv[1:], "g:h:p:l:n:s:",
+                               ["group =","host =","port =", "node =", "log =", "scale ="])
     
     group = "CoffeeMaker"
     node = "DefaultNode"
     host = "127.0.0.1"
     port = 1883
+    time_scale = 1.0
     log_level = logging.WARN
     
     for name, value in options:
@@ -255,6 +258,8 @@ if __name__ == "__main__":
             print(value)
             if value.lower() == 'true':
                 log_level = logging.DEBUG
+        elif name in ['-s', '--scale']:
+            time_scale = float(value)
             
     # Setup logger
     logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', 
@@ -264,14 +269,15 @@ if __name__ == "__main__":
     #logger.setLevel(logging.DEBUG)
     
     # Setup Model
-    runner = ModelRunner(1)
+    clock = SimulationClock(time_scale)
+    runner = ModelRunner(1, clock = clock)
     
-    coffee = CoffeeMachine(node)
+    coffee = CoffeeMachine(node, clock = clock)
     runner.add_model_object(coffee)
     
     # Setup Sparkplug connection
     broker_args = (host, port, 60)
-    coffeeNode = NodeConnector(coffee, group, broker_args, node)
+    coffeeNode = NodeConnector(coffee, group, broker_args, node, clock)
     coffeeNode.start_loop()
 
     try:
@@ -10,10 +10,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 import getopt
 import logging
 
-from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.base import ModelDevice, ValueDataType, Sleepable, SleepSchedule
 from iomodel.common.components import Switch, CommandToggle, CommandTap, Variant, VariantDataMap, TemperatureSensorBA
 from iomodel.sparkplug.connector import NodeConnector
 from iomodel.common.runner import ModelRunner
+from iomodel.common.clock import SimulationClock
+from iomodel.common.checkpoint import Checkpoint
 
 
 __version__ = "3.0.0"
@@ -77,6 +79,13 @@ class BoxManager:
     def boxes(self):
         return self._boxes
 
+    def get_state(self):
+        return (self._boxes, self._index)
+
+    def set_state(self, state):
+        self._boxes, self._index = state
+        self._number_of_boxes = len(self._boxes)
+
 
 
 box_manager = BoxManager(30)
@@ -104,6 +113,15 @@ class Plant(ModelDevice):
     def loop(self, tick):
         super().loop(tick)
 
+    def register_checkpoint(self, checkpoint):
+        """
+        Register the state outside of the values, e.g. the boxes in
+        transit, for a warm restart from a checkpoint
+
+        """
+        checkpoint.register("BoxManager", box_manager)
+        self._area2_logistics.register_checkpoint(checkpoint)
+
 class ErrorHandler:
     """
     ErrorHandler 
@@ -188,6 +206,10 @@ class ErrorHandler:
     def error_pending(self):
         return self._error_active.value
     
+    @property
+    def error_signal(self):
+        return self._error_active
+    
     def link_to_parent(self, parent_error_handler):
         """
         Link a parent error handler
@@ -317,6 +339,7 @@ class Area(ModelDevice):
         self._type = Variant("Type", self, "Area", ValueDataType.String)
  
         self._conv_list = []
+        self._conv_schedule = SleepSchedule()
 
         self._area_on = CommandToggle("Cmd_AreaOn_Toggle", self, False, lambda v: self._area_state_changed(v) )
         self._auto = CommandToggle("Cmd_ModeAuto_Toggle", self, True, lambda v: self._area_state_changed(v))
@@ -355,12 +378,28 @@ class Area(ModelDevice):
     def add_conveyor(self, *args):
         for a in args:
             self._conv_list.append(a)
+            self._conv_schedule.add(a)
+
+    def register_checkpoint(self, checkpoint):
+        """
+        Register the conveyors, including the conveyors of the lifts
+
+        """
+        for c in self._conv_list:
+            conveyor = c.conveyor if isinstance(c, Lift) else c
+            checkpoint.register(self.qualified_name + "/" + conveyor.name, conveyor)
+    
+    @property
+    def wake_signals(self):
+        """
+        Return: values waking sleeping conveyors of this area
+        """
+        return (self._area_on, self._auto)
         
     def loop(self, tick):
         super().loop(tick)
         
-        for c in self._conv_list:
-            c.loop(tick)
+        self._conv_schedule.loop(tick)
 
 
 # Area Definitions
@@ -559,7 +598,7 @@ class Lift:
         return True
 
              
-class Conveyor:
+class Conveyor(Sleepable):
         
     def __init__(self, name, reference_designation, area = None, length = 1000, speed = 200):
         
@@ -649,6 +688,13 @@ class Conveyor:
     
     def sim_jam_error(self):
         self._error_handler.set_error("Jam", self._reference_designation.value)
+
+    def get_state(self):
+        return (self._counter, self._auto_add_boxes_current, self.transport_handler.get_state())
+
+    def set_state(self, state):
+        self._counter, self._auto_add_boxes_current, transport = state
+        self.transport_handler.set_state(transport)
         
     def set_source(self, source):
         self.set_adjacent(source, self._target)
@@ -666,6 +712,7 @@ class Conveyor:
         if ((self._source != source) or
             (self._target != target)):
             self.transport_handler.clear_links()
+        self.wake()
     
     def _on_request_target(self):
         if self.target:
@@ -692,7 +739,8 @@ class Conveyor:
             pass
     
     def loop(self, tick):
-
+        # the signals are only up to date after one complete idle loop
+        was_idle = self.idle
 
         if self._auto_add_boxes.value and not self.transport_handler.box:
             self._auto_add_boxes_current += tick
@@ -718,6 +766,49 @@ class Conveyor:
                 if elapsed:
                     self._counter = 0
                     self.transport_handler.remove_box()
+        
+        if was_idle and self.idle:
+            self.sleep(*self._wake_signals())
+    
+    def _sources(self):
+        if isinstance(self.source, list):
+            return self.source
+        if self.source:
+            return [self.source]
+        return []
+    
+    @property
+    def idle(self):
+        """
+        No box to transport, no box to take over and no timer running.
+        A loop of an idle conveyor does not change any value.
+
+        """
+        if self.transport_handler.box or self._auto_add_boxes.value:
+            return False
+        
+        if not self._drive.idle:
+            return False
+        
+        for s in self._sources():
+            if s.transport_handler.ready_handover:
+                return False
+        
+        return True
+    
+    def _wake_signals(self):
+        """
+        Values changing the result of the next loop of an idle conveyor
+        
+        """
+        signals = [self.transport_handler.occupied_signal, self.transport_handler.box_position_signal, self._auto_add_boxes,
+                   self._drive.manual_on_signal, self._error_handler.error_signal]
+        signals.extend(self._area.wake_signals)
+        
+        for s in self._sources():
+            signals.append(s.transport_handler.ready_handover_signal)
+            
+        return signals
   
     
     @property
@@ -771,6 +862,14 @@ class Drive:
     @property
     def current_speed(self):
         return self._drive_speed.value
+    
+    @property
+    def idle(self):
+        return not self._drive_on.value and not self._manual_on.value
+    
+    @property
+    def manual_on_signal(self):
+        return self._manual_on
 
     @property
     def manual_mode(self):
@@ -922,6 +1021,16 @@ class TransportHandler:
     @property
     def parent_name(self):
         return self._parent_name
+
+    def get_state(self):
+        return (self._box, self._run_drive)
+
+    def set_state(self, state):
+        self._box, self._run_drive = state
+
+        # the links are requested again by the next loop
+        self._source = None
+        self._target = None
    
     @property
     def box(self):
@@ -946,6 +1055,18 @@ class TransportHandler:
     @occupied.setter
     def occupied(self, value):
         self._occupied.value = value
+    
+    @property
+    def box_position_signal(self):
+        return self._box_position
+    
+    @property
+    def occupied_signal(self):
+        return self._occupied
+    
+    @property
+    def ready_handover_signal(self):
+        return self._ready_handover
 
     @property
     def length(self):
@@ -1167,13 +1288,15 @@ if __name__ == "__main__":
     print(" ")
     print("#####################################################")
     
-    options, args = getopt.getopt(sys.argv[1:], "g:h:p:n:l:",
-                               ["group =","host =","port =", "node =", "log ="])
+    options, args = getopt.getopt(sys.argv[1:], "g:h:p:n:l:s:c:",
+                               ["group =","host =","port =", "node =", "log =", "scale =", "checkpoint ="])
     
     group = "CaseStudy"
     node = "DefaultPlant"
     host = "127.0.0.1"
     port = 1883
+    time_scale = 1.0
+    checkpoint_path = None
     log_level = logging.WARN
     
     for name, value in options:
@@ -1187,6 +1310,10 @@ if __name__ == "__main__":
             port = int(value)
         elif name in ['-l', '--log']:
             log_level = logging.DEBUG
+        elif name in ['-s', '--scale']:
+            time_scale = float(value)
+        elif name in ['-c', '--checkpoint']:
+            checkpoint_path = value
             
     # Setup logger
     logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', 
@@ -1196,14 +1323,23 @@ if __name__ == "__main__":
     logger.setLevel(logging.DEBUG)
     
     # Setup Model
-    runner = ModelRunner(1)
+    clock = SimulationClock(time_scale)
+    runner = ModelRunner(1, clock = clock)
     
     plant = Plant(node)
     runner.add_model_object(plant)
     
+    # Warm restart from the state saved on the last exit
+    if checkpoint_path:
+        checkpoint = Checkpoint(plant)
+        plant.register_checkpoint(checkpoint)
+        
+        if os.path.exists(checkpoint_path):
+            checkpoint.restore(checkpoint_path)
+    
     # Setup Sparkplug connection
     broker_args = (host, port, 60)
-    plantNode = NodeConnector(plant, group, broker_args, node)
+    plantNode = NodeConnector(plant, group, broker_args, node, clock)
     plantNode.start_loop()
 
     try:
@@ -1211,4 +1347,7 @@ if __name__ == "__main__":
     except (KeyboardInterrupt, SystemExit):
         
         plantNode.stop_loop()
+        
+        if checkpoint_path:
+            checkpoint.save(checkpoint_path)
         print("Application stopped")
\ No newline at end of file
@@ -1,5 +1,8 @@
+import threading
 from enum import Enum
+from bisect import bisect_left, bisect_right
 from iomodel.common.util_callback import Dispatcher, CallbackValueChanged
+from iomodel.common.profiling import active_profiler
 
     
     
@@ -18,32 +21,286 @@ class ValueDataType(Enum):
     DataSet = 9
 
 
-class ModelObject:
+class _SleepState:
+    __slots__ = ("sleeping", "wake_on", "registered", "schedules")
+
+    def __init__(self):
+        self.sleeping = False
+        self.wake_on = ()
+        # sources with a wake listener, usually one or two
+        self.registered = ()
+        self.schedules = ()
+
+
+class Sleepable:
+    """
+    Mixin for loop objects which can declare themselves idle.
+
+    A sleeping object is skipped by every SleepSchedule containing it, until
+    one of the values or events it named in sleep fires, or wake is called.
+    """
+    __slots__ = ()
+
+    # created on first use, most values are never scheduled
+    _sleep = None
+
+    def _sleep_state(self):
+        state = getattr(self, "_sleep", None)
+        if state is None:
+            state = _SleepState()
+            self._sleep = state
+        return state
+
+    @property
+    def sleeping(self):
+        state = getattr(self, "_sleep", None)
+        return state is not None and state.sleeping
+
+    def sleep(self, *wake_on):
+        """
+        Stop looping this object until it is woken up
+
+        Parameters
+        ----------
+        wake_on : ModelValue or tuple
+                Values waking the object when they change, or tuples of
+                (dispatcher, event_name) waking the object when the event
+                is fired.
+
+        """
+        state = self._sleep_state()
+
+        for source in wake_on:
+            if source not in state.registered:
+                state.registered = state.registered + (source,)
+                if isinstance(source, tuple):
+                    source[0].add_listener(source[1], lambda callback, event_source, key = source: self._wake_event(key))
+                else:
+                    source.add_change_listener(lambda event_source, old_value, new_value, key = source: self._wake_event(key))
+
+        state.wake_on = frozenset(wake_on)
+
+        if state.sleeping:
+            return
+
+        state.sleeping = True
+        for schedule in state.schedules:
+            schedule._remove(self)
+
+    def wake(self):
+        state = getattr(self, "_sleep", None)
+        if state is None or not state.sleeping:
+            return
+
+        state.sleeping = False
+        state.wake_on = ()
+        for schedule in state.schedules:
+            schedule._insert(self)
+
+    def _wake_event(self, source):
+        state = self._sleep
+        if state.sleeping and source in state.wake_on:
+            self.wake()
+
+    def _attach_schedule(self, schedule):
+        state = self._sleep_state()
+        state.schedules = state.schedules + (schedule,)
+
+    def _detach_schedule(self, schedule):
+        state = self._sleep_state()
+        state.schedules = tuple(s for s in state.schedules if s is not schedule)
+
+
+class SleepSchedule:
+    """
+    Loop objects in a fixed order and skip the sleeping ones.
+
+    Only the awake objects are visited, so the cost of a loop depends on
+    the activity of the model instead of its size. Objects woken during a
+    loop are still looped in the same tick, if their turn did not pass.
+    """
+    def __init__(self, objects = ()):
+        self._order = {}
+        self._keys = []
+        self._awake = []
+        self._changes = 0
+
+        for obj in objects:
+            self.add(obj)
+
+    @property
+    def objects(self):
+        return list(self._order)
+
+    @property
+    def awake(self):
+        """
+        Return: list of the awake objects
+        """
+        return list(self._awake)
+
+    def add(self, obj):
+        if obj in self._order:
+            return
+
+        self._order[obj] = len(self._order)
+
+        if isinstance(obj, Sleepable):
+            obj._attach_schedule(self)
+            if obj.sleeping:
+                return
+
+        self._insert(obj)
+
+    def detach(self):
+        """
+        Release all objects, e.g. when the schedule is rebuilt
+
+        """
+        for obj in self._order:
+            if isinstance(obj, Sleepable):
+                obj._detach_schedule(self)
+
+    def _insert(self, obj):
+        key = self._order[obj]
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._awake.insert(index, obj)
+        self._changes += 1
+
+    def _remove(self, obj):
+        index = bisect_left(self._keys, self._order[obj])
+        del self._keys[index]
+        del self._awake[index]
+        self._changes += 1
+
+    def loop(self, tick, profiler = None):
+        keys = self._keys
+        awake = self._awake
+        index = 0
+
+        while index < len(awake):
+            key = keys[index]
+            changes = self._changes
+
+            if profiler is None:
+                awake[index].loop(tick)
+            else:
+                profiler.loop_object(awake[index], tick)
+
+            if changes == self._changes:
+                index += 1
+            else:
+                index = bisect_right(keys, key)
+
+
+class _BatchState(threading.local):
+    batch = None
+
+
+# batch collecting the value changes of the calling thread
+_batch_state = _BatchState()
+
+
+class Batch:
+    """
+    Transaction over value changes.
+
+    Inside a batch the value changed events of the calling thread are not
+    fired but recorded. The records of a value are merged, keeping the
+    first old and the last new value; an explicit event, e.g. of a
+    dataset changed in place, marks the value as changed. At the end of
+    the outermost batch every value which changed fires once with the net
+    change from old to new; the callback carries the batch, so a listener
+    can look at the whole change set.
+
+    Nested batches join the outermost one.
+
+        with device.batch():
+            drive_speed.value = 200
+            drive_current.value = 3.5
+    """
+    def __init__(self):
+        self._changes = {}
+        self._committed = []
+        self._owner = False
+
+    def __enter__(self):
+        if _batch_state.batch is None:
+            _batch_state.batch = self
+            self._owner = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._owner:
+            _batch_state.batch = None
+            self._owner = False
+            self.commit()
+        return False
+
+    @property
+    def changes(self):
+        """
+        Return: list of (value, old, new) fired by the last commit
+        """
+        return self._committed
+
+    def _record(self, model_value, old_value, new_value):
+        # None -> None is an explicit event, e.g. of a changed dataset
+        explicit = old_value is None and new_value is None
+        change = self._changes.get(model_value)
+
+        if change is None:
+            self._changes[model_value] = [old_value, new_value, explicit]
+        elif explicit:
+            change[2] = True
+        else:
+            change[1] = new_value
+
+    def commit(self):
+        changes, self._changes = self._changes, {}
+        committed = []
+
+        for model_value, (old_value, new_value, explicit) in changes.items():
+            if new_value is None:
+                new_value = model_value.value
+            if explicit or old_value != new_value:
+                committed.append((model_value, old_value, new_value))
+
+        self._committed = committed
+
+        for model_value, old_value, new_value in committed:
+            dispatcher = model_value._dispatcher
+            dispatcher.fire_change("changed", model_value, old_value, new_value)
+            
+            if dispatcher.has_listeners("value_changed"):
+                dispatcher.fire("value_changed", CallbackValueChanged(old_value, new_value, self), model_value)
+
+
+class ModelObject(Sleepable):
+    
+    # Model trees have up to some 100k objects, so the base classes and
+    # the components do not carry an instance dictionary. The name and
+    # the path are derived from the qualified name on demand.
+    __slots__ = ("_qualified_name", "_sleep")
     
     def __init__(self, name = "defaultModel"):
-        
-        name_parts = name.split(sep = "/")
-        
         self._qualified_name = name
-        self._name = name_parts[-1]
-        self._path_list = name_parts[0:-1]
-        self._path_str = "/".join(name_parts[0:-1]) + "/"
-        
     
     def loop(self, tick):
         pass
     
     @property
     def name(self):
-        return self._name
+        return self._qualified_name.rpartition("/")[2]
     
     @property
     def path_string(self):
-        return self._path_str
+        return self._qualified_name.rpartition("/")[0] + "/"
     
     @property
     def path_list(self):
-        return self._path_list
+        return self._qualified_name.split("/")[0:-1]
     
     @property
     def qualified_name(self):
@@ -52,13 +309,79 @@ class ModelObject:
 
     
 
+def walk(device, prefix = ""):
+    """
+    Yield (prefix, child) of all objects below device in the order of a
+    recursive walk, a device before its children. The prefix consists of
+    prefix and the qualified names of the devices between device and the
+    child, each followed by "/", so prefix + child.qualified_name is the
+    path of the child as in ModelIndex.
+
+    """
+    stack = [(prefix, iter(device.children))]
+
+    while stack:
+        prefix, children = stack[-1]
+
+        for child in children:
+            yield prefix, child
+
+            if isinstance(child, ModelDevice):
+                stack.append((prefix + child.qualified_name + "/", iter(child.children)))
+                break
+        else:
+            stack.pop()
+
+
+def copy_value(value):
+    """
+    Return: value detached from its ModelValue, a copy of the rows of a
+    dataset, which are changed in place
+    """
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def compile_loop_schedule(objects):
+    """
+    Flatten objects into the list of objects which really implement loop.
+
+    Children of devices without an own loop are inlined recursively, objects
+    with the inherited no-op ModelObject.loop are dropped. The order is the
+    same as a recursive walk of the children.
+
+    """
+    schedule = []
+    
+    for obj in objects:
+        loop = type(obj).loop
+        
+        if loop is ModelDevice.loop:
+            schedule.extend(obj.loop_schedule)
+        elif loop is not ModelObject.loop:
+            schedule.append(obj)
+            
+    return schedule
+    
+
 class ModelDevice(ModelObject):
+    
+    __slots__ = ("_children", "_parent", "_schedule", "_schedule_version", "_sleep_schedule", "_index")
+    
+    # Incremented on every change of any device tree. Compiled loop
+    # schedules are rebuilt when their version is outdated.
+    _topology_version = 0
 
     def __init__(self, name = "defaultModel", parent = None):
         super().__init__(name)
         
         self._children = []
         self._parent = parent
+        self._schedule = ()
+        self._schedule_version = -1
+        self._sleep_schedule = None
+        self._index = None
         
         if self._parent is not None:
             self._parent.add_child(self)
@@ -71,28 +394,147 @@ class ModelDevice(ModelObject):
     def children(self):
         return self._children
     
+    @property
+    def loop_schedule(self):
+        """
+        Return: list of children (and grandchildren) executed by loop
+        """
+        self._update_schedule()
+        return self._schedule
+    
+    def _update_schedule(self):
+        if self._schedule_version != ModelDevice._topology_version:
+            self._schedule = self._compile_schedule()
+            self._schedule_version = ModelDevice._topology_version
+            
+            if self._sleep_schedule is not None:
+                self._sleep_schedule.detach()
+            self._sleep_schedule = SleepSchedule(self._schedule)
+    
+    def _compile_schedule(self):
+        return compile_loop_schedule(self._children)
+    
+    @property
+    def index(self):
+        """
+        Return: ModelIndex attached to this device, or None
+        """
+        return self._index
+    
+    def subscribe(self, pattern, listener, regex = False, delivery = None):
+        """
+        Subscribe listener to the changes of all values below this device
+        whose path matches pattern, see ModelIndex.subscribe. Attaches an
+        index if the device has none.
+        
+        """
+        from iomodel.common.index import ModelIndex
+        
+        index = self._index if self._index is not None else ModelIndex(self)
+        return index.subscribe(pattern, listener, regex, delivery)
+    
+    def batch(self):
+        """
+        Return: Batch to be used as context manager. The batch covers all
+        values set by the calling thread, not only the children.
+        """
+        return Batch()
+    
     def add_child(self, child):
         self._children.append(child)
+        ModelDevice._topology_version += 1
+        
+        device = self
+        while device is not None:
+            if device._index is not None:
+                device._index._child_added(self, child)
+            device = device._parent
+    
+    def add_children(self, children):
+        """
+        Add a list of children at once, e.g. the values of a template
+        
+        """
+        self._children.extend(children)
+        ModelDevice._topology_version += 1
+        
+        device = self
+        while device is not None:
+            if device._index is not None:
+                for child in children:
+                    device._index._child_added(self, child)
+            device = device._parent
     
     def loop(self, tick):
-        super().loop(tick)
-        for child in self._children:
-            child.loop(tick) 
+        self._update_schedule()
+        self._sleep_schedule.loop(tick, active_profiler())
+    
+
+
+
+# Shared by all values without listeners, never gets a listener itself
+_no_listeners = Dispatcher()
+
+# Called with every value whose state changed, see set_change_hook
+_change_hook = None
+
+
+class _JournalState(threading.local):
+    journal = None
+
+
+# Journal recording the changes of the calling thread, see ChangeJournal
+_journal_state = _JournalState()
+
+# Number of threads with an active journal, the thread local is only read
+# if not 0. Changed by the runner threads under the lock.
+_journals_active = 0
+_journals_lock = threading.Lock()
+
+
+def activate_journal(journal):
+    """
+    Record the changes made by the calling thread in journal, or stop
+    recording if journal is None
+    
+    """
+    global _journals_active
     
+    change = (journal is not None) - (_journal_state.journal is not None)
+    _journal_state.journal = journal
+    
+    if change:
+        with _journals_lock:
+            _journals_active += change
+
+
+def set_change_hook(hook):
+    """
+    Install a callable called with every ModelValue whose value changed,
+    also without event, or None to remove it. Used by the versioning.
+
+    """
+    global _change_hook
+    _change_hook = hook
 
 
 
-   # TODO ModelValue?
 class ModelValue(ModelObject):
     
-    def __init__(self, name = "defaultModel", parent = None, datatype = ValueDataType.Unknown, initial = None, external_write = False):
+    __slots__ = ("_dispatcher", "_initial", "_datatype", "_parent", "_external_write", "_value", "_filter")
+    
+    def __init__(self, name = "defaultModel", parent = None, datatype = ValueDataType.Unknown, initial = None, external_write = False, value_filter = None):
         super().__init__(name)
-        self._dispatcher = Dispatcher()
+        self._dispatcher = _no_listeners
         self._initial = initial
         self._datatype = datatype
         self._parent = parent
         self._external_write = external_write
         self._value = initial
+        self._filter = None
+        
+        if value_filter is not None:
+            self.value_filter = value_filter
         
         if self._parent is not None:
             self._parent.add_child(self)
@@ -108,8 +550,49 @@ class ModelValue(ModelObject):
     def update_value(self, value):
         self.value = value
     
-    def add_value_changed_listener(self, listener):
-        self._dispatcher.add_listener("value_changed", listener)
+    def set_value_silent(self, value):
+        """
+        Set the value without firing a value changed event
+        
+        """
+        self._value = value
+        
+        if _change_hook is not None:
+            _change_hook(self)
+    
+    def add_value_changed_listener(self, listener, delivery = None):
+        """
+        Call listener(callback, source) on every change, callback is a
+        CallbackValueChanged. With a DeliveryQueue as delivery the calls
+        are queued and delivered outside of the tick.
+        
+        """
+        if delivery is not None:
+            listener = delivery.wrap(listener)
+        self.dispatcher.add_listener("value_changed", listener)
+    
+    def remove_value_changed_listener(self, listener):
+        if self._dispatcher is not _no_listeners:
+            self._dispatcher.remove_listener("value_changed", listener)
+    
+    def add_change_listener(self, listener, delivery = None):
+        """
+        Call listener(source, old_value, new_value) on every change. Unlike
+        add_value_changed_listener no event object is allocated per change.
+        Change listeners are called before the value changed listeners.
+        
+        """
+        if delivery is not None:
+            listener = delivery.wrap(listener)
+        self.dispatcher.add_listener("changed", listener)
+    
+    def remove_change_listener(self, listener):
+        if self._dispatcher is not _no_listeners:
+            self._dispatcher.remove_listener("changed", listener)
+    
+    @property
+    def parent(self):
+        return self._parent
     
     @property
     def external_write(self):
@@ -121,6 +604,8 @@ class ModelValue(ModelObject):
         
     @property
     def dispatcher(self):
+        if self._dispatcher is _no_listeners:
+            self._dispatcher = Dispatcher()
         return self._dispatcher
     
     @property
@@ -141,7 +626,31 @@ class ModelValue(ModelObject):
         if self._value != value:
             old_value = self._value
             self._value = value
+            
+            if _change_hook is not None:
+                _change_hook(self)
+            
+            if self._filter is not None:
+                old_value = self._filter.reported
+                if not self._filter.accept(value):
+                    return
+                
             self.fire_has_changed_event(old_value, value)
+    
+    @property
+    def value_filter(self):
+        return self._filter
+    
+    @value_filter.setter
+    def value_filter(self, value):
+        """
+        Filter deciding which changes fire a value changed event,
+        e.g. a DeadbandFilter. None reports every change.
+        
+        """
+        self._filter = value
+        if value is not None:
+            value.attach(self)
 
     @property
     def unit(self):
@@ -156,14 +665,43 @@ class ModelValue(ModelObject):
         return None
     
     def fire_has_changed_event(self, old_value = None, new_value = None):
-        callback = CallbackValueChanged(old_value, new_value)
-        self._dispatcher.fire("value_changed", callback, self)
+        if old_value is None and new_value is None and _change_hook is not None:
+            # explicit event of a value changed in place, e.g. a dataset
+            _change_hook(self)
+        
+        if _journals_active:
+            journal = _journal_state.journal
+            if journal is not None:
+                journal.append(self, old_value, new_value)
+        
+        if self._dispatcher is _no_listeners:
+            return
+        
+        batch = _batch_state.batch
+        if batch is not None:
+            batch._record(self, old_value, new_value)
+            return
+        
+        dispatcher = self._dispatcher
+        dispatcher.fire_change("changed", self, old_value, new_value)
+        
+        if dispatcher.has_listeners("value_changed"):
+            dispatcher.fire("value_changed", CallbackValueChanged(old_value, new_value), self)
 
 
 
 class ModelDataSet(ModelValue):
     
+    # Datasets are mutated in place. Instead of comparing the rows, every
+    # mutation increments the version and records the key of the changed
+    # row (the index, or the key of a map) with the version.
+    __slots__ = ("_columns_count", "_columns", "_version", "_row_versions", "_pruned_version")
+    
     def __init__(self, name, parent, columns = [("Column1", ValueDataType.Int), ("Column2", ValueDataType.String)]):
+        self._version = 0
+        self._row_versions = {}
+        self._pruned_version = 0
+        
         super().__init__(name, parent, ValueDataType.DataSet, [], False)
         
         self._columns_count = len(columns)
@@ -176,11 +714,92 @@ class ModelDataSet(ModelValue):
     @property
     def columns_count(self):
         return self._columns_count      
+    
+    @property
+    def version(self):
+        """
+        Return: counter incremented by every change of the dataset
+        """
+        return self._version
+    
+    @property
+    def value(self):
+        return self._value
+    
+    @value.setter
+    def value(self, value):
+        # a new list replaces all rows, the rows are not compared
+        if value is not self._value:
+            old_value = self._value
+            self._value = value
+            self._reset_rows()
+            
+            if _change_hook is not None:
+                _change_hook(self)
+            
+            self.fire_has_changed_event(old_value, value)
+    
+    def set_value_silent(self, value):
+        self._value = value
+        self._reset_rows()
+        
+        if _change_hook is not None:
+            _change_hook(self)
+    
+    def _reset_rows(self):
+        self._version += 1
+        self._row_versions.clear()
+        self._pruned_version = self._version
+    
+    def _row_changed(self, key):
+        self._version += 1
+        row_versions = self._row_versions
+        
+        # reinsert to keep the keys ordered by their last change
+        row_versions.pop(key, None)
+        row_versions[key] = self._version
+        
+        if len(row_versions) > 2 * len(self._value) + 64:
+            # forget the oldest changes, e.g. of deleted keys
+            for old_key in list(row_versions)[0:len(row_versions) // 2]:
+                self._pruned_version = row_versions.pop(old_key)
+    
+    def changed_rows(self, version):
+        """
+        Return the keys of the rows changed after version
+
+        Parameters
+        ----------
+        version : int
+                Version of an earlier read of the dataset.
+
+        Returns
+        -------
+        list
+            Keys in the order of their last change: row indexes, or the
+            keys of a map. Keys of deleted rows are included. None if the
+            changes are not known any more, e.g. since the whole value was
+            replaced; all rows have to be read then.
+
+        """
+        if version < self._pruned_version:
+            return None
+        
+        keys = []
+        row_versions = self._row_versions
+        
+        for key in reversed(row_versions):
+            if row_versions[key] <= version:
+                break
+            keys.append(key)
         
+        keys.reverse()
+        return keys
     
     def clear_data(self, suppress_event = False):
         if isinstance(self.value, list):
             self.value.clear()
+        self._reset_rows()
 
         if not suppress_event:
-            self.fire_has_changed_event()    
\ No newline at end of file
+            self.fire_has_changed_event()
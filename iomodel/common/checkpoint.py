@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import mmap
+import pickle
+import struct
+
+from iomodel.common.base import ModelDevice, Sleepable, walk
+
+
+class Checkpoint:
+    """
+    Binary checkpoint of the state of a model tree.
+
+    Stored are the values of all ModelValues, and the internal state of
+    all objects implementing get_state() and set_state(state): objects of
+    the tree and objects registered with register.
+
+    Layout of the file (little endian):
+
+        header  : magic, version, value count, object blob size,
+                  state blob size, fingerprint of the tree: path, class
+                  and datatype of every value
+        tags    : one byte per value (TAG_*)
+        numbers : 8 bytes per value, int64 or float64 according to the tag
+        objects : pickled list of values which are no numbers
+        states  : pickled dictionary of component states
+
+    Numbers are restored from a memory map of the file without copying.
+    """
+    MAGIC = b"IOMC"
+    VERSION = 2
+    HEADER = struct.Struct("<4sIIQQ20s")
+
+    TAG_INT = 0
+    TAG_FLOAT = 1
+    TAG_BOOL = 2
+    TAG_OBJECT = 3
+
+    INT_MIN = -(1 << 63)
+    INT_MAX = (1 << 63) - 1
+
+    def __init__(self, model):
+        """
+        Parameters
+        ----------
+        model : ModelDevice
+                Root of the tree to be saved and restored.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        if not isinstance(model, ModelDevice):
+            raise Exception("Checkpoint model is no device")
+
+        self._model = model
+        self._registered = {}
+
+    @property
+    def model(self):
+        return self._model
+
+    def register(self, name, obj):
+        """
+        Register an object which is not part of the tree, e.g. the logic
+        of a conveyor. The object has to implement get_state() returning
+        a picklable state and set_state(state).
+
+        """
+        self._registered[name] = obj
+
+    def _collect(self):
+        """
+        Returns the values and the state providers of the tree in the
+        order of a recursive walk, and the fingerprint of the values.
+
+        """
+        values = []
+        providers = {}
+        structure = []
+
+        for prefix, child in walk(self._model):
+            path = prefix + child.qualified_name
+
+            if not isinstance(child, ModelDevice):
+                values.append(child)
+                # the class of a value bound to a ColumnStore has the name
+                # and the module of its own class
+                cls = type(child)
+                structure.append("{}\t{}.{}\t{}".format(path, cls.__module__, cls.__name__, child.datatype))
+
+            if hasattr(child, "get_state"):
+                providers[path] = child
+
+        providers.update(self._registered)
+        fingerprint = hashlib.sha1("\n".join(structure).encode("utf-8")).digest()
+        return values, providers, fingerprint
+
+    def save(self, path):
+        """
+        Write the current state of the model to path
+
+        """
+        values, providers, fingerprint = self._collect()
+        count = len(values)
+
+        tags = bytearray(count)
+        numbers = bytearray(count * 8)
+        objects = []
+
+        pack_int = struct.Struct("<q").pack_into
+        pack_float = struct.Struct("<d").pack_into
+
+        for index, model_value in enumerate(values):
+            value = model_value.value
+            kind = type(value)
+
+            if kind is bool:
+                tags[index] = Checkpoint.TAG_BOOL
+                pack_int(numbers, index * 8, value)
+            elif kind is int and Checkpoint.INT_MIN <= value <= Checkpoint.INT_MAX:
+                tags[index] = Checkpoint.TAG_INT
+                pack_int(numbers, index * 8, value)
+            elif kind is float:
+                tags[index] = Checkpoint.TAG_FLOAT
+                pack_float(numbers, index * 8, value)
+            else:
+                tags[index] = Checkpoint.TAG_OBJECT
+                objects.append(value)
+
+        object_blob = pickle.dumps(objects, pickle.HIGHEST_PROTOCOL)
+        state_blob = pickle.dumps({name: p.get_state() for name, p in providers.items()}, pickle.HIGHEST_PROTOCOL)
+
+        with open(path, "wb") as f:
+            f.write(Checkpoint.HEADER.pack(Checkpoint.MAGIC, Checkpoint.VERSION, count,
+                                           len(object_blob), len(state_blob), fingerprint))
+            f.write(tags)
+            f.write(numbers)
+            f.write(object_blob)
+            f.write(state_blob)
+
+        self.logger.debug("Checkpoint with %d values written to %s", count, path)
+
+    def restore(self, path, notify = False):
+        """
+        Restore the state of the model from path.
+
+        The tree has to consist of the same values as the saved one.
+
+        Parameters
+        ----------
+        path : str
+                Checkpoint file.
+
+        notify : bool, optional
+                Fire a value changed event for every restored value which
+                differs from its current value. By default the values are
+                set silently, e.g. before a birth is published.
+
+        """
+        values, providers, fingerprint = self._collect()
+
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+                view = memoryview(data)
+                try:
+                    self._restore(view, values, providers, fingerprint, notify)
+                finally:
+                    view.release()
+
+        self.logger.debug("Checkpoint with %d values restored from %s", len(values), path)
+
+    def _restore(self, view, values, providers, fingerprint, notify):
+        magic, version, count, object_size, state_size, saved_fingerprint = Checkpoint.HEADER.unpack_from(view)
+
+        if magic != Checkpoint.MAGIC or version != Checkpoint.VERSION:
+            raise Exception("No checkpoint file or unsupported version")
+
+        if count != len(values) or saved_fingerprint != fingerprint:
+            raise Exception("Checkpoint does not match the structure of the model")
+
+        tags = ints = floats = None
+
+        # all views on the memory map are released before it is closed,
+        # also if the restore fails
+        try:
+            offset = Checkpoint.HEADER.size
+            tags = view[offset:offset + count]
+            offset += count
+            ints = view[offset:offset + count * 8].cast("q")
+            floats = view[offset:offset + count * 8].cast("d")
+            offset += count * 8
+            with view[offset:offset + object_size] as blob:
+                objects = iter(pickle.loads(blob))
+            offset += object_size
+            with view[offset:offset + state_size] as blob:
+                states = pickle.loads(blob)
+
+            for index, model_value in enumerate(values):
+                tag = tags[index]
+
+                if tag == Checkpoint.TAG_INT:
+                    value = ints[index]
+                elif tag == Checkpoint.TAG_FLOAT:
+                    value = floats[index]
+                elif tag == Checkpoint.TAG_BOOL:
+                    value = ints[index] != 0
+                else:
+                    value = next(objects)
+
+                if notify:
+                    model_value.value = value
+                else:
+                    model_value.set_value_silent(value)
+        finally:
+            for part in (tags, ints, floats):
+                if part is not None:
+                    part.release()
+
+        for name, state in states.items():
+            if name in providers:
+                providers[name].set_state(state)
+            else:
+                self.logger.warning("No state provider %s in the model", name)
+
+        # sleeping objects have to look at the restored state
+        for obj in values + list(providers.values()):
+            if isinstance(obj, Sleepable):
+                obj.wake()
+
+
+def save_checkpoint(model, path):
+    Checkpoint(model).save(path)
+
+
+def restore_checkpoint(model, path, notify = False):
+    Checkpoint(model).restore(path, notify)
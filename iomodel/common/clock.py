@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+
+class SimulationClock:
+    """
+    Model time source shared by the runner, the connector and the components.
+
+    The model time runs time_scale times faster than the wall time. In the
+    as fast as possible mode the model time only advances when somebody
+    sleeps on the clock, so a simulation runs without any idle time.
+    """
+    def __init__(self, time_scale = 1.0, as_fast_as_possible = False, start_time = None):
+        """
+        Parameters
+        ----------
+        time_scale : float, optional
+                Factor between model time and wall time.
+
+        as_fast_as_possible : bool, optional
+                Advance the model time on sleep instead of waiting.
+
+        start_time : float, optional
+                Model wall time (seconds since epoch) at creation.
+                The default is the current wall time.
+
+        """
+        if time_scale <= 0:
+            raise Exception("Time scale has to be greater than 0")
+
+        self._lock = threading.Lock()
+        self._time_scale = time_scale
+        self._as_fast_as_possible = as_fast_as_possible
+        self._epoch = time.time() if start_time is None else start_time
+        self._real_origin = time.monotonic()
+        self._model_origin = 0.0
+
+    @property
+    def time_scale(self):
+        return self._time_scale
+
+    @time_scale.setter
+    def time_scale(self, value):
+        if value <= 0:
+            raise Exception("Time scale has to be greater than 0")
+
+        with self._lock:
+            self._rebase()
+            self._time_scale = value
+
+    @property
+    def as_fast_as_possible(self):
+        return self._as_fast_as_possible
+
+    @as_fast_as_possible.setter
+    def as_fast_as_possible(self, value):
+        with self._lock:
+            self._rebase()
+            self._as_fast_as_possible = value
+
+    def _rebase(self):
+        """
+        Freeze the current model time as new origin, to keep the model
+        time continuous when the mode or the scale changes.
+
+        """
+        self._model_origin = self._monotonic()
+        self._real_origin = time.monotonic()
+
+    def _monotonic(self):
+        if self._as_fast_as_possible:
+            return self._model_origin
+        return self._model_origin + (time.monotonic() - self._real_origin) * self._time_scale
+
+    def monotonic(self):
+        """
+        Return: model time in seconds since creation of the clock
+        """
+        return self._monotonic()
+
+    def time(self):
+        """
+        Return: model wall time in seconds since epoch
+        """
+        return self._epoch + self._monotonic()
+
+    def time_ms(self):
+        """
+        Return: model wall time in milliseconds since epoch, as used by
+        the sparkplug payload timestamps
+        """
+        return int(round(self.time() * 1000))
+
+    def sleep(self, duration):
+        self.sleep_until(self._monotonic() + duration)
+
+    def sleep_until(self, deadline, spin_threshold = 0.0):
+        """
+        Block until the model time reached the deadline.
+
+        Parameters
+        ----------
+        deadline : float
+                Model time as returned by monotonic.
+
+        spin_threshold : float, optional
+                Wall time in seconds before the deadline in which the
+                clock busy waits instead of sleeping.
+
+        """
+        if self._as_fast_as_possible:
+            with self._lock:
+                if deadline > self._model_origin:
+                    self._model_origin = deadline
+            return
+
+        remaining = (deadline - self._monotonic()) / self._time_scale - spin_threshold
+
+        if remaining > 0:
+            time.sleep(remaining)
+
+        while self._monotonic() < deadline:
+            pass
+
+    async def async_sleep_until(self, deadline):
+        """
+        Wait on the running event loop until the model time reached the
+        deadline. In the as fast as possible mode the model time is
+        advanced and the loop is only yielded once.
+
+        """
+        if self._as_fast_as_possible:
+            self.sleep_until(deadline)
+            await asyncio.sleep(0)
+            return
+
+        remaining = (deadline - self._monotonic()) / self._time_scale
+        while remaining > 0:
+            await asyncio.sleep(remaining)
+            remaining = (deadline - self._monotonic()) / self._time_scale
+
+
+_default_clock = SimulationClock()
+
+
+def get_default_clock():
+    """
+    Return: clock used when no clock is injected
+    """
+    return _default_clock
+
+
+def set_default_clock(clock):
+    global _default_clock
+    _default_clock = clock
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from iomodel.common import base
+from iomodel.common.base import ModelDevice, ModelValue, ValueDataType, walk
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+INT = "int64"
+FLOAT = "float64"
+BOOL = "bool"
+OBJECT = "object"
+
+KINDS = (INT, FLOAT, BOOL, OBJECT)
+
+_KIND_OF_DATATYPE = {ValueDataType.Int: INT,
+                     ValueDataType.Float: FLOAT,
+                     ValueDataType.Boolean: BOOL}
+
+_PYTHON_TYPE = {INT: int, FLOAT: float, BOOL: bool}
+
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+# Ints up to this magnitude are exact as float64
+_FLOAT_INT_MAX = 1 << 53
+
+
+class _Column:
+    """
+    Growable array of one kind. A NumPy array if NumPy is installed,
+    a list otherwise.
+    """
+    __slots__ = ("kind", "data", "size")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.size = 0
+
+        if numpy is not None:
+            self.data = numpy.empty(64, dtype = kind)
+        else:
+            self.data = []
+
+    def accepts(self, value):
+        python_type = _PYTHON_TYPE.get(self.kind)
+
+        if python_type is None:
+            return True
+
+        if type(value) is not python_type:
+            # e.g. a clamp to 0 of a float value, stored as 0.0
+            return python_type is float and type(value) is int and -_FLOAT_INT_MAX <= value <= _FLOAT_INT_MAX
+
+        return python_type is not int or _INT_MIN <= value <= _INT_MAX
+
+    def set(self, index, value):
+        if self.kind is FLOAT:
+            value = float(value)
+        self.data[index] = value
+
+    def append(self, value):
+        if self.kind is FLOAT:
+            value = float(value)
+
+        index = self.size
+
+        if numpy is None:
+            self.data.append(value)
+        else:
+            if index == len(self.data):
+                data = numpy.empty(2 * len(self.data), dtype = self.kind)
+                data[0:index] = self.data
+                self.data = data
+            self.data[index] = value
+
+        self.size += 1
+        return index
+
+    def get(self, index):
+        if numpy is None:
+            return self.data[index]
+        return self.data.item(index)
+
+
+class _ColumnValue:
+    """
+    Value access of a ModelValue bound to a ColumnStore. The slot _value
+    holds the row of the value in the column of its class.
+    """
+    __slots__ = ()
+
+    _store = None
+    _column = None
+
+    @property
+    def value(self):
+        return self._column.get(self._value)
+
+    @value.setter
+    def value(self, value):
+        column = self._column
+        old_value = column.get(self._value)
+
+        if old_value != value:
+            if column.accepts(value):
+                column.set(self._value, value)
+            else:
+                self._store._move(self, value)
+
+            if base._change_hook is not None:
+                base._change_hook(self)
+
+            if self._filter is not None:
+                old_value = self._filter.reported
+                if not self._filter.accept(value):
+                    return
+
+            self.fire_has_changed_event(old_value, value)
+
+    def set_value_silent(self, value):
+        if self._column.accepts(value):
+            self._column.set(self._value, value)
+        else:
+            self._store._move(self, value)
+
+        if base._change_hook is not None:
+            base._change_hook(self)
+
+
+class ColumnStore:
+    """
+    Columnar backend of the values of a model tree.
+
+    Every bound value gets a row in one column per kind: int64, float64,
+    bool, and object for strings and bytes. The kind follows the
+    datatype of the value. Ints written to a float value are stored as
+    float. A value holding a python type which does not fit its column,
+    e.g. False in a float value, is moved to the object column.
+
+    ModelValue.value keeps working on bound values. Bulk reads, writes and
+    comparisons of a whole device or plant work on the columns, as NumPy
+    operations if NumPy is installed.
+
+    Values added to the tree after binding stay unbound until bind is
+    called again.
+    """
+    def __init__(self, model = None):
+        """
+        Parameters
+        ----------
+        model : ModelDevice, optional
+                Tree whose values are bound to the store.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        self._columns = {kind: _Column(kind) for kind in KINDS}
+        self._classes = {}
+        self._version = 0
+
+        if model is not None:
+            self.bind(model)
+
+    @property
+    def numpy(self):
+        """
+        Return: True if the columns are NumPy arrays
+        """
+        return numpy is not None
+
+    @property
+    def version(self):
+        """
+        Return: counter incremented whenever rows are added or values moved
+        """
+        return self._version
+
+    def column(self, kind):
+        """
+        Return: array of all rows of kind, including rows of moved values
+        """
+        column = self._columns[kind]
+        return column.data[0:column.size]
+
+    def bind(self, model):
+        """
+        Bind all values below model, or model itself if it is a value
+
+        """
+        if isinstance(model, ModelDevice):
+            for _, child in walk(model):
+                if not isinstance(child, ModelDevice):
+                    self.bind(child)
+            return
+
+        if not isinstance(model, ModelValue) or isinstance(model, _ColumnValue):
+            return
+
+        if type(model).value is not ModelValue.value:
+            # own value logic, keeps its attribute storage
+            return
+
+        value = model._value
+        kind = _KIND_OF_DATATYPE.get(model.datatype, OBJECT)
+
+        if not self._columns[kind].accepts(value):
+            kind = OBJECT
+
+        self._assign(model, kind, value)
+
+    def _assign(self, model, kind, value):
+        column = self._columns[kind]
+        cls = type(model)
+
+        if isinstance(model, _ColumnValue):
+            cls = cls.__bases__[1]
+
+        model.__class__ = self._column_class(cls, kind)
+        model._value = column.append(value)
+        self._version += 1
+
+    def _move(self, model, value):
+        """
+        Move a value to the object column, when the written python type
+        does not fit its column
+
+        """
+        self._assign(model, OBJECT, value)
+
+    def _column_class(self, cls, kind):
+        key = (cls, kind)
+
+        if key not in self._classes:
+            self._classes[key] = type(cls.__name__, (_ColumnValue, cls),
+                                      {"__slots__": (), "__module__": cls.__module__,
+                                       "_store": self, "_column": self._columns[kind]})
+        return self._classes[key]
+
+    def view(self, model):
+        """
+        Return: ColumnView of the bound values below the device model, or
+        of the bound values of the list model
+        """
+        if isinstance(model, ModelDevice):
+            values = [v for _, v in walk(model) if isinstance(v, _ColumnValue) and v._store is self]
+        else:
+            values = [v for v in model if isinstance(v, _ColumnValue) and v._store is self]
+
+        return ColumnView(self, values)
+
+class ColumnView:
+    """
+    Bulk access to a set of values of a ColumnStore, grouped by kind.
+    """
+    def __init__(self, store, values):
+        self._store = store
+        self._values = values
+        self._version = -1
+        self._groups = {}
+
+    @property
+    def values(self):
+        return self._values
+
+    def _update(self):
+        if self._version == self._store.version:
+            return
+
+        groups = {kind: ([], []) for kind in KINDS}
+        for value in self._values:
+            members, rows = groups[value._column.kind]
+            members.append(value)
+            rows.append(value._value)
+
+        if numpy is not None:
+            groups = {kind: (members, numpy.array(rows, dtype = numpy.intp))
+                      for kind, (members, rows) in groups.items()}
+
+        self._groups = groups
+        self._version = self._store.version
+
+    def members(self, kind):
+        """
+        Return: values of kind in the order of read and write
+        """
+        self._update()
+        return self._groups[kind][0]
+
+    def read(self, kind):
+        """
+        Return: copy of the current values of kind, in the order of members
+        """
+        self._update()
+        rows = self._groups[kind][1]
+        data = self._store._columns[kind].data
+
+        if numpy is not None:
+            return data[rows]
+        return [data[row] for row in rows]
+
+    def write(self, kind, data, notify = True):
+        """
+        Write the values of kind, in the order of members
+
+        Parameters
+        ----------
+        kind : str
+                INT, FLOAT, BOOL or OBJECT.
+
+        data : sequence
+                New values, one per member, converted to the kind.
+
+        notify : bool, optional
+                Fire a value changed event for every changed value. The
+                value filters apply as for a single write. Without notify
+                the values are set silently, like by set_value_silent.
+
+        """
+        self._update()
+        members, rows = self._groups[kind]
+        column = self._store._columns[kind]
+
+        if len(data) != len(members):
+            raise Exception("Expected {} values, got {}".format(len(members), len(data)))
+
+        hook = base._change_hook
+        old = self.read(kind) if notify or hook is not None else None
+
+        if numpy is not None and kind != OBJECT:
+            column.data[rows] = data
+        else:
+            python_type = _PYTHON_TYPE.get(kind)
+            for row, value in zip(rows, data):
+                column.data[row] = value if python_type is None else python_type(value)
+
+        if old is None:
+            return
+
+        for index in self._changed_indexes(old, self.read(kind)):
+            member = members[index]
+
+            if hook is not None:
+                hook(member)
+
+            if notify:
+                old_value = old[index]
+                value = column.get(rows[index])
+
+                if member._filter is not None:
+                    old_value = member._filter.reported
+                    if not member._filter.accept(value):
+                        continue
+
+                member.fire_has_changed_event(old_value, value)
+
+    def snapshot(self):
+        """
+        Return: copy of all values of the view, to be compared by changes
+        """
+        self._update()
+        return (self._store.version, {kind: (list(self._groups[kind][0]), self.read(kind)) for kind in KINDS})
+
+    def changes(self, snapshot):
+        """
+        Return: values which changed since snapshot was taken
+        """
+        version, groups = snapshot
+        self._update()
+        changed = []
+
+        for kind in KINDS:
+            members, old = groups[kind]
+
+            if version == self._store.version:
+                changed.extend(members[i] for i in self._changed_indexes(old, self.read(kind)))
+            else:
+                # rows moved in the meantime, compare value by value
+                changed.extend(m for m, v in zip(members, old) if m.value != v)
+
+        return changed
+
+    def _changed_indexes(self, old, new):
+        if numpy is not None:
+            return numpy.flatnonzero(old != new).tolist()
+        return [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
@@ -8,10 +8,12 @@ import logging
 
 class Command(ModelValue):
     
+    __slots__ = ("_condition", "_on_update_request")
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, name = "defaultModel", parent = None, initial = False, 
                  on_update_request = None, condition = None, external_write = False):
         super().__init__(name, parent, ValueDataType.Boolean, initial, external_write)
-        self.logger = logging.getLogger(__name__)
         self._condition = condition
         self._on_update_request = on_update_request
         
@@ -42,10 +44,12 @@ class Command(ModelValue):
 
 class CommandToggle(ModelValue):
     
+    __slots__ = ("_condition", "_value_toggled")
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, name = "defaultModel", parent = None, initial = False, 
                  value_toggled = None, condition = None):
         super().__init__(name, parent, ValueDataType.Boolean, initial, True)
-        self.logger = logging.getLogger(__name__)
         self._condition = condition
         self._value_toggled = value_toggled
         
@@ -66,11 +70,13 @@ class CommandToggle(ModelValue):
 
 class CommandTap(ModelValue):
     
+    __slots__ = ("_value_tapped",)
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, name = "defaultModel", parent = None, initial = False, 
                  value_tapped = None):
         super().__init__(name, parent, ValueDataType.Boolean, initial, True)
         
-        self.logger = logging.getLogger(__name__)
         self._value_tapped = value_tapped
     
     def update_value(self, value):
@@ -84,65 +90,128 @@ class CommandTap(ModelValue):
 
 class Variant(ModelValue):
     
-    def __init__(self, name = "defaultModel", parent = None, initial = False, datatype = ValueDataType.Int, external_write = False):
-        super().__init__(name, parent, datatype, initial, external_write)
-        self.logger = logging.getLogger(__name__)
+    __slots__ = ()
+    logger = logging.getLogger(__name__)
+    
+    def __init__(self, name = "defaultModel", parent = None, initial = False, datatype = ValueDataType.Int, external_write = False, value_filter = None):
+        super().__init__(name, parent, datatype, initial, external_write, value_filter)
 
 
 
 class VariantDataSet(ModelDataSet):
     
+    __slots__ = ()
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, name = "defaultModel", parent = None, columns = [("Column1", ValueDataType.Int), ("Column2", ValueDataType.String)]):
         super().__init__(name, parent, columns)
-        self.logger = logging.getLogger(__name__)
         
     def append_data(self, dataset = ("Value1", "Values2"), suppress_event = False):
-        if isinstance(self.value, list):
+        rows = self.value
+        if isinstance(rows, list):
+            first = len(rows)
             if isinstance(dataset, list):
-                self.value.extend(dataset)
+                rows.extend(dataset)
             else:
-                self.value.append(dataset)
+                rows.append(dataset)
+            
+            for index in range(first, len(rows)):
+                self._row_changed(index)
             
         if not suppress_event:
             self.fire_has_changed_event()
         
 class VariantDataMap(ModelDataSet):
+    """
+    Dataset of rows identified by a key. New rows are appended, a deleted
+    row is replaced by the last row, so every change is O(1).
+    Rows of a replaced value have no key, they are kept until the rows
+    are cleared or replaced again.
+    """
+    __slots__ = ("_rows", "_keys")
+    logger = logging.getLogger(__name__)
     
     def __init__(self, name = "defaultModel", parent = None, columns = [("Column1", ValueDataType.Int), ("Column2", ValueDataType.String)]):
         super().__init__(name, parent, columns)
-        self.logger = logging.getLogger(__name__)
-        self._map = {}
+        self._rows = {}
+        self._keys = []
         
     def set_entry(self, key, data = ("key", "data1", "data2"), suppress_event = False):
-        self._map[key] = data
-        self.value = list(self._map.values())
+        rows = self.value
+        index = self._rows.get(key)
+        
+        if index is None:
+            self._rows[key] = len(rows)
+            self._keys.append(key)
+            rows.append(data)
+        elif rows[index] == data:
+            return
+        else:
+            rows[index] = data
+        
+        self._row_changed(key)
         
         if not suppress_event:
             self.fire_has_changed_event()
        
     def del_entry(self, key, suppress_event = False):
-        if key in self._map:
-            del self._map[key]
-            self.value = list(self._map.values())
+        index = self._rows.pop(key, None)
+        
+        if index is not None:
+            rows = self.value
+            last_row = rows.pop()
+            last_key = self._keys.pop()
+            
+            if index < len(rows):
+                rows[index] = last_row
+                self._keys[index] = last_key
+                if last_key is not None:
+                    self._rows[last_key] = index
+            
+            self._row_changed(key)
             
             if not suppress_event:
                 self.fire_has_changed_event()
+    
+    def get_entry(self, key, default = None):
+        index = self._rows.get(key)
+        if index is None:
+            return default
+        return self.value[index]
+    
     @property       
     def map_count(self):
-        return len(self._map)
+        return len(self._rows)
+    
+    def get_state(self):
+        return dict(zip(self._keys, self.value))
+    
+    def set_state(self, state):
+        self.set_value_silent(list(state.values()))
+        self._keys = list(state)
+        self._rows = {key: index for index, key in enumerate(self._keys)}
+    
+    def _reset_rows(self):
+        # the rows were replaced or cleared, their keys are not known
+        super()._reset_rows()
+        self._rows = {}
+        self._keys = [None] * len(self._value) if isinstance(self._value, list) else []
             
         
 
 class Switch(ModelValue):
     
+    __slots__ = ("_method",)
+    logger = logging.getLogger(__name__)
+    
     def __init__(self, name = "defaultModel", parent = None, initial = False, external_write = False):
         super().__init__(name, parent, ValueDataType.Boolean, initial, external_write)
-        self.logger = logging.getLogger(__name__)
         
         self._method = None
         
     def set_callback(self, method):
         self._method = method
+        self.wake()
     
     @property
     def unit(self):
@@ -153,18 +222,25 @@ class Switch(ModelValue):
         if self._method is not None:
             if callable(self._method):
                 self.value = self._method()
+        else:
+            # nothing to poll until a callback is set
+            self.sleep()
 
 class LevelSensor(ModelValue):
     
-    def __init__(self, name = "defaultModel", parent = None, initial = False, external_write = False):
-        super().__init__(name, parent, ValueDataType.Float, initial, external_write)
-        self.logger = logging.getLogger(__name__)
+    __slots__ = ()
+    logger = logging.getLogger(__name__)
+    
+    def __init__(self, name = "defaultModel", parent = None, initial = False, external_write = False, value_filter = None):
+        super().__init__(name, parent, ValueDataType.Float, initial, external_write, value_filter)
         
 class TemperatureSensor(ModelValue):
     
-    def __init__(self, name = "defaultModel", parent = None, initial = 0.0, range_max = 1, t = 1, external_write = False):
-        super().__init__(name, parent, ValueDataType.Float, initial, external_write)
-        self.logger = logging.getLogger(__name__)
+    __slots__ = ("_range_max", "_t", "_pt1", "_heat", "_pt1_last")
+    logger = logging.getLogger(__name__)
+    
+    def __init__(self, name = "defaultModel", parent = None, initial = 0.0, range_max = 1, t = 1, external_write = False, value_filter = None):
+        super().__init__(name, parent, ValueDataType.Float, initial, external_write, value_filter)
         
         self._range_max = range_max
         self._t = t
@@ -188,6 +264,13 @@ class TemperatureSensor(ModelValue):
         
     def reset(self):
         self._pt1 = PT1(self._range_max, self._t)
+        
+    def get_state(self):
+        return (self._heat, self._pt1_last, self._pt1.get_state())
+    
+    def set_state(self, state):
+        self._heat, self._pt1_last, pt1 = state
+        self._pt1.set_state(pt1)
     
     @property
     def t(self):
@@ -227,10 +310,12 @@ class TemperatureSensor(ModelValue):
         
         
 class TemperatureSensorBA(ModelValue):
-
-    def __init__(self, name = "defaultModel", parent = None, initial = 0.0, range = 0.5, delay = 5, external_write = False):
-        super().__init__(name, parent, ValueDataType.Float, initial, external_write)
-        self.logger = logging.getLogger(__name__)
+    
+    __slots__ = ("_range", "_delay", "_t", "_up")
+    logger = logging.getLogger(__name__)
+    
+    def __init__(self, name = "defaultModel", parent = None, initial = 0.0, range = 0.5, delay = 5, external_write = False, value_filter = None):
+        super().__init__(name, parent, ValueDataType.Float, initial, external_write, value_filter)
 
         self.value = initial
         self._range = range
@@ -246,6 +331,12 @@ class TemperatureSensorBA(ModelValue):
     def range(self, value):
         self._range(value)
 
+    def get_state(self):
+        return (self._t, self._up)
+
+    def set_state(self, state):
+        self._t, self._up = state
+
 
     def loop(self, tick):
 
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import collections
+import logging
+import threading
+from enum import Enum
+
+
+class OverflowPolicy(Enum):
+    """
+    Behaviour of a DeliveryQueue when an event arrives at a full queue.
+
+    DropOldest : Discard the oldest queued event
+    DropNewest : Discard the arriving event
+    Block      : Wait until the executor made room. Only for queues drained
+                 by an executor, a deferred queue drops the oldest event,
+                 as does an event queued by a listener of the queue.
+    """
+    DropOldest = 0,
+    DropNewest = 1,
+    Block = 2
+
+
+class _QueuedListener:
+    """
+    Registered in place of a listener, queues its calls. Compares equal
+    to the listener, so it is removed by the usual remove methods.
+    """
+    __slots__ = ("_queue", "_listener")
+
+    def __init__(self, queue, listener):
+        self._queue = queue
+        self._listener = listener
+
+    def __call__(self, *args):
+        self._queue._put(self._listener, args)
+
+    def __eq__(self, other):
+        if isinstance(other, _QueuedListener):
+            return self._queue is other._queue and self._listener == other._listener
+        return self._listener == other
+
+    def __hash__(self):
+        return hash(self._listener)
+
+
+class DeliveryQueue:
+    """
+    Bounded queue delivering events to listeners outside of the tick.
+
+    Without executor the queue is deferred: the events are delivered by
+    drain, e.g. at the end of every tick of a runner (see attach_runner).
+    With executor the events are delivered by a task of the executor, in
+    the order they were queued.
+
+    A listener is wrapped by the queue and registered as usual:
+
+        queue = DeliveryQueue(max_depth = 1000)
+        queue.attach_runner(runner)
+        value.add_change_listener(queue.wrap(recorder.record))
+
+    A deferred listener sees the value at delivery time when it reads
+    source.value, and datasets are mutated in place. Old and new value of
+    the event are the ones of the change.
+    """
+    def __init__(self, max_depth = 10000, overflow = OverflowPolicy.DropOldest, executor = None):
+        """
+        Parameters
+        ----------
+        max_depth : int, optional
+                Maximum number of queued events.
+
+        overflow : OverflowPolicy, optional
+                Behaviour on a full queue.
+
+        executor : concurrent.futures.Executor, optional
+                Executor delivering the events. Deferred delivery if None.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        if max_depth < 1:
+            raise Exception("Maximum depth has to be at least 1")
+
+        self._max_depth = max_depth
+        self._overflow = overflow
+        self._executor = executor
+        self._condition = threading.Condition()
+        self._events = collections.deque()
+        self._scheduled = False
+        self._delivering = None
+        self._peak = 0
+        self._delivered = 0
+        self._dropped = 0
+        self._errors = 0
+
+    @property
+    def max_depth(self):
+        return self._max_depth
+
+    @property
+    def overflow(self):
+        return self._overflow
+
+    @property
+    def depth(self):
+        """
+        Return: number of queued events
+        """
+        return len(self._events)
+
+    @property
+    def peak(self):
+        """
+        Return: highest depth since creation or reset_statistics
+        """
+        return self._peak
+
+    @property
+    def delivered(self):
+        return self._delivered
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    @property
+    def errors(self):
+        """
+        Return: number of deliveries which raised an exception
+        """
+        return self._errors
+
+    def reset_statistics(self):
+        with self._condition:
+            self._peak = len(self._events)
+            self._delivered = 0
+            self._dropped = 0
+            self._errors = 0
+
+    def wrap(self, listener):
+        """
+        Return: listener queuing its calls, for any listener protocol
+        """
+        return _QueuedListener(self, listener)
+
+    def attach_runner(self, runner):
+        """
+        Drain the queue at the end of every tick of runner
+
+        """
+        if self._executor is not None:
+            raise Exception("Queue is drained by its executor")
+        runner.add_tick_listener(lambda callback, source: self.drain())
+
+    def _put(self, listener, args):
+        with self._condition:
+            events = self._events
+
+            if len(events) >= self._max_depth:
+                if self._overflow == OverflowPolicy.DropNewest:
+                    self._dropped += 1
+                    return
+
+                # a listener waiting for its own delivery thread would block forever
+                if self._overflow == OverflowPolicy.Block and self._executor is not None \
+                        and self._delivering != threading.get_ident():
+                    while len(events) >= self._max_depth:
+                        self._condition.wait()
+                else:
+                    events.popleft()
+                    self._dropped += 1
+
+            events.append((listener, args))
+            if len(events) > self._peak:
+                self._peak = len(events)
+
+            if self._executor is not None and not self._scheduled:
+                self._scheduled = True
+                self._executor.submit(self._drain_scheduled)
+
+    def drain(self):
+        """
+        Deliver all queued events in the calling thread
+
+        Returns
+        -------
+        int
+            Number of delivered events.
+
+        """
+        count = 0
+        failed = False
+
+        while True:
+            with self._condition:
+                # the statistics of the previous delivery
+                if count:
+                    self._delivered += 1
+                    if failed:
+                        self._errors += 1
+
+                if not self._events:
+                    return count
+                listener, args = self._events.popleft()
+                self._condition.notify()
+
+            try:
+                listener(*args)
+                failed = False
+            except Exception:
+                failed = True
+                self.logger.exception("Deferred listener failed")
+
+            count += 1
+
+    def _drain_scheduled(self):
+        with self._condition:
+            self._delivering = threading.get_ident()
+
+        while True:
+            self.drain()
+
+            with self._condition:
+                if not self._events:
+                    self._scheduled = False
+                    self._delivering = None
+                    return
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+
+from iomodel.common.base import ValueDataType, copy_value
+from iomodel.common.clock import get_default_clock
+
+
+# Typecodes of the value arrays by datatype, other datatypes use a list
+_TYPECODES = {ValueDataType.Float: "d",
+              ValueDataType.Int: "q",
+              ValueDataType.Boolean: "b"}
+
+
+class ValueHistory:
+    """
+    Ring buffer of the last depth changes of a value.
+
+    Timestamps (model wall time in seconds) and values are stored in
+    preallocated typed arrays, so appending is O(1) and does not allocate.
+    Values of other datatypes, and values which do not fit the array of
+    their datatype, e.g. an int above int64, are stored in a list.
+
+    Reads return memoryviews on the arrays without copying. Since the
+    buffer wraps around, a read consists of up to two segments in
+    chronological order. The views are only valid until the next append.
+    Boolean values are stored as 0 and 1, latest and to_list return them
+    as bool.
+    """
+    def __init__(self, depth, datatype = ValueDataType.Unknown):
+        """
+        Parameters
+        ----------
+        depth : int
+                Number of changes kept.
+
+        datatype : ValueDataType, optional
+                Selects the array type of the values.
+
+        """
+        if depth < 1:
+            raise Exception("History depth has to be at least 1")
+
+        self._depth = depth
+        self._next = 0
+        self._count = 0
+        self._boolean = datatype == ValueDataType.Boolean
+        self._times = array("d", bytes(8 * depth))
+
+        typecode = _TYPECODES.get(datatype)
+        if typecode is None:
+            self._values = [None] * depth
+        else:
+            self._values = array(typecode, bytes(array(typecode).itemsize * depth))
+
+        self._allocated = self.size
+
+    @staticmethod
+    def size_of(depth, datatype = ValueDataType.Unknown):
+        """
+        Return: bytes allocated by the buffers of a history, counting 8
+        bytes per entry of a list
+        """
+        typecode = _TYPECODES.get(datatype)
+        itemsize = 8 if typecode is None else array(typecode).itemsize
+        return depth * (8 + itemsize)
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @property
+    def size(self):
+        """
+        Return: bytes allocated by the buffers
+        """
+        if isinstance(self._values, list):
+            return self._depth * 16
+        return self._depth * (8 + self._values.itemsize)
+
+    @property
+    def allocated(self):
+        """
+        Return: bytes allocated by the buffers when the history was
+        created, size grows if Boolean values fall back to a list
+        """
+        return self._allocated
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        index = self._next
+
+        try:
+            self._values[index] = value
+        except (TypeError, OverflowError):
+            self._values = self._values_list(self._values)
+            self._values[index] = value
+
+        self._times[index] = timestamp
+
+        index += 1
+        self._next = 0 if index == self._depth else index
+        if self._count < self._depth:
+            self._count += 1
+
+    def latest(self):
+        """
+        Return: (timestamp, value) of the last change, or None
+        """
+        if self._count == 0:
+            return None
+        index = self._next - 1
+        value = self._values[index]
+        if self._boolean and not isinstance(self._values, list):
+            value = value != 0
+        return self._times[index], value
+
+    def _values_list(self, values):
+        if isinstance(values, list):
+            return values
+        if self._boolean:
+            return [value != 0 for value in values]
+        return values.tolist()
+
+    def segments(self, start = None, end = None):
+        """
+        Return the changes with start <= timestamp <= end
+
+        Parameters
+        ----------
+        start : float, optional
+                Model wall time, by default the oldest change.
+
+        end : float, optional
+                Model wall time, by default the last change.
+
+        Returns
+        -------
+        list
+            Up to two tuples (timestamps, values) in chronological order.
+            Both are memoryviews, or slices of the list for values stored
+            in a list.
+
+        """
+        if self._count < self._depth:
+            ranges = [(0, self._count)]
+        elif self._next == 0:
+            ranges = [(0, self._depth)]
+        else:
+            ranges = [(self._next, self._depth), (0, self._next)]
+
+        times = memoryview(self._times)
+        values = self._values if isinstance(self._values, list) else memoryview(self._values)
+        result = []
+
+        for first, last in ranges:
+            if start is not None:
+                first = bisect_left(times, start, first, last)
+            if end is not None:
+                last = bisect_right(times, end, first, last)
+            if first < last:
+                result.append((times[first:last], values[first:last]))
+
+        return result
+
+    def to_list(self, start = None, end = None):
+        """
+        Return: copy of the changes with start <= timestamp <= end as list
+        of (timestamp, value)
+        """
+        result = []
+        for times, values in self.segments(start, end):
+            result.extend(zip(times.tolist(), self._values_list(values)))
+        return result
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+
+class _Pattern:
+    """
+    Change listener of the values matching a pattern enabled at a
+    HistoryRecorder
+    """
+    __slots__ = ("recorder", "pattern", "depth", "subscription")
+
+    def __init__(self, recorder, pattern, depth):
+        self.recorder = recorder
+        self.pattern = pattern
+        self.depth = depth
+        self.subscription = None
+
+    def __call__(self, source, old_value, new_value):
+        self.recorder._value_changed(self, source)
+
+
+class HistoryRecorder:
+    """
+    Records the changes of the values of a model tree into ValueHistory
+    ring buffers.
+
+    The values are selected by glob patterns of ModelIndex.glob, each
+    pattern with its own depth. The buffers of the matching values are
+    allocated when a pattern is enabled and stay within the memory limit
+    of the recorder. Values added to the tree later are matched by an
+    index subscription, their buffer is allocated on their first change.
+    If it does not fit the memory limit, the value is not recorded.
+
+    Recorded are the reported changes of a value, so a value filter of the
+    value also thins out its history. A value matching several patterns
+    is recorded with the depth of the pattern enabled last.
+    """
+    def __init__(self, model, memory_limit = None, clock = None):
+        """
+        Parameters
+        ----------
+        model : ModelDevice
+                Root of the values. An index is attached, if it has none.
+
+        memory_limit : int, optional
+                Maximum bytes of all buffers together.
+
+        clock : SimulationClock, optional
+                Source of the timestamps. The default clock is used if None.
+
+        """
+        from iomodel.common.index import ModelIndex
+
+        self.logger = logging.getLogger(__name__)
+
+        self._index = model.index if model.index is not None else ModelIndex(model)
+        self._memory_limit = memory_limit
+        self._clock = clock
+        self._histories = {}
+        self._owners = {}
+        self._patterns = []
+        self._memory = 0
+
+    @property
+    def memory(self):
+        """
+        Return: bytes allocated by all buffers
+        """
+        return self._memory
+
+    @property
+    def memory_limit(self):
+        return self._memory_limit
+
+    def __len__(self):
+        return len(self._histories)
+
+    def history(self, model_value):
+        """
+        Return: ValueHistory of model_value, or None
+        """
+        return self._histories.get(model_value)
+
+    def __getitem__(self, path):
+        return self._histories[self._index[path]]
+
+    def enable(self, pattern, depth):
+        """
+        Record all values matching pattern with depth changes each, now
+        or when added later. The memory charged for a history is its size
+        when created, also if Boolean or numeric values fall back to a
+        list later.
+        The depth of values which are already recorded is changed, their
+        history is cleared.
+
+        Returns
+        -------
+        list
+            Recorded values.
+
+        """
+        values = self._index.glob(pattern)
+
+        required = self._memory
+        for model_value in values:
+            required += ValueHistory.size_of(depth, model_value.datatype)
+            if model_value in self._histories:
+                required -= self._histories[model_value].allocated
+
+        if self._memory_limit is not None and required > self._memory_limit:
+            raise Exception("History of {} values with depth {} needs {} bytes, limit is {}".format(
+                len(values), depth, required, self._memory_limit))
+
+        # the pattern enabled again replaces its earlier depth
+        self._cancel(pattern)
+
+        entry = _Pattern(self, pattern, depth)
+        for model_value in values:
+            self._allocate(model_value, entry)
+
+        entry.subscription = self._index.subscribe(pattern, entry)
+        self._patterns.append(entry)
+
+        return values
+
+    def disable(self, pattern):
+        """
+        Stop recording the values of the enabled pattern and free their
+        buffers. A value still matching another enabled pattern stays
+        recorded: its history is kept if the depth is the same, otherwise
+        a new one is allocated on its next change.
+
+        """
+        removed = self._cancel(pattern)
+
+        for model_value, owner in list(self._owners.items()):
+            if owner not in removed:
+                continue
+
+            history = self._histories.pop(model_value)
+            del self._owners[model_value]
+            self._memory -= history.allocated
+
+            path = self._index.path_of(model_value)
+            entries = [entry for entry in self._patterns if entry.subscription.matches(path)]
+
+            if entries and entries[-1].depth == history.depth:
+                self._histories[model_value] = history
+                self._owners[model_value] = entries[-1]
+                self._memory += history.allocated
+
+    def _cancel(self, pattern):
+        """
+        Return: enabled entries of pattern, which are removed
+        """
+        removed = [entry for entry in self._patterns if entry.pattern == pattern]
+        for entry in removed:
+            entry.subscription.cancel()
+            self._patterns.remove(entry)
+        return removed
+
+    def _allocate(self, model_value, entry):
+        history = self._histories.get(model_value)
+        if history is not None:
+            self._memory -= history.allocated
+
+        history = ValueHistory(entry.depth, model_value.datatype)
+        self._histories[model_value] = history
+        self._owners[model_value] = entry
+        self._memory += history.allocated
+        return history
+
+    def _value_changed(self, entry, source):
+        history = self._histories.get(source)
+
+        if history is None:
+            # added after the pattern was enabled, the last matching pattern
+            # selects the depth
+            path = self._index.path_of(source)
+            owner = [entry for entry in self._patterns if entry.subscription.matches(path)][-1]
+
+            size = ValueHistory.size_of(owner.depth, source.datatype)
+            if self._memory_limit is not None and self._memory + size > self._memory_limit:
+                self.logger.warning("History of %s exceeds the memory limit, it is not recorded", path)
+                for pattern in self._patterns:
+                    source.remove_change_listener(pattern)
+                return
+            history = self._allocate(source, owner)
+
+        if self._owners[source] is not entry:
+            return
+
+        history.append((self._clock or get_default_clock()).time(), copy_value(source.value))
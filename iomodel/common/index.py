@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+from fnmatch import fnmatchcase
+
+from iomodel.common.base import ModelDevice, ModelValue, walk
+
+
+class _Node:
+    __slots__ = ("children", "obj")
+
+    def __init__(self):
+        self.children = {}
+        self.obj = None
+
+
+def _is_wildcard(segment):
+    return "*" in segment or "?" in segment or "[" in segment
+
+
+def _match_segments(segments, position, parts, index):
+    """
+    Returns True if the path segments parts[index:] match the glob
+    segments[position:]
+    """
+    while position < len(segments):
+        segment = segments[position]
+
+        if segment == "**":
+            return any(_match_segments(segments, position + 1, parts, i) for i in range(index, len(parts) + 1))
+
+        if index == len(parts):
+            return False
+
+        if _is_wildcard(segment):
+            if not fnmatchcase(parts[index], segment):
+                return False
+        elif parts[index] != segment:
+            return False
+
+        position += 1
+        index += 1
+
+    return index == len(parts)
+
+
+class Subscription:
+    """
+    Change listener of all values of an index whose path matches a glob
+    pattern or a regular expression, including values added later.
+
+    The pattern is matched once per value, when the subscription is made
+    or the value is added. The listener is registered at every matching
+    value, so a change only calls the subscriptions of its value.
+    """
+    def __init__(self, index, pattern, listener, regex = False, delivery = None):
+        self._index = index
+        self._pattern = pattern
+        self._listener = listener
+        self._delivery = delivery
+        self._values = []
+
+        if regex:
+            self._regex = re.compile(pattern)
+            self._segments = None
+        else:
+            self._regex = None
+            self._segments = pattern.strip("/").split("/")
+
+    @property
+    def pattern(self):
+        return self._pattern
+
+    @property
+    def values(self):
+        """
+        Return: values the listener is registered at
+        """
+        return list(self._values)
+
+    def matches(self, path):
+        if self._regex is not None:
+            return self._regex.fullmatch(path) is not None
+        return _match_segments(self._segments, 0, path.split("/"), 0)
+
+    def _attach(self, model_value):
+        model_value.add_change_listener(self._listener, self._delivery)
+        self._values.append(model_value)
+
+    def cancel(self):
+        """
+        Remove the listener from all values, no further values are matched
+
+        """
+        for model_value in self._values:
+            model_value.remove_change_listener(self._listener)
+
+        self._values = []
+        self._index._subscriptions.remove(self)
+
+
+class ModelIndex:
+    """
+    Index of all objects below a device by path.
+
+    The path of an object consists of the qualified names of its parent
+    devices below the root and its own qualified name, joined by "/",
+    e.g. "PLC_A2_K3_Logistics/211/Drive/Current". The index is kept up to
+    date by ModelDevice.add_child.
+
+    Exact lookups use a dictionary, prefix and glob queries a trie over
+    the path segments.
+    """
+    def __init__(self, root):
+        """
+        Parameters
+        ----------
+        root : ModelDevice
+                Device to be indexed. Paths are relative to root.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        if not isinstance(root, ModelDevice):
+            raise Exception("Index root is no device")
+
+        if root.index is not None:
+            raise Exception("Device is already indexed")
+
+        self._root = root
+        self._trie = _Node()
+        self._paths = {}
+        self._prefixes = {root: ""}
+        self._subscriptions = []
+
+        for prefix, child in walk(root):
+            self._add(prefix + child.qualified_name, child)
+
+        root._index = self
+
+    @property
+    def root(self):
+        return self._root
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def get(self, path, default = None):
+        """
+        Return: object at path, or default
+        """
+        return self._paths.get(path, default)
+
+    def __getitem__(self, path):
+        return self._paths[path]
+
+    def path_of(self, obj):
+        """
+        Return: path of an indexed object
+        """
+        parent = obj.parent
+        if parent not in self._prefixes:
+            raise Exception("Object is not part of the index")
+        return self._prefixes[parent] + obj.qualified_name
+
+    def _child_added(self, device, child):
+        if device in self._prefixes:
+            self._insert(device, child)
+
+    def _insert(self, device, child):
+        path = self._prefixes[device] + child.qualified_name
+        self._add(path, child)
+
+        if isinstance(child, ModelDevice):
+            for prefix, obj in walk(child, path + "/"):
+                self._add(prefix + obj.qualified_name, obj)
+
+    def _add(self, path, child):
+        if path in self._paths:
+            self.logger.warning("Path %s is not unique", path)
+
+        self._paths[path] = child
+
+        node = self._trie
+        for segment in path.split("/"):
+            node = node.children.setdefault(segment, _Node())
+        node.obj = child
+
+        if isinstance(child, ModelValue):
+            for subscription in self._subscriptions:
+                if subscription.matches(path):
+                    subscription._attach(child)
+
+        if isinstance(child, ModelDevice):
+            self._prefixes[child] = path + "/"
+
+    def _collect(self, node, result):
+        if node.obj is not None:
+            result.append(node.obj)
+        for child in node.children.values():
+            self._collect(child, result)
+
+    def find(self, prefix = "", devices = False):
+        """
+        Return all objects whose path starts with the segments of prefix,
+        e.g. "3_A3/CX331/" for everything of conveyor CX331
+
+        Parameters
+        ----------
+        prefix : str
+                Path segments, a trailing "/" is ignored.
+
+        devices : bool, optional
+                Include devices, by default only values are returned.
+
+        """
+        node = self._trie
+        prefix = prefix.strip("/")
+
+        if prefix:
+            for segment in prefix.split("/"):
+                node = node.children.get(segment)
+                if node is None:
+                    return []
+
+        result = []
+        self._collect(node, result)
+        return self._filter(result, devices)
+
+    def glob(self, pattern, devices = False):
+        """
+        Return all objects whose path matches pattern.
+
+        Every segment of pattern is matched against one path segment with
+        the wildcards of fnmatch ("*", "?", "[...]"). The segment "**"
+        matches any number of segments, e.g. "**/Drive/Current".
+
+        """
+        result = []
+        self._match(self._trie, pattern.strip("/").split("/"), 0, result)
+        return self._filter(list(dict.fromkeys(result)), devices)
+
+    def _match(self, node, segments, position, result):
+        if position == len(segments):
+            if node.obj is not None:
+                result.append(node.obj)
+            return
+
+        segment = segments[position]
+
+        if segment == "**":
+            self._match(node, segments, position + 1, result)
+            for child in node.children.values():
+                self._match(child, segments, position, result)
+
+        elif _is_wildcard(segment):
+            for name, child in node.children.items():
+                if fnmatchcase(name, segment):
+                    self._match(child, segments, position + 1, result)
+
+        else:
+            child = node.children.get(segment)
+            if child is not None:
+                self._match(child, segments, position + 1, result)
+
+    def subscribe(self, pattern, listener, regex = False, delivery = None):
+        """
+        Call listener(source, old_value, new_value) on every change of a
+        value whose path matches pattern, now or when added later
+
+        Parameters
+        ----------
+        pattern : str
+                Glob pattern as of glob, e.g. "**/Drive/Current", or a
+                regular expression matching the whole path.
+
+        listener : callable
+                Change listener, see ModelValue.add_change_listener.
+
+        regex : bool, optional
+                pattern is a regular expression.
+
+        delivery : DeliveryQueue, optional
+                Queue delivering the changes outside of the tick.
+
+        Returns
+        -------
+        Subscription
+            Cancel it to stop listening.
+
+        """
+        subscription = Subscription(self, pattern, listener, regex, delivery)
+
+        if regex:
+            values = [v for path, v in self._paths.items() if isinstance(v, ModelValue) and subscription.matches(path)]
+        else:
+            values = self.glob(pattern)
+
+        for model_value in values:
+            subscription._attach(model_value)
+
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def _filter(self, objects, devices):
+        if devices:
+            return objects
+        return [obj for obj in objects if isinstance(obj, ModelValue)]
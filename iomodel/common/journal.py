@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import collections
+import threading
+
+from iomodel.common.base import activate_journal
+
+
+class _Segment:
+    """
+    Changes of one tick, as parallel lists
+    """
+    __slots__ = ("sequence", "time", "values", "old_values", "new_values")
+
+    def __init__(self, sequence, time):
+        self.sequence = sequence
+        self.time = time
+        self.values = []
+        self.old_values = []
+        self.new_values = []
+
+
+class ChangeJournal:
+    """
+    Append-only journal of the reported value changes of a runner.
+
+    The runner starts a new segment with every tick. All changes reported
+    by the runner thread (the changes passing the value filters) are
+    appended to the current segment, without calling any listener. The
+    last retained_ticks segments are kept.
+
+    Consumers read the journal in bulk with a JournalCursor, each at its
+    own pace:
+
+        cursor = runner.enable_journal().cursor()
+        ...
+        for model_value, old_value, new_value, time in cursor.read():
+            ...
+
+    Changes made by other threads, or by the runner thread between its
+    ticks, are not journaled. Inbound writes applied by a tick listener,
+    e.g. of a connector in lockstep mode, are journaled with the tick they
+    follow.
+    """
+    def __init__(self, retained_ticks = 16):
+        """
+        Parameters
+        ----------
+        retained_ticks : int, optional
+                Number of ticks kept for cursors which read less often
+                than every tick.
+
+        """
+        if retained_ticks < 1:
+            raise Exception("At least one tick has to be retained")
+
+        self._lock = threading.Lock()
+        self._retained_ticks = retained_ticks
+        self._segments = collections.deque()
+        self._current = _Segment(0, None)
+        self._segments.append(self._current)
+
+    @property
+    def retained_ticks(self):
+        return self._retained_ticks
+
+    @property
+    def sequence(self):
+        """
+        Return: number of the current tick
+        """
+        return self._current.sequence
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(segment.values) for segment in self._segments)
+
+    def begin_tick(self, time):
+        """
+        Start the segment of a new tick and record the changes of the
+        calling thread. Called by the runner.
+
+        Parameters
+        ----------
+        time : float
+                Model wall time of the tick.
+
+        """
+        segment = _Segment(self._current.sequence + 1, time)
+
+        with self._lock:
+            self._segments.append(segment)
+            self._current = segment
+            while len(self._segments) > self._retained_ticks:
+                self._segments.popleft()
+
+        activate_journal(self)
+
+    def end(self):
+        """
+        Stop recording the changes of the calling thread
+
+        """
+        activate_journal(None)
+
+    def append(self, model_value, old_value, new_value):
+        segment = self._current
+        segment.values.append(model_value)
+        segment.old_values.append(old_value)
+        segment.new_values.append(new_value)
+
+    def cursor(self):
+        """
+        Return: JournalCursor reading the changes appended from now on
+        """
+        with self._lock:
+            segment = self._current
+            return JournalCursor(self, segment.sequence, len(segment.values))
+
+    def _read(self, sequence, position):
+        """
+        Returns the segments and start positions from the position of a
+        cursor on, and the number of lost ticks.
+
+        """
+        with self._lock:
+            first = self._segments[0].sequence
+            lost = 0
+
+            if sequence < first:
+                # ticks after the one of the cursor which were dropped
+                lost = first - sequence - 1
+                sequence, position = first, 0
+
+            parts = []
+            for segment in self._segments:
+                if segment.sequence < sequence:
+                    continue
+                # the runner may append concurrently, so take the length
+                # of the list completed last
+                end = len(segment.new_values)
+                parts.append((segment, position if segment.sequence == sequence else 0, end))
+
+        return parts, lost
+
+
+class JournalCursor:
+    """
+    Read position of a consumer in a ChangeJournal.
+    """
+    def __init__(self, journal, sequence, position):
+        self._journal = journal
+        self._sequence = sequence
+        self._position = position
+        self._lost = 0
+
+    @property
+    def lost(self):
+        """
+        Return: number of ticks dropped by the journal before this cursor
+        read them, e.g. to trigger a full resync of the consumer
+        """
+        return self._lost
+
+    def read(self, coalesce = False):
+        """
+        Return the changes since the last read
+
+        Parameters
+        ----------
+        coalesce : bool, optional
+                Return every changed value once, with its first old value
+                and its last new value.
+
+        Returns
+        -------
+        list
+            Tuples (value, old value, new value, model time of the tick),
+            in the order of the changes, or of the first change of every
+            value if coalesced.
+
+        """
+        parts, lost = self._journal._read(self._sequence, self._position)
+        self._lost += lost
+        changes = []
+
+        for segment, start, end in parts:
+            time = segment.time
+            changes.extend(zip(segment.values[start:end], segment.old_values[start:end],
+                               segment.new_values[start:end], [time] * (end - start)))
+            self._sequence = segment.sequence
+            self._position = end
+
+        if not coalesce:
+            return changes
+
+        coalesced = {}
+        for model_value, old_value, new_value, time in changes:
+            if model_value in coalesced:
+                old_value = coalesced[model_value][1]
+            coalesced[model_value] = (model_value, old_value, new_value, time)
+        return list(coalesced.values())
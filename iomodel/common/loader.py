@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pickle
+
+from iomodel.common import base, components
+from iomodel.common.base import ModelDevice, ModelValue, ValueDataType
+from iomodel.common.template import DeviceTemplate, value_factory
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# Part of the cache key, to be incremented when the compiled form changes
+COMPILED_VERSION = 1
+
+CACHE_DIRECTORY = "__iomodel_cache__"
+
+
+class CompiledModel:
+    """
+    Validated form of a model spec: classes resolved, datatypes converted,
+    everything ready to construct. Stored pickled in the cache.
+
+    The model is a tree of tuples:
+
+        ("device", class, name, kwargs, children)
+        ("value", class, name, kwargs)
+        ("stamp", template name, prefixes, values)
+
+    A template is a list of ("value", ...) and ("include", template name,
+    prefix) entries.
+    """
+    def __init__(self, templates, model):
+        self._templates = templates
+        self._model = model
+
+    @property
+    def templates(self):
+        return self._templates
+
+    @property
+    def model(self):
+        return self._model
+
+    def build(self, parent = None):
+        """
+        Return: root device of a new model tree, added to parent if given
+        """
+        self._templates_built = {}
+        self._factories = {}
+        try:
+            return self._build_device(self._model, parent)
+        finally:
+            del self._templates_built
+            del self._factories
+
+    def _template(self, name):
+        templates = self._templates_built
+
+        if name not in templates:
+            template = DeviceTemplate(name)
+
+            for entry in self._templates[name]:
+                if entry[0] == "include":
+                    template.include(self._template(entry[1]), entry[2])
+                else:
+                    template.add(entry[1], entry[2], **entry[3])
+
+            templates[name] = template
+        return templates[name]
+
+    def _factory(self, node):
+        """
+        Values are created by factories shared by all values of the same
+        class and arguments, the constructors only run once per factory
+        """
+        key = (node[1], repr(sorted(node[3].items())))
+
+        if key not in self._factories:
+            self._factories[key] = value_factory(node[1], **node[3])
+        return self._factories[key]
+
+    def _build_device(self, node, parent):
+        device = node[1](node[2], parent, **node[3])
+        values = []
+
+        for child in node[4]:
+            kind = child[0]
+
+            if kind == "value":
+                values.append(self._factory(child)(child[2], device))
+                continue
+
+            if values:
+                device.add_children(values)
+                values = []
+
+            if kind == "device":
+                self._build_device(child, device)
+            else:
+                self._stamp(child, device)
+
+        if values:
+            device.add_children(values)
+        return device
+
+    def _stamp(self, node, device):
+        template = self._template(node[1])
+        positions = [(template.position(name), value) for name, value in node[3].items()]
+
+        for prefix in node[2]:
+            values = template.stamp(device, prefix)
+            for position, value in positions:
+                values[position].set_value_silent(value)
+
+
+class ModelLoader:
+    """
+    Builds model trees from a JSON or YAML spec.
+
+    The spec names a root device and optionally templates:
+
+        templates:
+          Drive:
+            - {name: Current, class: Variant, initial: 0.0, datatype: Float}
+            - {name: DriveOn, class: Switch}
+        model:
+          name: Plant
+          children:
+            - name: 1_A1
+              children:
+                - {name: Type, initial: Area, datatype: String}
+                - {template: Drive, prefixes: ["211/Drive/", "212/Drive/"]}
+
+    A node with children is a device, a node with template stamps the
+    template once per prefix, every other node is a value. Classes are
+    names of iomodel.common.components and iomodel.common.base, or dotted
+    paths "module.Class". Values are Variants by default, devices
+    ModelDevices. All other keys are passed to the constructor; datatype
+    and the datatypes of columns are given by their ValueDataType name.
+
+    The compiled form of a spec is cached in a directory beside the spec,
+    keyed by the hash of the spec file. Loading an unchanged spec skips
+    parsing and validation.
+    """
+    def __init__(self, cache_directory = None, use_cache = True):
+        """
+        Parameters
+        ----------
+        cache_directory : str, optional
+                Directory of the compiled specs. The default is a directory
+                __iomodel_cache__ beside each spec.
+
+        use_cache : bool, optional
+                Read and write compiled specs.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        self._cache_directory = cache_directory
+        self._use_cache = use_cache
+
+    def load(self, path, parent = None):
+        """
+        Return: root device built from the spec file at path
+        """
+        return self.compile_file(path).build(parent)
+
+    def compile_file(self, path):
+        """
+        Return: CompiledModel of the spec file at path, from the cache if
+        the spec did not change
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if not self._use_cache:
+            return self.compile(self._parse(path, data))
+
+        key = hashlib.sha256(data + str(COMPILED_VERSION).encode("ascii")).hexdigest()
+        cache_path = self._cache_path(path, key)
+
+        try:
+            with open(cache_path, "rb") as f:
+                compiled = pickle.load(f)
+            self.logger.debug("Compiled model %s loaded from %s", path, cache_path)
+            return compiled
+        except FileNotFoundError:
+            pass
+        except Exception:
+            self.logger.warning("Cached model %s is unreadable, compiling again", cache_path)
+
+        compiled = self.compile(self._parse(path, data))
+        self._write_cache(cache_path, compiled)
+        return compiled
+
+    def _cache_path(self, path, key):
+        directory = self._cache_directory
+        if directory is None:
+            directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY)
+        return os.path.join(directory, key + ".pickle")
+
+    def _write_cache(self, cache_path, compiled):
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+            temporary = cache_path + ".tmp" + str(os.getpid())
+            with open(temporary, "wb") as f:
+                pickle.dump(compiled, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, cache_path)
+        except OSError as e:
+            self.logger.warning("Compiled model not cached: %s", e)
+
+    def _parse(self, path, data):
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise Exception("YAML specs require PyYAML")
+            return yaml.safe_load(data)
+        return json.loads(data)
+
+    def compile(self, spec):
+        """
+        Return: CompiledModel of a parsed spec
+        """
+        if not isinstance(spec, dict) or "model" not in spec:
+            raise Exception("Model spec has no model")
+
+        raw_templates = spec.get("templates", {})
+        templates = {}
+
+        for name, entries in raw_templates.items():
+            templates[name] = [self._compile_template_entry(entry, name, raw_templates) for entry in entries]
+
+        self._check_includes(templates)
+
+        model = self._compile_node(spec["model"], "", templates)
+        if model[0] != "device":
+            raise Exception("Model root is no device")
+
+        return CompiledModel(templates, model)
+
+    def _compile_template_entry(self, entry, template, raw_templates):
+        location = "template " + template
+
+        if "include" in entry:
+            if entry["include"] not in raw_templates:
+                raise Exception("Unknown template {} in {}".format(entry["include"], location))
+            return ("include", entry["include"], entry.get("prefix", ""))
+
+        return self._compile_value(entry, location)
+
+    def _check_includes(self, templates):
+        def visit(name, active):
+            if name in active:
+                raise Exception("Template {} includes itself".format(name))
+            for entry in templates[name]:
+                if entry[0] == "include":
+                    visit(entry[1], active + [name])
+
+        for name in templates:
+            visit(name, [])
+
+    def _compile_node(self, node, location, templates):
+        if not isinstance(node, dict):
+            raise Exception("Model node at {} is no mapping".format(location or "/"))
+
+        if "template" in node:
+            if node["template"] not in templates:
+                raise Exception("Unknown template {} at {}".format(node["template"], location or "/"))
+
+            prefixes = node.get("prefixes", [node.get("prefix", "")])
+            values = dict(node.get("values", {}))
+            names = self._template_names(node["template"], templates, "")
+
+            for name in values:
+                if name not in names:
+                    raise Exception("Template {} has no value {}".format(node["template"], name))
+
+            return ("stamp", node["template"], list(prefixes), values)
+
+        if "children" not in node:
+            return self._compile_value(node, location)
+
+        name = self._name(node, location)
+        location = location + "/" + name
+        cls = self._resolve(node.get("class", "ModelDevice"), ModelDevice, location)
+        kwargs = self._kwargs(node, ("name", "class", "children"))
+        children = [self._compile_node(child, location, templates) for child in node["children"]]
+
+        return ("device", cls, name, kwargs, children)
+
+    def _template_names(self, template, templates, prefix):
+        names = set()
+        for entry in templates[template]:
+            if entry[0] == "include":
+                names.update(self._template_names(entry[1], templates, prefix + entry[2]))
+            else:
+                names.add(prefix + entry[2])
+        return names
+
+    def _compile_value(self, node, location):
+        name = self._name(node, location)
+        cls = self._resolve(node.get("class", "Variant"), ModelValue, location + "/" + name)
+        return ("value", cls, name, self._kwargs(node, ("name", "class")))
+
+    def _name(self, node, location):
+        name = node.get("name")
+        if not isinstance(name, str) or not name:
+            raise Exception("Model node at {} has no name".format(location or "/"))
+        return name
+
+    def _kwargs(self, node, reserved):
+        kwargs = {}
+
+        for key, value in node.items():
+            if key in reserved:
+                continue
+
+            if key == "datatype":
+                value = self._datatype(value)
+            elif key == "columns":
+                value = [(column, self._datatype(datatype)) for column, datatype in value]
+
+            kwargs[key] = value
+        return kwargs
+
+    def _datatype(self, name):
+        try:
+            return ValueDataType[name]
+        except KeyError:
+            raise Exception("Unknown datatype {}".format(name))
+
+    def _resolve(self, name, base_class, location):
+        if "." in name:
+            module_name, _, class_name = name.rpartition(".")
+            cls = getattr(importlib.import_module(module_name), class_name, None)
+        else:
+            cls = getattr(components, name, None) or getattr(base, name, None)
+
+        if not isinstance(cls, type) or not issubclass(cls, base_class):
+            raise Exception("Class {} at {} is no {}".format(name, location, base_class.__name__))
+
+        return cls
+
+
+def load_model(path, parent = None, cache_directory = None):
+    """
+    Return: root device built from the spec file at path
+    """
+    return ModelLoader(cache_directory).load(path, parent)
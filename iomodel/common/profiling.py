@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+import threading
+import json
+from timeit import default_timer as timer
+
+
+class LoopProfile:
+    """
+    Loop durations of one model object.
+
+    The histogram counts durations in buckets of powers of two in
+    microseconds: bucket 0 holds durations below 1 us, bucket n durations
+    from 2^(n-1) us up to 2^n us. The last bucket holds everything above.
+    """
+    BUCKETS = 24
+
+    def __init__(self, name):
+        self._name = name
+        self._calls = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._histogram = [0] * LoopProfile.BUCKETS
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def calls(self):
+        return self._calls
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def max(self):
+        return self._max
+
+    @property
+    def mean(self):
+        if self._calls == 0:
+            return 0.0
+        return self._total / self._calls
+
+    @property
+    def histogram(self):
+        return list(self._histogram)
+
+    def record(self, duration):
+        self._calls += 1
+        self._total += duration
+        if duration > self._max:
+            self._max = duration
+
+        bucket = int(duration * 1000000).bit_length()
+        if bucket >= LoopProfile.BUCKETS:
+            bucket = LoopProfile.BUCKETS - 1
+        self._histogram[bucket] += 1
+
+    def as_dict(self):
+        return {"name": self.name,
+                "calls": self.calls,
+                "total": self.total,
+                "mean": self.mean,
+                "max": self.max,
+                "histogram": self.histogram}
+
+
+class TickProfiler:
+    """
+    Per object loop profiling of a ModelRunner.
+
+    Only every sample_interval-th tick of a task group is measured, each
+    group counts its own ticks. The ticks in between only cost a counter
+    increment, so a profiler with a large interval can stay enabled in
+    production.
+
+    Durations are inclusive: the duration of a device with an own loop
+    contains the durations of its children, which are recorded as well.
+    """
+    def __init__(self, sample_interval = 1):
+        """
+        Parameters
+        ----------
+        sample_interval : int, optional
+                Measure every n-th tick. The default measures every tick.
+
+        """
+        if sample_interval < 1:
+            raise Exception("Sample interval has to be at least 1")
+
+        self._sample_interval = sample_interval
+        self._enabled = True
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._sampled_ticks = 0
+        self._profiles = {}
+        self._pending = []
+
+    @property
+    def sample_interval(self):
+        return self._sample_interval
+
+    @sample_interval.setter
+    def sample_interval(self, value):
+        if value < 1:
+            raise Exception("Sample interval has to be at least 1")
+        self._sample_interval = value
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+
+    @property
+    def sampled_ticks(self):
+        return self._sampled_ticks
+
+    def begin_tick(self, group = None):
+        """
+        Returns True if the current tick of group, e.g. a TaskGroup, has
+        to be measured
+
+        """
+        if not self._enabled:
+            return False
+
+        counter = self._counters.get(group, 0) + 1
+        if counter < self._sample_interval:
+            self._counters[group] = counter
+            return False
+
+        self._counters[group] = 0
+        _state.profiler = self
+        return True
+
+    def end_tick(self):
+        _state.profiler = None
+        pending, self._pending = self._pending, []
+
+        with self._lock:
+            self._sampled_ticks += 1
+            for obj, duration in pending:
+                profile = self._profiles.get(obj)
+                if profile is None:
+                    profile = LoopProfile(self._qualified_path(obj))
+                    self._profiles[obj] = profile
+                profile.record(duration)
+
+    def loop_objects(self, objects, tick):
+        """
+        Loop objects and measure each of them
+
+        """
+        for obj in objects:
+            self.loop_object(obj, tick)
+
+    def loop_object(self, obj, tick):
+        """
+        Loop one object and measure it
+
+        """
+        start = timer()
+        obj.loop(tick)
+        self._pending.append((obj, timer() - start))
+
+    def _qualified_path(self, obj):
+        """
+        Qualified name of an object including the names of its parents
+
+        """
+        name = getattr(obj, "qualified_name", None) or type(obj).__name__
+        parent = getattr(obj, "parent", None)
+
+        if parent is not None:
+            return self._qualified_path(parent) + "/" + name
+        return name
+
+    def profiles(self):
+        """
+        Return: list of LoopProfile of all measured objects
+        """
+        with self._lock:
+            return list(self._profiles.values())
+
+    def top(self, count = 10, key = "total"):
+        """
+        Return the slowest objects
+
+        Parameters
+        ----------
+        count : int, optional
+                Number of objects.
+
+        key : str, optional
+                Sort key: "total", "mean" or "max".
+
+        """
+        return sorted(self.profiles(), key = lambda p: getattr(p, key), reverse = True)[0:count]
+
+    def report(self, count = 10, key = "total"):
+        """
+        Return: human readable report of the slowest objects
+        """
+        lines = ["Sampled ticks: {}".format(self._sampled_ticks),
+                 "{:>10} {:>12} {:>12} {:>12}  {}".format("calls", "total [ms]", "mean [us]", "max [us]", "name")]
+
+        for p in self.top(count, key):
+            lines.append("{:>10} {:>12.3f} {:>12.1f} {:>12.1f}  {}".format(
+                p.calls, p.total * 1000, p.mean * 1000000, p.max * 1000000, p.name))
+
+        return "\n".join(lines)
+
+    def dump(self, path = None):
+        """
+        Return all profiles as dictionary and write them as JSON to path,
+        if given.
+
+        """
+        data = {"sampled_ticks": self._sampled_ticks,
+                "sample_interval": self._sample_interval,
+                "profiles": [p.as_dict() for p in self.profiles()]}
+
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(data, f, indent = 1)
+
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._sampled_ticks = 0
+            self._profiles = {}
+
+
+class _ProfilerState(threading.local):
+    profiler = None
+
+
+# profiler measuring the current tick of the calling thread
+_state = _ProfilerState()
+
+
+def active_profiler():
+    """
+    Return: profiler of the tick running in the calling thread, or None
+    """
+    return _state.profiler
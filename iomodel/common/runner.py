@@ -1,52 +1,508 @@
 # -*- coding: utf-8 -*-
 import threading
 import logging
-import time
+import math
+from enum import Enum
+from iomodel.common.clock import get_default_clock
+from iomodel.common.base import ModelDevice, SleepSchedule, Batch, compile_loop_schedule
+from iomodel.common.util_callback import Dispatcher, Callback
+from iomodel.common.journal import ChangeJournal
+from iomodel.common.util_filter import activate_filters, flush_filters
+
+
+class OverrunPolicy(Enum):
+    """
+    Behaviour of the runner when a tick did not finish before the next
+    deadline.
+
+    Skip    : Drop the missed ticks and continue on the original time grid
+    CatchUp : Run the missed ticks back to back until the schedule is met again
+    Stretch : Start the next tick immediately and move the time grid
+    """
+    Skip = 0,
+    CatchUp = 1,
+    Stretch = 2
+
+
+class TickStatistics:
+    """
+    Timing statistics of a scheduled loop.
+
+    Jitter is the delay between the planned deadline and the real start
+    of a tick, given in seconds.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._ticks = 0
+        self._overruns = 0
+        self._skipped = 0
+        self._jitter_last = 0.0
+        self._jitter_max = 0.0
+        self._jitter_sum = 0.0
+        self._duration_last = 0.0
+        self._duration_max = 0.0
+
+    @property
+    def ticks(self):
+        return self._ticks
+
+    @property
+    def overruns(self):
+        return self._overruns
+
+    @property
+    def skipped(self):
+        return self._skipped
+
+    @property
+    def jitter_last(self):
+        return self._jitter_last
+
+    @property
+    def jitter_max(self):
+        return self._jitter_max
+
+    @property
+    def jitter_mean(self):
+        if self._ticks == 0:
+            return 0.0
+        return self._jitter_sum / self._ticks
+
+    @property
+    def duration_last(self):
+        return self._duration_last
+
+    @property
+    def duration_max(self):
+        return self._duration_max
+
+    def record_tick(self, jitter, duration):
+        self._ticks += 1
+        self._jitter_last = jitter
+        self._jitter_sum += jitter
+        if jitter > self._jitter_max:
+            self._jitter_max = jitter
+
+        self._duration_last = duration
+        if duration > self._duration_max:
+            self._duration_max = duration
+
+    def record_overrun(self):
+        self._overruns += 1
+
+    def record_skipped(self, count):
+        self._skipped += count
+
+    def as_dict(self):
+        return {"ticks": self.ticks,
+                "overruns": self.overruns,
+                "skipped": self.skipped,
+                "jitter_last": self.jitter_last,
+                "jitter_max": self.jitter_max,
+                "jitter_mean": self.jitter_mean,
+                "duration_last": self.duration_last,
+                "duration_max": self.duration_max}
+
+
+class TaskGroup:
+    """
+    Models sharing the same period.
+
+    Every group keeps its own time grid and timing statistics. The runner
+    executes due groups rate monotonic, the shortest period first.
+    """
+    def __init__(self, period):
+        self._models = []
+        self._period = period
+        self._statistics = TickStatistics()
+        self._schedule = []
+        self._schedule_version = -1
+        self._sleep_schedule = None
+        self._profiler = None
+        self._batch_ticks = False
+
+        self._origin = 0.0
+        self._count = 0
+        self._grid_period = period
+        self._catch_up = 0
+
+    @property
+    def models(self):
+        return self._models
+
+    @property
+    def period(self):
+        return self._period
+
+    @property
+    def loop_schedule(self):
+        """
+        Return: flat list of all objects of the group implementing loop
+        """
+        self._update_schedule()
+        return self._schedule
+
+    def _update_schedule(self):
+        if self._schedule_version != ModelDevice._topology_version:
+            self._schedule = compile_loop_schedule(self._models)
+            self._schedule_version = ModelDevice._topology_version
+
+            if self._sleep_schedule is not None:
+                self._sleep_schedule.detach()
+            self._sleep_schedule = SleepSchedule(self._schedule)
+
+    @period.setter
+    def period(self, value):
+        self._period = value
+
+    @property
+    def statistics(self):
+        return self._statistics
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, value):
+        self._profiler = value
+
+    @property
+    def batch_ticks(self):
+        return self._batch_ticks
+
+    @batch_ticks.setter
+    def batch_ticks(self, value):
+        self._batch_ticks = value
+
+    @property
+    def deadline(self):
+        """
+        Return: model time of the next tick of this group
+        """
+        if self._grid_period != self._period:
+            # continue the grid from the next deadline with the new period
+            self._origin += self._count * self._grid_period
+            self._count = 0
+            self._grid_period = self._period
+
+        return self._origin + self._count * self._grid_period
+
+    def add_model_object(self, model):
+        self._models.append(model)
+        self._schedule_version = -1
+
+    def loop(self, tick):
+        if self._batch_ticks:
+            with Batch():
+                self._loop(tick)
+        else:
+            self._loop(tick)
+
+    def _loop(self, tick):
+        profiler = self._profiler
+        self._update_schedule()
+
+        if profiler is not None and profiler.begin_tick(self):
+            try:
+                self._sleep_schedule.loop(tick, profiler)
+            finally:
+                profiler.end_tick()
+            return
+
+        self._sleep_schedule.loop(tick)
+
+    def start(self, origin):
+        """
+        Place the first deadline of the group one period after origin
+
+        """
+        self._origin = origin
+        self._count = 1
+        self._grid_period = self._period
+        self._catch_up = 0
+
+    def run(self, clock, overrun_policy, max_catch_up):
+        """
+        Run the tick of the current deadline and move the time grid.
+
+        Deadlines are calculated from an origin, to avoid the rounding
+        error of a repeated addition of the period.
+
+        """
+        deadline = self.deadline
+
+        start = clock.monotonic()
+        self.loop(self._period)
+        end = clock.monotonic()
+
+        self._statistics.record_tick(start - deadline, end - start)
+        self._count += 1
+
+        if end <= self.deadline:
+            self._catch_up = 0
+            return
+
+        if self._catch_up == 0:
+            self._statistics.record_overrun()
+
+        if overrun_policy == OverrunPolicy.CatchUp and self._catch_up < max_catch_up:
+            self._catch_up += 1
+            return
+
+        self._catch_up = 0
+
+        if overrun_policy == OverrunPolicy.Stretch or self._period <= 0:
+            self._origin, self._count = end, 0
+            return
+
+        missed = int(math.floor((end - self.deadline) / self._period)) + 1
+        self._statistics.record_skipped(missed)
+        self._count += missed
+
 
 class ModelRunner:
-    
-    def __init__(self, ticks = 0.5):
+
+    SPIN_THRESHOLD = 0.002
+
+    def __init__(self, ticks = 0.5, overrun_policy = OverrunPolicy.Skip, spin_threshold = None, max_catch_up = 10, clock = None):
+        """
+        Parameters
+        ----------
+        ticks : float, optional
+                Period of one tick in seconds of model time. Used by all
+                models added without an own period.
+
+        overrun_policy : OverrunPolicy, optional
+                Handling of ticks which missed their deadline.
+
+        spin_threshold : float, optional
+                Time in seconds before a deadline in which the runner busy
+                waits instead of sleeping. None selects a hybrid wait for
+                ticks below 10 ms and a plain sleep otherwise.
+
+        max_catch_up : int, optional
+                Maximum number of ticks run back to back with
+                OverrunPolicy.CatchUp before the remaining ones are skipped.
+
+        clock : SimulationClock, optional
+                Time source of the runner. The default clock is used if None.
+
+        """
         self.logger = logging.getLogger(__name__)
-        
-        self._models = []
+
         self._ticks = ticks
-        
+        self._default_group = TaskGroup(ticks)
+        self._groups = [self._default_group]
+        self._overrun_policy = overrun_policy
+        self._spin_threshold = spin_threshold
+        self._max_catch_up = max_catch_up
+        self._clock = clock if clock is not None else get_default_clock()
+        self._profiler = None
+        self._batch_ticks = False
+        self._dispatcher = Dispatcher()
+        self._tick_finished = Callback("tick_finished")
+        self._journal = None
+        self._pending_filters = {}
+        self._previous_filters = None
+
         self._thread = None
         self._thread_terminate = False
 
-        
+
     @property
     def models(self):
-        return self._models
-    
+        models = []
+        for group in self._groups:
+            models.extend(group.models)
+        return models
+
+    @property
+    def task_groups(self):
+        """
+        Return: task groups, sorted rate monotonic by period
+        """
+        return sorted(self._groups, key = lambda g: g.period)
+
     @property
     def ticks(self):
         return self._ticks
-    
+
     @ticks.setter
     def ticks(self, value):
         self._ticks = value
-    
-    def add_model_object(self, model):
+        self._default_group.period = value
+
+    @property
+    def overrun_policy(self):
+        return self._overrun_policy
+
+    @overrun_policy.setter
+    def overrun_policy(self, value):
+        self._overrun_policy = value
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @property
+    def spin_threshold(self):
+        if self._spin_threshold is None:
+            period = min(g.period for g in self._groups)
+            if period / self._clock.time_scale < 0.01:
+                return ModelRunner.SPIN_THRESHOLD
+            return 0.0
+        return self._spin_threshold
+
+    @spin_threshold.setter
+    def spin_threshold(self, value):
+        self._spin_threshold = value
+
+    @property
+    def statistics(self):
+        """
+        Return: statistics of the models running with ticks
+        """
+        return self._default_group.statistics
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, value):
+        """
+        Enable per object profiling of all task groups with a
+        TickProfiler, or disable it with None.
+
+        """
+        self._profiler = value
+        for group in self._groups:
+            group.profiler = value
+
+    @property
+    def batch_ticks(self):
+        return self._batch_ticks
+
+    @batch_ticks.setter
+    def batch_ticks(self, value):
+        """
+        Run every tick of a task group in a Batch. The value changed
+        events of a tick are fired once per value at the end of the tick.
+        Objects sleeping on a value are woken at the end of the tick as
+        well, so they run in the next tick.
+
+        """
+        self._batch_ticks = value
+        for group in self._groups:
+            group.batch_ticks = value
+
+    @property
+    def journal(self):
+        """
+        Return: ChangeJournal of the runner, or None
+        """
+        return self._journal
+
+    def enable_journal(self, retained_ticks = 16):
+        """
+        Record the value changes of every tick in a ChangeJournal
+
+        Returns
+        -------
+        ChangeJournal
+            The journal of the runner, the same object on every call.
+
+        """
+        if self._journal is None:
+            self._journal = ChangeJournal(retained_ticks)
+        return self._journal
+
+    def _begin_tick(self):
+        self._previous_filters = activate_filters(self._pending_filters)
+
+        if self._journal is not None:
+            self._journal.begin_tick(self._clock.time())
+
+    def _finish_tick(self):
+        # report the changes the value filters suppressed in this or
+        # earlier ticks once they settled
+        flush_filters(self._pending_filters)
+        self._dispatcher.fire("tick_finished", self._tick_finished, self)
+
+    def _end_tick(self):
+        """
+        Stop collecting the changes of the runner thread, also if the tick
+        failed. Changes between the ticks are not journaled.
+
+        """
+        activate_filters(self._previous_filters)
+        self._previous_filters = None
+
+        if self._journal is not None:
+            self._journal.end()
+
+    def add_tick_listener(self, listener):
+        """
+        Register a listener called with (callback, runner) by the runner
+        thread after every tick, when all due task groups ran.
+
+        """
+        self._dispatcher.add_listener("tick_finished", listener)
+
+    def add_model_object(self, model, period = None):
+        """
+        Add a model to the runner
+
+        Parameters
+        ----------
+        model : ModelObject
+                Model to be looped.
+
+        period : float, optional
+                Period of the model in seconds of model time. Models with
+                the same period share one task group. The default is ticks.
+
+        """
         self.logger.debug("Add model object")
-        self._models.append(model)
-    
-        
+
+        if period is None:
+            self._default_group.add_model_object(model)
+            return
+
+        if period <= 0:
+            raise Exception("Period has to be greater than 0")
+
+        for group in self._groups:
+            if group is not self._default_group and group.period == period:
+                group.add_model_object(model)
+                return
+
+        group = TaskGroup(period)
+        group.profiler = self._profiler
+        group.batch_ticks = self._batch_ticks
+        group.start(self._clock.monotonic())
+        group.add_model_object(model)
+        self._groups = self._groups + [group]
+
+
     def start_loop(self):
         """
         Start the runner
 
         """
         self._thread_terminate = False
-        
+
         if self._thread is not None:
             raise Exception("Thread already started")
-        
+
         self._thread = threading.Thread(target = self.loop_forever)
         self._thread.daemon = True
         self._thread.start()
         self.logger.debug("Thread started: %s", self._thread)
-    
+
     def stop_loop(self):
         """
         Stops the runner
@@ -54,24 +510,163 @@ class ModelRunner:
         """
         if self._thread is None:
             raise Exception("No running thread.")
-        
+
         self._thread_terminate = True
-        
+
         if threading.current_thread() != self._thread:
             self._thread.join()
             self.logger.debug("Thread stopped: %s", self._thread)
             self._thread = None
 
+    def step(self):
+        """
+        Run every task group for a single tick of its period
+
+        """
+        self._begin_tick()
+        try:
+            for group in self.task_groups:
+                group.loop(group.period)
+
+            self._finish_tick()
+        finally:
+            self._end_tick()
+
     def loop_forever(self):
+        """
+        Run the models on a fixed time grid until stop_loop is called.
+
+        Deadlines are taken from the monotonic model clock and advanced by
+        the period of each task group, so the execution time of the models
+        does not add up as drift.
+
+        """
+        self.logger.debug("Start loop")
+
+        self._run()
+        self.step()
+
+        self.logger.debug("Stop loop")
+
+    def run_for(self, duration):
+        """
+        Run the models in the calling thread until the model time advanced
+        by duration. Combined with an as fast as possible clock this runs
+        long simulations without idle time, e.g. for regression tests.
+
+        Parameters
+        ----------
+        duration : float
+                Model time in seconds.
+
+        """
+        self._thread_terminate = False
+        self._run(duration)
+
+    def _run(self, duration = None):
+        until = self._start(duration)
+
+        while not self._thread_terminate:
+            groups, deadline = self._next_deadline()
+
+            if self._finished(deadline, until):
+                break
+
+            self._clock.sleep_until(deadline, self.spin_threshold)
+            self._run_due(groups)
+
+    def _start(self, duration = None):
+        """
+        Start the time grid of all task groups
+
+        Returns
+        -------
+        float
+            Model time to stop at, None to run until stopped.
+
+        """
+        origin = self._clock.monotonic()
+
+        for group in self._groups:
+            group.start(origin)
+
+        return None if duration is None else origin + duration
+
+    def _next_deadline(self):
+        """
+        Returns the task groups to schedule, sorted rate monotonic, and
+        the nearest deadline of them.
+
+        """
+        groups = [g for g in self.task_groups if g.models] or [self._default_group]
+        return groups, min(g.deadline for g in groups)
+
+    def _finished(self, deadline, until):
+        return until is not None and deadline > until + deadline * 1e-12
+
+    def _run_due(self, groups):
+        clock = self._clock
+        self._begin_tick()
+        try:
+            for group in groups:
+                if group.deadline <= clock.monotonic():
+                    group.run(clock, self._overrun_policy, self._max_catch_up)
+
+            self._finish_tick()
+        finally:
+            self._end_tick()
+
+
+class AsyncModelRunner(ModelRunner):
+    """
+    Runner scheduling its ticks on an asyncio event loop.
+
+    Waiting for a deadline yields to the event loop, so connectors and
+    other tasks of the same loop run between the ticks without threads.
+    """
+    def __init__(self, ticks = 0.5, **kwargs):
+        super().__init__(ticks, **kwargs)
+        self.logger = logging.getLogger(__name__)
+
+    def start_loop(self):
+        raise Exception("AsyncModelRunner is started with run()")
+
+    def stop_loop(self):
+        raise Exception("AsyncModelRunner is stopped with stop()")
+
+    async def run(self, duration = None):
+        """
+        Run the models until stop is called or the model time advanced
+        by duration.
+
+        Parameters
+        ----------
+        duration : float, optional
+                Model time in seconds, None to run until stopped.
+
+        """
         self.logger.debug("Start loop")
-        
+        self._thread_terminate = False
+
+        until = self._start(duration)
+
         while not self._thread_terminate:
-            time.sleep(self.ticks)
-            
-            for model in self._models:
-                model.loop(self.ticks)
-                
-        for model in self._models:
-                model.loop(self.ticks)
-                
-        self.logger.debug("Stop loop")
\ No newline at end of file
+            groups, deadline = self._next_deadline()
+
+            if self._finished(deadline, until):
+                break
+
+            await self._clock.async_sleep_until(deadline)
+            self._run_due(groups)
+
+        if until is None:
+            self.step()
+
+        self.logger.debug("Stop loop")
+
+    def stop(self):
+        """
+        Stop the runner after the current tick
+
+        """
+        self._thread_terminate = True
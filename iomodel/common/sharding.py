@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import threading
+import logging
+import random
+
+from iomodel.common.base import ModelObject, ModelDevice, ModelValue, ModelDataSet, ValueAccess, copy_value, walk
+from iomodel.common.runner import ModelRunner
+
+
+class ShardWorker:
+    """
+    Owns the subtree of one shard and runs its ticks.
+
+    Used inside the worker process, or directly in the main process to
+    run the shards without processes.
+    """
+    def __init__(self, factory, args, seed = None):
+        self._random = random.Random(seed)
+        self._model = self._call_seeded(factory, *args)
+
+        if not isinstance(self._model, ModelDevice):
+            raise Exception("Shard factory returned no device")
+
+        self._values = {prefix + child.qualified_name: child for prefix, child in walk(self._model)
+                        if not isinstance(child, ModelDevice)}
+        self._paths = {value: path for path, value in self._values.items()}
+        self._changed = {}
+
+        for value in self._values.values():
+            value.add_change_listener(self._value_has_changed)
+
+    def _call_seeded(self, method, *args):
+        """
+        Run method with the random state of this shard, so every shard
+        draws the same numbers no matter how the shards are distributed.
+
+        """
+        state = random.getstate()
+        random.setstate(self._random.getstate())
+        try:
+            return method(*args)
+        finally:
+            self._random.setstate(random.getstate())
+            random.setstate(state)
+
+    def _value_has_changed(self, source, old_value, new_value):
+        self._changed[source] = True
+
+    def describe(self):
+        """
+        Return: name of the shard root and a description of all children
+        in the order of a recursive walk
+        """
+        children = []
+        for prefix, child in walk(self._model):
+            if isinstance(child, ModelDevice):
+                children.append((prefix, child.qualified_name, None))
+            else:
+                columns = child.columns if isinstance(child, ModelDataSet) else None
+                # values overriding update_request decide themselves
+                writable = child.external_write or type(child).update_request is not ModelValue.update_request
+                children.append((prefix, child.qualified_name,
+                                 (child.datatype, child.initial, copy_value(child.value), child.external_write, columns, writable)))
+        return self._model.qualified_name, children
+
+    def tick(self, tick, boundary, writes):
+        """
+        Run one tick of the shard
+
+        Parameters
+        ----------
+        tick : float
+                Tick in seconds of model time.
+
+        boundary : list
+                (path, value) of linked values set before the tick.
+
+        writes : list
+                (path, value) of update requests from the connector.
+
+        Returns
+        -------
+        list
+            (path, value) of all values changed during the tick.
+
+        """
+        self._changed.clear()
+
+        for path, value in boundary:
+            self._values[path].value = value
+
+        for path, value in writes:
+            self._values[path].update_request(value)
+
+        self._call_seeded(self._model.loop, tick)
+
+        return [(self._paths[value], copy_value(value.value)) for value in self._changed]
+
+
+def _shard_main(connection, factory, args, seed):
+    """
+    Entry point of a worker process
+
+    """
+    worker = ShardWorker(factory, args, seed)
+    connection.send(worker.describe())
+
+    while True:
+        message = connection.recv()
+
+        if message[0] == "tick":
+            connection.send(worker.tick(*message[1:]))
+        else:
+            break
+
+    connection.close()
+
+
+class ShardValue(ModelValue):
+    """
+    Main process copy of a value owned by a shard.
+
+    Update requests are forwarded to the shard and applied before its
+    next tick. Requests the value of the shard does not accept are denied
+    like by ModelValue.update_request.
+    """
+    __slots__ = ("_shard", "_path", "_writable")
+
+    def __init__(self, shard, path, name, parent, datatype, initial, current, external_write, writable):
+        super().__init__(name, parent, datatype, initial, external_write)
+        self._shard = shard
+        self._path = path
+        self._value = current
+        self._writable = writable
+
+    def update_request(self, value):
+        if not self._writable:
+            return ValueAccess.DENIED
+
+        self._shard.request_write(self._path, value)
+        return ValueAccess.OK
+
+
+class ShardDataSet(ModelDataSet):
+
+    __slots__ = ("_shard", "_path", "_writable")
+
+    def __init__(self, shard, path, name, parent, columns, current, writable):
+        super().__init__(name, parent, columns)
+        self._shard = shard
+        self._path = path
+        self._value = current
+        self._writable = writable
+
+    def update_request(self, value):
+        if not self._writable:
+            return ValueAccess.DENIED
+
+        self._shard.request_write(self._path, value)
+        return ValueAccess.OK
+
+
+class Shard:
+    """
+    Subtree of a sharded model, run by a worker process or in-process.
+    """
+    def __init__(self, factory, args, seed = None, process = True):
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._writes = []
+        self._boundary = []
+        self._changes = []
+        self._values = {}
+        self._model = None
+        self._worker = None
+        self._process = None
+        self._connection = None
+
+        if process:
+            self._connection, child_connection = multiprocessing.Pipe()
+            self._process = multiprocessing.Process(target = _shard_main, args = (child_connection, factory, args, seed))
+            self._process.daemon = True
+            self._process.start()
+            child_connection.close()
+            self._description = self._connection.recv()
+        else:
+            self._worker = ShardWorker(factory, args, seed)
+            self._description = self._worker.describe()
+
+    @property
+    def model(self):
+        """
+        Return: main process copy of the shard root device
+        """
+        return self._model
+
+    @property
+    def values(self):
+        return self._values
+
+    def build_model(self, parent):
+        """
+        Create the main process copy of the shard below parent
+
+        """
+        name, children = self._description
+        self._model = ModelDevice(name, parent)
+        devices = {"": self._model}
+
+        for prefix, name, value in children:
+            path = prefix + name
+
+            if value is None:
+                devices[path + "/"] = ModelDevice(name, devices[prefix])
+                continue
+
+            datatype, initial, current, external_write, columns, writable = value
+
+            if columns is not None:
+                self._values[path] = ShardDataSet(self, path, name, devices[prefix], columns, current, writable)
+            else:
+                self._values[path] = ShardValue(self, path, name, devices[prefix], datatype, initial, current, external_write, writable)
+
+        return self._model
+
+    def request_write(self, path, value):
+        with self._lock:
+            self._writes.append((path, value))
+
+    def set_boundary(self, path, value):
+        self._boundary.append((path, value))
+
+    def send_tick(self, tick):
+        with self._lock:
+            writes, self._writes = self._writes, []
+        boundary, self._boundary = self._boundary, []
+
+        if self._worker is not None:
+            self._changes = self._worker.tick(tick, boundary, writes)
+        else:
+            self._connection.send(("tick", tick, boundary, writes))
+
+    def receive_tick(self):
+        if self._worker is None:
+            self._changes = self._connection.recv()
+
+        for path, value in self._changes:
+            self._values[path].value = value
+
+    def close(self):
+        if self._process is not None:
+            self._connection.send(("stop",))
+            self._process.join()
+            self._connection.close()
+            self._process = None
+
+
+class ShardExchange(ModelObject):
+    """
+    Model object of the sharded runner, running one tick on all shards
+    """
+    def __init__(self, runner):
+        super().__init__("ShardExchange")
+        self._runner = runner
+
+    def loop(self, tick):
+        self._runner.exchange(tick)
+
+
+class ShardedModelRunner(ModelRunner):
+    """
+    Runner distributing subtrees of a model to worker processes.
+
+    Every shard is built by a factory inside its worker. The main process
+    holds a copy of the values of each shard below the given parent, so a
+    NodeConnector on the main process publishes the changes of all shards
+    and forwards update requests to the owning shard.
+
+    Links between shards copy the value of a source to a target value once
+    per tick, before the next tick is run.
+    """
+    def __init__(self, ticks = 0.5, seed = None, processes = True, **kwargs):
+        """
+        Parameters
+        ----------
+        ticks : float, optional
+                Period of one tick in seconds of model time.
+
+        seed : int, optional
+                Seed of the random state of the shards. Every shard gets its
+                own random state derived from seed and its index, so runs
+                with and without processes are equal tick for tick.
+
+        processes : bool, optional
+                Run the shards in worker processes. With False all shards
+                are run in the calling process.
+
+        kwargs :
+                Further arguments of ModelRunner.
+
+        """
+        super().__init__(ticks, **kwargs)
+        self.logger = logging.getLogger(__name__)
+
+        self._seed = seed
+        self._processes = processes
+        self._shards = []
+        self._links = []
+        self._owners = {}
+
+        self.add_model_object(ShardExchange(self))
+
+    @property
+    def shards(self):
+        return self._shards
+
+    def add_shard(self, parent, factory, *args):
+        """
+        Start a shard and build its copy below parent
+
+        Parameters
+        ----------
+        parent : ModelDevice
+                Main process parent of the shard root.
+
+        factory : callable
+                Builds and returns the shard root device. Has to be
+                picklable, e.g. a module level function or class.
+
+        args :
+                Arguments of factory.
+
+        Returns
+        -------
+        ModelDevice
+            Main process copy of the shard root.
+
+        """
+        seed = None if self._seed is None else self._seed + len(self._shards)
+        shard = Shard(factory, args, seed, self._processes)
+        model = shard.build_model(parent)
+
+        for path, value in shard.values.items():
+            self._owners[value] = (shard, path)
+
+        self._shards.append(shard)
+        return model
+
+    def add_link(self, source, target):
+        """
+        Copy the value of source to target after every tick
+
+        Parameters
+        ----------
+        source : ModelValue
+                Value of a shard copy.
+
+        target : ModelValue
+                Value of a shard copy, set in its shard before the next tick.
+
+        """
+        if source not in self._owners or target not in self._owners:
+            raise Exception("Linked values are not part of a shard")
+
+        self._links.append((source, self._owners[target]))
+
+    def exchange(self, tick):
+        for shard in self._shards:
+            shard.send_tick(tick)
+
+        for shard in self._shards:
+            shard.receive_tick()
+
+        for source, (shard, path) in self._links:
+            shard.set_boundary(path, copy_value(source.value))
+
+    def close(self):
+        """
+        Stop all worker processes
+
+        """
+        for shard in self._shards:
+            shard.close()
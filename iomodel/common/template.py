@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+import copy
+import logging
+import types
+from enum import Enum
+
+from iomodel.common.base import ModelDevice, ModelObject, ModelValue, _no_listeners
+from iomodel.common.columnar import _ColumnValue
+
+
+# Slots holding metadata which is never changed after construction, shared
+# by all instances even if mutable
+_SHARED_SLOTS = ("_columns",)
+
+# Slots set by stamp for every instance
+_INSTANCE_SLOTS = ("_qualified_name", "_parent", "_dispatcher", "_filter", "_sleep")
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, Enum, type)
+
+# Callbacks are passed to the constructor, so they are shared as well
+_CALLBACK_TYPES = (types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+_CONTAINER_TYPES = (list, dict, set)
+
+
+def _is_immutable(value):
+    if isinstance(value, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, _IMMUTABLE_TYPES)
+
+
+def _slots_of(cls):
+    slots = []
+    for klass in reversed(cls.__mro__):
+        names = klass.__dict__.get("__slots__", ())
+        if isinstance(names, str):
+            names = (names,)
+        slots.extend(n for n in names if n not in ("__dict__", "__weakref__"))
+    return slots
+
+
+class _ValueSpec:
+    """
+    One value of a template: a prototype split into the immutable state
+    shared by all instances and the state copied for every instance.
+    Containers of immutable items are copied shallow, all other objects,
+    e.g. the PT1 element of a TemperatureSensor, deep.
+
+    The instances are created by a function generated for the spec, which
+    assigns all slots without any loop or lookup of the slot names.
+    A prototype bound to a ColumnStore is copied as unbound value.
+    """
+    __slots__ = ("cls", "name", "filter", "create")
+
+    def __init__(self, prototype, name):
+        self.cls = type(prototype)
+        self.name = name
+
+        if isinstance(prototype, _ColumnValue):
+            # the slot _value holds the row of the column, not the value
+            self.cls = self.cls.__bases__[1]
+        self.filter = prototype.value_filter
+
+        shared = []
+        copied = []
+        deep_copied = []
+
+        slots = [(slot, getattr(prototype, slot)) for slot in _slots_of(self.cls)
+                 if slot not in _INSTANCE_SLOTS and hasattr(prototype, slot)]
+        if hasattr(prototype, "__dict__"):
+            slots.extend(prototype.__dict__.items())
+        if isinstance(prototype, _ColumnValue):
+            slots = [(slot, prototype.value if slot == "_value" else value) for slot, value in slots]
+
+        for slot, value in slots:
+            if slot in _SHARED_SLOTS or _is_immutable(value) or isinstance(value, _CALLBACK_TYPES):
+                shared.append((slot, value))
+            elif type(value) in _CONTAINER_TYPES and all(map(_is_immutable, value.values() if isinstance(value, dict) else value)):
+                # e.g. the rows of a dataset, a shallow copy is enough
+                copied.append((slot, value))
+            else:
+                # state owned by the value, e.g. the PT1 of a TemperatureSensor
+                deep_copied.append((slot, value))
+
+        self.create = self._compile(shared, copied, deep_copied)
+
+    def _compile(self, shared, copied, deep_copied):
+        namespace = {"_cls": self.cls, "_new": self.cls.__new__, "_no_listeners": _no_listeners,
+                     "_deepcopy": copy.deepcopy}
+        lines = ["def create(qualified_name, parent):",
+                 "    obj = _new(_cls)",
+                 "    obj._qualified_name = qualified_name",
+                 "    obj._parent = parent",
+                 "    obj._dispatcher = _no_listeners",
+                 "    obj._filter = None"]
+
+        for number, (slot, value) in enumerate(shared):
+            namespace["_s" + str(number)] = value
+            lines.append("    obj.{} = _s{}".format(slot, number))
+
+        for number, (slot, value) in enumerate(copied):
+            namespace["_c" + str(number)] = value
+            namespace["_t" + str(number)] = type(value)
+            lines.append("    obj.{0} = _t{1}(_c{1})".format(slot, number))
+
+        for number, (slot, value) in enumerate(deep_copied):
+            namespace["_d" + str(number)] = value
+            lines.append("    obj.{0} = _deepcopy(_d{1})".format(slot, number))
+
+        if self.filter is not None:
+            namespace["_filter"] = self.filter
+            lines.append("    obj.value_filter = _filter.copy()")
+
+        lines.append("    return obj")
+
+        exec("\n".join(lines), namespace)
+        return namespace["create"]
+
+
+def value_factory(value_class, *args, **kwargs):
+    """
+    Return: function create(qualified_name, parent) returning a new value
+    of value_class with the constructor arguments args and kwargs, without
+    running the constructor. The value is not added to parent.
+    """
+    return _ValueSpec(value_class("", None, *args, **kwargs), "").create
+
+
+class DeviceTemplate:
+    """
+    Structure of a device type, defined once and stamped out many times.
+
+    A template is a list of values, each given by its class and its
+    constructor arguments. Every value is constructed once as prototype.
+    Stamping copies the prototypes without running the constructors:
+    names, datatypes, dataset columns, immutable initial values and
+    callbacks are shared by all instances, all other state (e.g. the rows
+    of a dataset or the PT1 element of a TemperatureSensor) is copied.
+
+    The values of a conveyor stamped into its area:
+
+        CONVEYOR = DeviceTemplate("Conveyor")
+        SPEED = CONVEYOR.add(Variant, "Drive/CurrentSpeed", 0, ValueDataType.Int)
+        ...
+        values = CONVEYOR.stamp(area, "211/")
+        speed = values[SPEED]
+
+    Callbacks and state which differ per instance, e.g. the method of a
+    Switch, have to be set on the stamped values.
+
+    A lazy instance is a TemplateDevice creating its values on first use,
+    see instantiate.
+    """
+    def __init__(self, name = "Template"):
+        self.logger = logging.getLogger(__name__)
+
+        self._name = name
+        self._specs = []
+        self._positions = {}
+        self._layout = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def names(self):
+        """
+        Return: relative names of the values in the order of stamp
+        """
+        return [spec.name for spec in self._specs]
+
+    def __len__(self):
+        return len(self._specs)
+
+    def position(self, name):
+        """
+        Return: position of the value with the relative name in the
+        lists returned by stamp
+        """
+        return self._positions[name]
+
+    def add(self, value_class, name, *args, **kwargs):
+        """
+        Add a value
+
+        Parameters
+        ----------
+        value_class : class
+                ModelValue class, e.g. Variant.
+
+        name : str
+                Name relative to the prefix of the instances.
+
+        args, kwargs :
+                Further constructor arguments, following name and parent.
+
+        Returns
+        -------
+        int
+            Position of the value in the lists returned by stamp.
+
+        """
+        prototype = value_class(name, None, *args, **kwargs)
+        return self.add_prototype(prototype)
+
+    def add_prototype(self, prototype, name = None):
+        """
+        Add a value constructed without parent as prototype
+
+        Returns
+        -------
+        int
+            Position of the value in the lists returned by stamp.
+
+        """
+        if not isinstance(prototype, ModelValue):
+            raise Exception("Template prototype is no value")
+
+        if prototype.parent is not None:
+            raise Exception("Template prototype must not have a parent")
+
+        name = prototype.qualified_name if name is None else name
+
+        if name in self._positions:
+            raise Exception("Template {} has already a value {}".format(self._name, name))
+
+        self._positions[name] = len(self._specs)
+        self._specs.append(_ValueSpec(prototype, name))
+        self._layout = None
+        return self._positions[name]
+
+    def include(self, template, prefix = ""):
+        """
+        Add all values of another template, e.g. the values of an error
+        handler, with prefix in front of their names
+
+        Returns
+        -------
+        int
+            Position of the first included value.
+
+        """
+        first = len(self._specs)
+
+        for spec in template._specs:
+            name = prefix + spec.name
+            if name in self._positions:
+                raise Exception("Template {} has already a value {}".format(self._name, name))
+            self._positions[name] = len(self._specs)
+            included = _ValueSpec.__new__(_ValueSpec)
+            included.cls = spec.cls
+            included.name = name
+            included.filter = spec.filter
+            included.create = spec.create
+            self._specs.append(included)
+            self._layout = None
+
+        return first
+
+    @classmethod
+    def from_device(cls, device, name = None):
+        """
+        Return: template of the values of an existing device. The current
+        values become the initial values of the instances.
+        """
+        template = cls(device.qualified_name if name is None else name)
+
+        for child in device.children:
+            if not isinstance(child, ModelValue):
+                raise Exception("Template devices can only contain values")
+
+            template._positions[child.qualified_name] = len(template._specs)
+            template._specs.append(_ValueSpec(child, child.qualified_name))
+
+        return template
+
+    def stamp(self, parent, prefix = ""):
+        """
+        Create the values of one instance
+
+        Parameters
+        ----------
+        parent : ModelDevice
+                Device the values are added to.
+
+        prefix : str, optional
+                Put in front of the names, e.g. "211/".
+
+        Returns
+        -------
+        list
+            The created values in the order of the template.
+
+        """
+        if prefix:
+            values = [spec.create(prefix + spec.name, parent) for spec in self._specs]
+        else:
+            values = [spec.create(spec.name, parent) for spec in self._specs]
+
+        parent.add_children(values)
+        return values
+
+    def instantiate(self, name, parent = None, device_class = ModelDevice, lazy = False, initials = None):
+        """
+        Create a device of device_class holding the values of one
+        instance. The names of the values are shared with the template.
+
+        Parameters
+        ----------
+        name : str
+                Name of the device.
+
+        parent : ModelDevice, optional
+                Parent of the device.
+
+        device_class : class, optional
+                Class of the device, with lazy a TemplateDevice class.
+
+        lazy : bool, optional
+                Create a TemplateDevice, whose values are created on
+                first use.
+
+        initials : dict, optional
+                Initial values of this instance by position, e.g. its
+                reference designation.
+
+        """
+        if lazy:
+            if device_class is ModelDevice:
+                device_class = TemplateDevice
+            return device_class(name, parent, self, initials)
+
+        device = device_class(name, parent)
+        values = self.stamp(device)
+
+        if initials:
+            for position, initial in initials.items():
+                values[position]._initial = values[position]._value = initial
+
+        return device
+
+    def _instance_layout(self):
+        """
+        Return: (specs, positions of the specs with an own loop), shared
+        by the lazy instances until the template is changed
+        """
+        if self._layout is None:
+            looped = tuple(position for position, spec in enumerate(self._specs)
+                           if spec.cls.loop is not ModelObject.loop)
+            self._layout = (tuple(self._specs), looped)
+        return self._layout
+
+
+class TemplateDevice(ModelDevice):
+    """
+    Device holding the values of one instance of a DeviceTemplate, which
+    are created on first use.
+
+    value(position) creates a single value, loop_schedule the values with
+    an own loop, children all values. Until then an instance holds no
+    value objects, so building thousands of instances costs little more
+    than their devices. Values of an instance are never used in most
+    simulations, e.g. its error handlers and simulation commands.
+
+    Any walk of the tree, e.g. an index, a connector or a checkpoint,
+    creates all values below it.
+    """
+    __slots__ = ("_layout", "_initials", "_values")
+
+    def __init__(self, name = "defaultModel", parent = None, template = None, initials = None):
+        # set before the device is added, an index of the parent walks it
+        self._layout = None if template is None else template._instance_layout()
+        self._initials = initials
+        self._values = None
+        super().__init__(name, parent)
+
+        if self._layout is not None:
+            # replaced by the list of values when they are created
+            self._children = ()
+
+    @property
+    def created(self):
+        """
+        Return: True if all values of the instance are created
+        """
+        return self._layout is None
+
+    def value(self, position):
+        """
+        Return: value at position of the template, created if needed
+        """
+        if self._layout is None:
+            return self._children[position]
+
+        values = self._values
+        if values is None:
+            values = self._values = [None] * len(self._layout[0])
+
+        model_value = values[position]
+        if model_value is None:
+            spec = self._layout[0][position]
+            model_value = values[position] = spec.create(spec.name, self)
+
+            if self._initials is not None and position in self._initials:
+                model_value._initial = model_value._value = self._initials[position]
+
+        return model_value
+
+    @property
+    def children(self):
+        if self._layout is not None:
+            self._create_values()
+        return self._children
+
+    def _create_values(self):
+        # children added later are only accepted after the values
+        self._children = [self.value(position) for position in range(len(self._layout[0]))]
+        self._layout = self._initials = self._values = None
+
+    def _compile_schedule(self):
+        if self._layout is None:
+            return super()._compile_schedule()
+        return [self.value(position) for position in self._layout[1]]
+
+    def add_child(self, child):
+        if self._layout is not None:
+            self._create_values()
+        super().add_child(child)
+
+    def add_children(self, children):
+        if self._layout is not None:
+            self._create_values()
+        super().add_children(children)
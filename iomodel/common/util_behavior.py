@@ -19,6 +19,12 @@ class LatchIntervall(ModelObject):
     @property
     def value(self):
         return self._value
+    
+    def get_state(self):
+        return (self._t, self._index, self._value)
+    
+    def set_state(self, state):
+        self._t, self._index, self._value = state
         
     def loop(self, tick):
         self._t += tick
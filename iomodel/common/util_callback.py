@@ -2,31 +2,77 @@
 
 
 class Dispatcher:
+    """
+    Listeners by event name.
+
+    The listeners of an event are kept as tuple, rebuilt when a listener
+    is added or removed. Firing only looks up the tuple and calls the
+    listeners; an event without listeners costs a single dictionary lookup.
+    Listeners added or removed by a listener take effect with the next fire.
+    """
+    __slots__ = ("_listeners",)
     
     def __init__(self):
         self._listeners = {}
         
     def add_listener(self, event_name, listener):
-        if event_name not in self._listeners:
-            self._listeners[event_name] = []
-            
-        event_listeners = self._listeners[event_name]
+        if not callable(listener):
+            raise Exception("Listener of {} is not callable".format(event_name))
+        
+        self._listeners[event_name] = self._listeners.get(event_name, ()) + (listener,)
+        
+    def remove_listener(self, event_name, listener):
+        """
+        Remove the first registration of listener
+
+        Returns
+        -------
+        bool
+            False if listener was not registered.
+
+        """
+        listeners = self._listeners.get(event_name, ())
         
-        event_listeners.append(listener)
+        for position, registered in enumerate(listeners):
+            if registered == listener:
+                listeners = listeners[0:position] + listeners[position + 1:]
+                
+                if listeners:
+                    self._listeners[event_name] = listeners
+                else:
+                    del self._listeners[event_name]
+                return True
+            
+        return False
+    
+    def has_listeners(self, event_name):
+        return event_name in self._listeners
         
     def fire(self, event_name, event = None, source = None):
+        listeners = self._listeners.get(event_name)
         
-        if event_name not in self._listeners:
+        if listeners is None:
             return
         
         if event is None:
-            event = Callback()
-            
-        event_listeners = self._listeners[event_name]
+            event = Callback(event_name)
+        
+        for listener in listeners:
+            listener(event, source)
+    
+    def fire_change(self, event_name, source, old_value, new_value):
+        """
+        Call the listeners of event_name with (source, old_value,
+        new_value), without an event object
+        
+        """
+        listeners = self._listeners.get(event_name)
         
-        for listener in event_listeners:
-            if callable(listener):
-                listener(event, source)
+        if listeners is None:
+            return
+        
+        for listener in listeners:
+            listener(source, old_value, new_value)
         
 class Callback:
     
@@ -40,9 +86,17 @@ class Callback:
     
 class CallbackValueChanged(Callback):
     
-    def __init__(self, old = None, new = None):
+    def __init__(self, old = None, new = None, batch = None):
         self._old_value = old
         self._new_value = new
+        self._batch = batch
+        
+    @property
+    def batch(self):
+        """
+        Return: Batch delivering this change at its commit, or None
+        """
+        return self._batch
         
     @property
     def old_value(self):
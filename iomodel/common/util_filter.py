@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from iomodel.common.base import ModelValue, walk
+from iomodel.common.clock import get_default_clock
+
+
+class DeadbandFilter:
+    """
+    Change filter of a ModelValue.
+
+    A change is only reported to the listeners of the value, and so to the
+    publish queue, if it differs enough from the last reported value and
+    the last report is old enough. The value itself is always updated.
+
+    The deadbands apply to numbers only, other values are only limited by
+    the minimum interval. A change suppressed by the minimum interval is
+    reported with the next change after the interval.
+
+    The last suppressed change is not lost: once the value did not change
+    for a whole tick and the minimum interval passed, the current value is
+    reported by flush_filters, which ModelRunner calls after every tick.
+    Changes outside of a runner tick are flushed by calling flush_filters.
+    """
+    def __init__(self, absolute = None, percent = None, min_interval = None, clock = None):
+        """
+        Parameters
+        ----------
+        absolute : float, optional
+                Minimum absolute difference to the last reported value.
+
+        percent : float, optional
+                Minimum difference in percent of the last reported value.
+
+        min_interval : float, optional
+                Minimum time in seconds of model time between two reports.
+
+        clock : SimulationClock, optional
+                Time source of min_interval. The default clock is used if None.
+
+        """
+        self._absolute = absolute
+        self._percent = percent
+        self._min_interval = min_interval
+        self._clock = clock
+        self._model_value = None
+        self._reported = None
+        self._reported_time = None
+        self._pending = False
+        self._settled = False
+        self._passed = 0
+        self._suppressed = 0
+
+    @property
+    def absolute(self):
+        return self._absolute
+
+    @property
+    def percent(self):
+        return self._percent
+
+    @property
+    def min_interval(self):
+        return self._min_interval
+
+    @property
+    def reported(self):
+        """
+        Return: value of the last reported change
+        """
+        return self._reported
+
+    @property
+    def pending(self):
+        """
+        Return: True if a suppressed change has not been reported yet
+        """
+        return self._pending
+
+    @property
+    def passed(self):
+        return self._passed
+
+    @property
+    def suppressed(self):
+        return self._suppressed
+
+    def copy(self):
+        """
+        Return: new filter with the same settings and without state
+        """
+        return DeadbandFilter(self._absolute, self._percent, self._min_interval, self._clock)
+
+    def attach(self, model_value):
+        self._model_value = model_value
+        self._reported = model_value.value
+        self._reported_time = None
+        self._pending = False
+
+    def reset_counters(self):
+        self._passed = 0
+        self._suppressed = 0
+
+    def accept(self, value):
+        """
+        Returns True if the change to value has to be reported
+
+        """
+        now = None
+        if self._min_interval is not None:
+            now = (self._clock or get_default_clock()).monotonic()
+
+        if self._accept(value, now):
+            self._report(value, now)
+            return True
+
+        self._suppressed += 1
+
+        if value != self._reported:
+            self._pending = True
+            self._settled = False
+            _pending_state.filters[self] = None
+        else:
+            self._pending = False
+        return False
+
+    def flush(self):
+        """
+        Report a pending change if the value did not change since the last
+        flush and the minimum interval passed
+
+        Returns
+        -------
+        bool
+            False if the change is still pending.
+
+        """
+        if not self._pending or self._model_value.value_filter is not self:
+            return True
+
+        if not self._settled:
+            self._settled = True
+            return False
+
+        now = None
+        if self._min_interval is not None:
+            now = (self._clock or get_default_clock()).monotonic()
+            if self._reported_time is not None and now - self._reported_time < self._min_interval:
+                return False
+
+        self._pending = False
+        old_value = self._reported
+        value = self._model_value.value
+
+        if value != old_value:
+            self._report(value, now)
+            self._model_value.fire_has_changed_event(old_value, value)
+        return True
+
+    def _report(self, value, now):
+        self._passed += 1
+        self._reported = value
+        self._reported_time = now
+        self._pending = False
+
+    def _accept(self, value, now):
+        reported = self._reported
+
+        if value == reported:
+            return False
+
+        if now is not None and self._reported_time is not None and now - self._reported_time < self._min_interval:
+            return False
+
+        if not _is_number(value) or not _is_number(reported):
+            return True
+
+        difference = abs(value - reported)
+
+        if self._absolute is not None and difference < self._absolute:
+            return False
+
+        if self._percent is not None and difference < abs(reported) * self._percent / 100:
+            return False
+
+        return True
+
+
+class _PendingState(threading.local):
+    """
+    Dictionary collecting the filters with a pending change, per thread.
+    A runner activates its own dictionary during its ticks.
+    """
+    def __init__(self):
+        self.filters = {}
+
+
+_pending_state = _PendingState()
+
+
+def activate_filters(filters):
+    """
+    Collect the filters with a pending change of the calling thread in
+    the dictionary filters, None activates a new dictionary.
+
+    Returns
+    -------
+    dict
+        The previously active dictionary.
+
+    """
+    previous = _pending_state.filters
+    _pending_state.filters = {} if filters is None else filters
+    return previous
+
+
+def flush_filters(filters = None):
+    """
+    Report the pending changes of filters, see DeadbandFilter.flush.
+    ModelRunner flushes the changes of its ticks after every tick.
+
+    Parameters
+    ----------
+    filters : dict, optional
+            Dictionary of activate_filters. The active dictionary of the
+            calling thread if None.
+
+    Returns
+    -------
+    int
+        Number of filters with a change still pending.
+
+    """
+    if filters is None:
+        filters = _pending_state.filters
+
+    if filters:
+        for value_filter in list(filters):
+            if value_filter.flush():
+                del filters[value_filter]
+    return len(filters)
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+def apply_filter(model, pattern, value_filter):
+    """
+    Set a copy of value_filter on every value below model matching pattern
+
+    Parameters
+    ----------
+    model : ModelDevice
+            Root of the values. An index is attached, if it has none.
+
+    pattern : str
+            Glob pattern of ModelIndex.glob, e.g. "**/Drive/Current".
+
+    value_filter : DeadbandFilter
+            Template of the filters.
+
+    Returns
+    -------
+    list
+        Values which got a filter.
+
+    """
+    from iomodel.common.index import ModelIndex
+
+    index = model.index if model.index is not None else ModelIndex(model)
+    values = index.glob(pattern)
+
+    for model_value in values:
+        model_value.value_filter = value_filter.copy()
+
+    return values
+
+
+def filter_statistics(model):
+    """
+    Return: number of filtered values, reported and suppressed changes of
+    all values below model
+    """
+    statistics = {"values": 0, "passed": 0, "suppressed": 0}
+
+    for _, child in walk(model):
+        if isinstance(child, ModelValue) and child.value_filter is not None:
+            statistics["values"] += 1
+            statistics["passed"] += child.value_filter.passed
+            statistics["suppressed"] += child.value_filter.suppressed
+
+    total = statistics["passed"] + statistics["suppressed"]
+    statistics["suppressed_ratio"] = statistics["suppressed"] / total if total else 0.0
+    return statistics
@@ -39,6 +39,12 @@ class PT1:
         self._time = 0
         self._v = 0
         
+    def get_state(self):
+        return (self._time, self._v)
+    
+    def set_state(self, state):
+        self._time, self._v = state
+        
     
     def tick(self, ticks):
         self._time += ticks
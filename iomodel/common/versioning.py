@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from iomodel.common import base
+from iomodel.common.base import ModelValue, walk
+
+
+class Generations:
+    """
+    Global generation counter of the model values.
+
+    Every change of a value increments the generation and stores it as
+    last modified generation of the value. The values are kept ordered by
+    their last modification, so the values changed since a generation are
+    found in O(changed).
+
+    Consumers poll at their own rate:
+
+        generation, values = generations.snapshot(plant)
+        ...
+        generation, changes = generations.changes_since(generation, plant)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._modified = {}
+
+    @property
+    def generation(self):
+        """
+        Return: generation of the latest change
+        """
+        return self._generation
+
+    def generation_of(self, model_value):
+        """
+        Return: generation of the last change of model_value, 0 if it did
+        not change since the versioning was enabled
+        """
+        return self._modified.get(model_value, 0)
+
+    def touch(self, model_value):
+        with self._lock:
+            self._generation += 1
+            modified = self._modified
+            # reinsert to move the value to the end
+            modified.pop(model_value, None)
+            modified[model_value] = self._generation
+
+    def changes_since(self, generation, model = None):
+        """
+        Return the values changed after generation
+
+        Parameters
+        ----------
+        generation : int
+                Generation returned by a previous call or by snapshot.
+
+        model : ModelDevice, optional
+                Only return values below model.
+
+        Returns
+        -------
+        tuple
+            Current generation and a list of (value, current value) in the
+            order of the last change.
+
+        """
+        changed = []
+
+        with self._lock:
+            current = self._generation
+            modified = self._modified
+
+            for model_value in reversed(modified):
+                if modified[model_value] <= generation:
+                    break
+                changed.append(model_value)
+
+        changed.reverse()
+
+        if model is not None:
+            changed = [v for v in changed if _is_below(v, model)]
+
+        return current, [(v, v.value) for v in changed]
+
+    def snapshot(self, model):
+        """
+        Return: current generation and a list of (value, current value) of
+        all values below model
+        """
+        current = self._generation
+        return current, [(v, v.value) for _, v in walk(model) if isinstance(v, ModelValue)]
+
+
+def _is_below(model_value, model):
+    parent = model_value.parent
+    while parent is not None:
+        if parent is model:
+            return True
+        parent = parent.parent
+    return False
+
+
+_generations = None
+
+
+def enable_versioning():
+    """
+    Start counting generations of all values of the process
+
+    Returns
+    -------
+    Generations
+        The global generations, the same object on every call.
+
+    """
+    global _generations
+
+    if _generations is None:
+        _generations = Generations()
+        base.set_change_hook(_generations.touch)
+
+    return _generations
+
+
+def disable_versioning():
+    global _generations
+    base.set_change_hook(None)
+    _generations = None
+
+
+def get_generations():
+    """
+    Return: global Generations, or None if versioning is not enabled
+    """
+    return _generations
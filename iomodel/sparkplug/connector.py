@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from iomodel.common.base import ModelDevice, ModelValue, ModelDataSet, ValueDataType
-from timeit import default_timer as timer
+from iomodel.common.base import ModelDevice, ModelValue, ModelDataSet, ValueDataType, copy_value
+from iomodel.common.clock import get_default_clock
 
 import sys
-import time
+import asyncio
+import collections
 import logging
 import threading
 import paho.mqtt.client as mqtt
@@ -14,6 +15,7 @@ import iomodel.sparkplug.sparkplug_b_pb2
 
 
 
+
 class NodeConnector:
     """
     Represents one node connected to MQTT Broker with Sparkplug B.
@@ -23,7 +25,7 @@ class NodeConnector:
     nodes with one MQTT Client.
     """
     
-    def __init__(self, model, group = "defaultGroup", mqtt_args = ("127.0.0.1", 1883, 60), connect_id = None):
+    def __init__(self, model, group = "defaultGroup", mqtt_args = ("127.0.0.1", 1883, 60), connect_id = None, clock = None):
         """
         
         Parameters
@@ -40,6 +42,10 @@ class NodeConnector:
 
         connect_id: MQTT Client id (optional)
 
+        clock : SimulationClock, optional
+                Time source for publish intervals and payload timestamps.
+                The default clock is used if None.
+
         """
         self.logger = logging.getLogger(__name__)
         
@@ -49,6 +55,7 @@ class NodeConnector:
         self._group = group
         self._model = model
         self._connect_id = connect_id
+        self._clock = clock if clock is not None else get_default_clock()
         # Setup mqtt
         self._broker_ip = mqtt_args[0]
         self._broker_port = mqtt_args[1]
@@ -61,6 +68,10 @@ class NodeConnector:
         
         self._thread = None
         self._thread_terminate = False
+        self._runner = None
+        self._inbound = collections.deque()
+        self._cursor = None
+        self._journal_metrics = None
         
         # Assign node and create SparkplugNode
         self._node = SparkplugNode(self, self._model)
@@ -79,6 +90,13 @@ class NodeConnector:
         """
         return self._client
 
+    @property
+    def clock(self):
+        """
+        Return: clock, SimulationClock
+        """
+        return self._clock
+
     def start_loop(self):
         """
         Start the node connector
@@ -113,10 +131,84 @@ class NodeConnector:
             self._thread = None
 
     
-    def _main_thread(self):
+    @property
+    def lockstep(self):
         """
-        Main Thread
+        Return: True if publishing is aligned to the ticks of a runner
+        """
+        return self._runner is not None
+    
+    def attach_runner(self, runner, use_journal = False):
+        """
+        Align publishing to the ticks of runner (lockstep mode).
+        
+        At the end of every tick the runner hands the changes of the tick
+        to the node and its devices. A published DDATA contains the state
+        of one or more complete ticks. Inbound commands are applied by the
+        runner between two ticks, so values are only written by the
+        runner thread and no lock is taken per change.
 
+        Parameters
+        ----------
+        runner : ModelRunner
+                Runner looping the model of this connector.
+
+        use_journal : bool, optional
+                Read the changes of every tick from the change journal of
+                the runner instead of a listener per metric.
+
+        """
+        if self._runner is not None:
+            raise Exception("Runner already attached")
+        
+        self._runner = runner
+        self._node.set_lockstep(True)
+        
+        if use_journal:
+            self._journal_metrics = {}
+            for base in [self._node] + list(self._node.devices.values()):
+                for metric in base.metrics:
+                    if isinstance(metric, SparkplugValueMetric):
+                        metric.detach_listener()
+                        self._journal_metrics[metric.model_io] = metric
+            
+            self._cursor = runner.enable_journal().cursor()
+        
+        runner.add_tick_listener(self._tick_finished)
+    
+    def _tick_finished(self, callback, source):
+        """
+        Callback - tick of the attached runner finished
+        
+        """
+        while self._inbound:
+            payload, device_name = self._inbound.popleft()
+            self._node.consume_msg(payload, device_name)
+        
+        if self._cursor is not None:
+            metrics = self._journal_metrics
+            for model_value, old_value, new_value, change_time in self._cursor.read(coalesce = True):
+                metric = metrics.get(model_value)
+                if metric is not None:
+                    metric.parent.queue_publishData(metric)
+        
+        self._node.commit_tick()
+    
+    def create_lock(self):
+        """
+        Lock protecting the publish queues of the node and its devices
+        against the concurrent access of the runner and the connector.
+        """
+        return threading.Lock()
+    
+    def _connect(self):
+        """
+        Setup last will and connect to the broker
+        
+        Returns
+        -------
+        bool
+            True if the connection was established.
 
         """
         self.logger.debug("Setup Last Will")
@@ -133,17 +225,28 @@ class NodeConnector:
         except:
             self.logger.debug("MQTT - Connection failed")
             self.logger.warn("%s-%s Connector failed.",self.group, self._model.name)
+            return False
+        
+        return True
+    
+    def _main_thread(self):
+        """
+        Main Thread
+
+
+        """
+        if not self._connect():
             sys.exit()
         
         self._node.publishBirth()
         self._client.loop()
         self._node.loop()
-        time.sleep(0.2)
+        self._clock.sleep(0.2)
         
         while not self._thread_terminate:
             self._node.loop()
             self._client.loop()
-            time.sleep(0.5)
+            self._clock.sleep(0.5)
         
         print("Connection closed")
 
@@ -161,10 +264,12 @@ class NodeConnector:
             payload = iomodel.sparkplug.sparkplug_b_pb2.Payload()
             payload.ParseFromString(msg.payload)
 
-            if len(tokens) > 4:
-                self._node.consume_msg(payload, tokens[4])
+            device_name = tokens[4] if len(tokens) > 4 else None
+            
+            if self.lockstep:
+                self._inbound.append((payload, device_name))
             else:
-                self._node.consume_msg(payload, None)
+                self._node.consume_msg(payload, device_name)
 
         else:
             self.logger.error("subscribed topic is unequal to compared node / device id")
@@ -189,19 +294,135 @@ class NodeConnector:
         print("Connection closed")
 
 
+class NoLock:
+    """
+    Lock replacement for connectors running on a single event loop
+    """
+    def acquire(self, *args):
+        return True
+    
+    def release(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        pass
+
+
+class AsyncioHelper:
+    """
+    Drives the network I/O of a MQTT client by an asyncio event loop
+    instead of a network thread.
+    """
+    def __init__(self, loop, client):
+        self._loop = loop
+        self._client = client
+        self._misc = None
+        
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+        
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+        self._misc = self._loop.create_task(self._misc_loop())
+        
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+            self._misc = None
+            
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+        
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+        
+    async def _misc_loop(self):
+        while self._client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
+class AsyncNodeConnector(NodeConnector):
+    """
+    Node connector running on an asyncio event loop.
+    
+    MQTT I/O, inbound commands and publishing are scheduled on the loop
+    of the caller. Together with an AsyncModelRunner on the same loop no
+    thread and no lock is involved, so many nodes can share one process.
+    """
+    
+    def create_lock(self):
+        return NoLock()
+    
+    def start_loop(self):
+        raise Exception("AsyncNodeConnector is started with run()")
+    
+    def stop_loop(self):
+        raise Exception("AsyncNodeConnector is stopped with stop()")
+    
+    def stop(self):
+        """
+        Stops the node connector
+
+        """
+        self._thread_terminate = True
+    
+    async def run(self):
+        """
+        Connect, publish the births and publish queued metrics until
+        stop is called.
+
+        """
+        self._thread_terminate = False
+        AsyncioHelper(asyncio.get_running_loop(), self._client)
+        
+        if not self._connect():
+            return
+        
+        self._node.publishBirth()
+        
+        while not self._thread_terminate:
+            self._node.loop()
+            await asyncio.sleep(self._node.min_publish_interval / self._clock.time_scale)
+        
+        self._node.loop()
+        self._client.disconnect()
+        print("Connection closed")
+
+
 class SparkplugBase:
 
     """
     Sparkplug base class for nodes and devices
     """
-    def __init__(self, model):
+    
+    # Committed ticks kept until the connector publishes them, further
+    # ticks are merged into the last one
+    MAX_COMMITTED_TICKS = 64
+    
+    def __init__(self, model, clock = None, lock = None):
         self.logger = logging.getLogger(__name__)
         self._metrics = [] 
+        self._lookup_size = -1
+        self._by_name = {}
+        self._by_alias = {}
         self._model = model
+        self._clock = clock if clock is not None else get_default_clock()
         self._min_publish_interval = 0.5
-        self._lock = threading.Lock()
-        self._last_publish_time = timer()
+        self._lock = lock if lock is not None else threading.Lock()
+        self._last_publish_time = self._clock.monotonic()
         self._metric_publish_queue = {}
+        self._lockstep = False
+        self._tick_changes = {}
+        self._committed_ticks = collections.deque()
 
     @property
     def model(self):
@@ -210,6 +431,21 @@ class SparkplugBase:
     @property
     def metrics(self):
         return self._metrics
+
+    @property
+    def clock(self):
+        return self._clock
+    
+    @property
+    def lockstep(self):
+        return self._lockstep
+    
+    def set_lockstep(self, value):
+        """
+        Collect changes per tick instead of publishing them on the own timer
+
+        """
+        self._lockstep = value
     
     @property
     def min_publish_interval(self):
@@ -220,7 +456,7 @@ class SparkplugBase:
         self._min_publish_interval = value 
     
     
-    def publishData(self, metric_list):
+    def publishData(self, metric_list, values = None, timestamp = None):
         """
         Publish metrics to the broker
         To overwrite!
@@ -239,6 +475,10 @@ class SparkplugBase:
             Metric to be queued
 
         """
+        if self._lockstep:
+            self._tick_changes[metric.alias] = metric
+            return
+        
         self._lock.acquire()
         self._metric_publish_queue[metric.alias] = metric
         self._lock.release()
@@ -283,41 +523,69 @@ class SparkplugBase:
         Incoming metrics are forwarded to the real value to be updated
 
         """
+        by_name, by_alias = self._metric_lookup()
+        
         for payload_metric in payload.metrics:
-            for metric in self.metrics:
-                if payload_metric.name == metric.name or payload_metric.alias == metric.alias:
-                    value = self.get_payload_value(payload_metric, metric.datatype)
-                    metric.update_value(value)   
+            matches = by_name.get(payload_metric.name, []) + by_alias.get(payload_metric.alias, [])
+            
+            for metric in dict.fromkeys(matches):
+                value = self.get_payload_value(payload_metric, metric.datatype)
+                metric.update_value(value)   
+    
+    def _metric_lookup(self):
+        """
+        Return: metrics by name and by alias, rebuilt when metrics were added
+        
+        """
+        if self._lookup_size != len(self._metrics):
+            self._by_name = {}
+            self._by_alias = {}
+            
+            for metric in self._metrics:
+                self._by_name.setdefault(metric.name, []).append(metric)
+                self._by_alias.setdefault(metric.alias, []).append(metric)
+                
+            self._lookup_size = len(self._metrics)
+            
+        return self._by_name, self._by_alias
         
-    def _metrics_to_bytearray(self, metrics, payload, use_name = False):
+    def _metrics_to_bytearray(self, metrics, payload, use_name = False, values = None, timestamp = None):
         """
         Transform all metrics to a byte array to be send
+        
+        The current values of the metrics are used, unless values holds
+        the values in the order of metrics.
 
         """
-        for metric in metrics:
+        if timestamp is None:
+            timestamp = self._clock.time_ms()
+        
+        for index, metric in enumerate(metrics):
             if use_name:
                 name = metric.name
             else:
                 name = None
+            
+            value = metric.value if values is None else values[index]
                 
             if isinstance(metric, SparkplugDataSetMetric):
-                if not isinstance(metric.value, list):
+                if not isinstance(value, list):
                     raise Exception("SparkplugDataSetMetric has no list as value")
                 
                 column_names = [c[0] for c in metric.columns]
                 column_data_types = [c[1] for c in metric.columns]
                 columns_count = metric.columns_count
 
-                dataset = sp.initDatasetMetric(payload, name, metric.alias, column_names, column_data_types)   
+                dataset = sp.initDatasetMetric(payload, name, metric.alias, column_names, column_data_types, timestamp)   
                 
-                for data_entry in metric.value:
+                for data_entry in value:
                     row = dataset.rows.add()
                     for data_idx in range(columns_count):
                         element = row.elements.add()
                         self._set_element_value(element, data_entry[data_idx], column_data_types[data_idx])
 
             else:
-                sp.addMetric(payload, name, metric.alias, metric.datatype, metric.value)     
+                sp.addMetric(payload, name, metric.alias, metric.datatype, value, timestamp)     
 
         return bytearray(payload.SerializeToString())
         
@@ -363,13 +631,64 @@ class SparkplugBase:
         self.publishData(list(self._metric_publish_queue.values()))
         self._metric_publish_queue.clear()
     
+    def commit_tick(self):
+        """
+        Close the change set of the finished tick (lockstep mode).
+        Called by the runner thread, the values are taken at the end of
+        the tick.
+
+        """
+        if not self._tick_changes:
+            return
+        
+        changes, self._tick_changes = self._tick_changes, {}
+        values = {alias: (metric, copy_value(metric.value)) for alias, metric in changes.items()}
+        timestamp = self._clock.time_ms()
+        
+        with self._lock:
+            committed = self._committed_ticks
+            
+            if len(committed) < self.MAX_COMMITTED_TICKS:
+                committed.append((timestamp, values))
+            else:
+                # not published for a while, e.g. the broker is down
+                merged = committed[-1][1]
+                merged.update(values)
+                committed[-1] = (timestamp, merged)
+    
+    def _publish_committed_ticks(self):
+        """
+        Publish all committed ticks as one message. Later ticks overwrite
+        the values of earlier ones.
+
+        """
+        if not self._committed_ticks:
+            return
+        
+        with self._lock:
+            committed, self._committed_ticks = self._committed_ticks, collections.deque()
+        
+        merged = {}
+        timestamp = None
+        
+        for timestamp, values in committed:
+            merged.update(values)
+        
+        entries = list(merged.values())
+        self.publishData([e[0] for e in entries], [e[1] for e in entries], timestamp)
+    
     def loop(self):
         
-        elapsed = timer() - self._last_publish_time
+        elapsed = self._clock.monotonic() - self._last_publish_time
         
         if elapsed >= self.min_publish_interval:
 
-            self._last_publish_time = timer()
+            self._last_publish_time = self._clock.monotonic()
+            
+            if self._lockstep:
+                self._publish_committed_ticks()
+                return
+            
             self._lock.acquire()
             self._publish_queue()
             self._lock.release()
@@ -381,7 +700,7 @@ class SparkplugNode(SparkplugBase):
     Sparkplug Node
     """
     def __init__(self, connector, model):
-        super().__init__(model)
+        super().__init__(model, connector.clock, connector.create_lock())
         self.logger = logging.getLogger(__name__)
         
         self._devices = {}
@@ -405,7 +724,7 @@ class SparkplugNode(SparkplugBase):
         self.logger.debug("Publishing Node Birth")
 
         # Create the node birth payload
-        payload = sp.getNodeBirthPayload()
+        payload = sp.getNodeBirthPayload(self._clock.time_ms())
     
         byteArray = self._metrics_to_bytearray(self.metrics, payload, True)
     
@@ -416,17 +735,32 @@ class SparkplugNode(SparkplugBase):
         
         for device_name in self._devices:
             self._devices[device_name].loop()
+            
+    def set_lockstep(self, value):
+        super().set_lockstep(value)
+        
+        for device in self._devices.values():
+            device.set_lockstep(value)
+    
+    def commit_tick(self):
+        super().commit_tick()
+        
+        for device in self._devices.values():
+            device.commit_tick()
 
     def publishDeviceBirth(self):
         for device_name in self._devices:
             self._devices[device_name].publishBirth()
 
 
-    def publishData(self, metric_list):
+    def publishData(self, metric_list, values = None, timestamp = None):
         
-        payload = sp.getDdataPayload()
+        if timestamp is None:
+            timestamp = self._clock.time_ms()
         
-        byteArray = self._metrics_to_bytearray(metric_list, payload)
+        payload = sp.getDdataPayload(timestamp)
+        
+        byteArray = self._metrics_to_bytearray(metric_list, payload, False, values, timestamp)
         
         self._connector.client.publish("spBv1.0/" + self._connector.group + "/NDATA/" + self.name, byteArray, 0, False)
         
@@ -474,7 +808,7 @@ class SparkplugNode(SparkplugBase):
 class SparkplugDevice(SparkplugBase):
     
     def __init__(self, node, model):
-        super().__init__(model)  
+        super().__init__(model, node.clock, node.connector.create_lock())  
         self.logger = logging.getLogger(__name__)
         
         self._node = node
@@ -485,18 +819,21 @@ class SparkplugDevice(SparkplugBase):
         self.logger.debug("Publishing Node Birth")
 
         # Create the node birth payload
-        payload = sp.getDeviceBirthPayload()
+        payload = sp.getDeviceBirthPayload(self._clock.time_ms())
     
         byteArray = self._metrics_to_bytearray(self.metrics, payload, True)
     
         self._node.connector.client.publish("spBv1.0/" + self._node.connector.group + "/DBIRTH/" +  self._node.name + "/" + self.name, byteArray, 0, False)
     
 
-    def publishData(self, metric_list):
+    def publishData(self, metric_list, values = None, timestamp = None):
+        
+        if timestamp is None:
+            timestamp = self._clock.time_ms()
         
-        payload = sp.getDdataPayload()
+        payload = sp.getDdataPayload(timestamp)
         
-        byteArray = self._metrics_to_bytearray(metric_list, payload)
+        byteArray = self._metrics_to_bytearray(metric_list, payload, False, values, timestamp)
         
         self._node.connector.client.publish("spBv1.0/" + self._node.connector.group + "/DDATA/" + self._node.name + "/" + self.name, byteArray, 0, False)
         
@@ -579,7 +916,7 @@ class SparkplugMetric:
     def update_value(self, value):
         return 0
     
-    def _value_has_changed(self, callback, source):
+    def _value_has_changed(self, source, old_value, new_value):
         pass
         
         
@@ -590,11 +927,19 @@ class SparkplugValueMetric(SparkplugMetric):
         self.logger = logging.getLogger(__name__)
     
         self._model_io = model_io
-        self._model_io.add_value_changed_listener(self._value_has_changed)
+        self._model_io.add_change_listener(self._value_has_changed)
         
     @property
     def model_io(self):
-        return self.model_io
+        return self._model_io
+    
+    def detach_listener(self):
+        """
+        Stop listening to the changes of the value, which are queued by
+        the connector from the change journal then
+        
+        """
+        self._model_io.remove_change_listener(self._value_has_changed)
     
     @property
     def name(self):
@@ -615,7 +960,7 @@ class SparkplugValueMetric(SparkplugMetric):
     def update_value(self, value):
         return self._model_io.update_request(value)
     
-    def _value_has_changed(self, callback, source):
+    def _value_has_changed(self, source, old_value, new_value):
         self.parent.queue_publishData(self)
 
     
@@ -89,12 +89,12 @@ def getNodeDeathPayload():
 ######################################################################
 # Always request this after requesting the Node Death Payload
 ######################################################################
-def getNodeBirthPayload():
+def getNodeBirthPayload(timestamp = None):
     global seqNum
     global current_bdSeq
     seqNum = 0
     payload = Payload()
-    payload.timestamp = int(round(time.time() * 1000))
+    payload.timestamp = getTimestamp(timestamp)
     payload.seq = getSeqNum()
     addMetric(payload, "bdSeq", None, MetricDataType.Int64, current_bdSeq)
     return payload
@@ -103,9 +103,9 @@ def getNodeBirthPayload():
 ######################################################################
 # Get the DBIRTH payload
 ######################################################################
-def getDeviceBirthPayload():
+def getDeviceBirthPayload(timestamp = None):
     payload = Payload()
-    payload.timestamp = int(round(time.time() * 1000))
+    payload.timestamp = getTimestamp(timestamp)
     payload.seq = getSeqNum()
     return payload
 ######################################################################
@@ -113,20 +113,20 @@ def getDeviceBirthPayload():
 ######################################################################
 # Get a DDATA payload
 ######################################################################
-def getDdataPayload():
-    return getDeviceBirthPayload()
+def getDdataPayload(timestamp = None):
+    return getDeviceBirthPayload(timestamp)
 ######################################################################
 
 ######################################################################
 # Helper method for adding dataset metrics to a payload
 ######################################################################
-def initDatasetMetric(payload, name, alias, columns, types):
+def initDatasetMetric(payload, name, alias, columns, types, timestamp = None):
     metric = payload.metrics.add()
     if name is not None:
         metric.name = name
     if alias is not None:
         metric.alias = alias
-    metric.timestamp = int(round(time.time() * 1000))
+    metric.timestamp = getTimestamp(timestamp)
     metric.datatype = MetricDataType.DataSet
 
     # Set up the dataset
@@ -162,13 +162,13 @@ def initTemplateMetric(payload, name, alias, templateRef):
 # Helper method for adding metrics to a container which can be a
 # payload or a template
 ######################################################################
-def addMetric(container, name, alias, type, value):
+def addMetric(container, name, alias, type, value, timestamp = None):
     metric = container.metrics.add()
     if name is not None:
         metric.name = name
     if alias is not None:
         metric.alias = alias
-    metric.timestamp = int(round(time.time() * 1000))
+    metric.timestamp = getTimestamp(timestamp)
 
     # print "Type: " + str(type)
 
@@ -291,6 +291,16 @@ def addNullMetric(container, name, alias, type):
     return metric
 ######################################################################
 
+######################################################################
+# Helper method for the payload and metric timestamps. A given model
+# time in milliseconds is used as it is, otherwise the wall time.
+######################################################################
+def getTimestamp(timestamp = None):
+    if timestamp is not None:
+        return timestamp
+    return int(round(time.time() * 1000))
+######################################################################
+
 ######################################################################
 # Helper method for getting the next sequence number
 ######################################################################
@@ -0,0 +1,264 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ModelValue, ValueDataType
+from iomodel.common.components import Switch, Variant
+
+
+class Recorder(ModelValue):
+
+    calls = []
+
+    def loop(self, tick):
+        Recorder.calls.append(self.qualified_name)
+
+
+class Wrapper(ModelDevice):
+
+    def loop(self, tick):
+        Recorder.calls.append("wrapper")
+        super().loop(tick)
+
+
+def test_loop_schedule_skips_noop_children():
+    root = ModelDevice("Root")
+    Variant("A", root, 0)
+    switch = Switch("B", root)
+    sub = ModelDevice("Sub", root)
+    Variant("C", sub, 0)
+    recorder = Recorder("D", sub)
+
+    assert root.loop_schedule == [switch, recorder]
+
+
+def test_loop_schedule_keeps_order_and_follows_add_child():
+    Recorder.calls = []
+    root = ModelDevice("Root")
+    Recorder("1", root)
+    wrapper = Wrapper("W", root)
+    Recorder("2", wrapper)
+    sub = ModelDevice("Sub", root)
+    Recorder("3", sub)
+
+    root.loop(1)
+    assert Recorder.calls == ["1", "wrapper", "2", "3"]
+    assert root.loop_schedule == [root.children[0], wrapper, sub.children[0]]
+
+    Recorder.calls = []
+    Recorder("4", sub)
+    Recorder("5", wrapper)
+    root.loop(1)
+    assert Recorder.calls == ["1", "wrapper", "2", "5", "3", "4"]
+
+
+def test_sleeping_objects_are_skipped_until_woken():
+    from iomodel.common.base import Sleepable, SleepSchedule
+
+    class Idler(Sleepable):
+
+        def __init__(self, name, wake_on):
+            self.name = name
+            self.wake_on = wake_on
+
+        def loop(self, tick):
+            Recorder.calls.append(self.name)
+            if self.wake_on is not None:
+                self.sleep(self.wake_on)
+
+    root = ModelDevice("Root")
+    trigger = Variant("Trigger", root, 0)
+    waker = Idler("waker", None)
+    sleeper = Idler("sleeper", trigger)
+    schedule = SleepSchedule([waker, sleeper])
+
+    Recorder.calls = []
+    schedule.loop(1)
+    schedule.loop(1)
+    assert Recorder.calls == ["waker", "sleeper", "waker"]
+    assert schedule.awake == [waker]
+
+    # woken before its turn: looped in the same tick
+    waker.loop = lambda tick: setattr(trigger, "value", trigger.value + 1)
+    Recorder.calls = []
+    schedule.loop(1)
+    assert Recorder.calls == ["sleeper"]
+    assert sleeper.sleeping
+
+
+def test_idle_switch_sleeps_in_device_loop():
+    root = ModelDevice("Root")
+    idle = Switch("Idle", root)
+    polled = Switch("Polled", root)
+    polled.set_callback(lambda: True)
+
+    root.loop(1)
+    assert idle.sleeping and not polled.sleeping
+    assert polled.value
+
+    idle.set_callback(lambda: True)
+    root.loop(1)
+    assert idle.value
+
+
+def test_values_are_slotted_and_share_the_empty_dispatcher():
+    root = ModelDevice("Root")
+    first = Variant("Conv1/Drive/Speed", root, 0)
+    second = Switch("Conv1/Photoeye", root)
+
+    assert not hasattr(first, "__dict__") and not hasattr(second, "__dict__")
+    assert (first.name, first.path_string, first.path_list) == ("Speed", "Conv1/Drive/", ["Conv1", "Drive"])
+    assert first._dispatcher is second._dispatcher
+
+    changes = []
+    first.add_value_changed_listener(lambda callback, source: changes.append(callback.new_value))
+    first.value = 5
+    second.value = True
+
+    assert changes == [5]
+    assert first._dispatcher is not second._dispatcher
+
+
+def test_batch_coalesces_changes_to_one_event_per_value():
+    from iomodel.common.components import VariantDataMap
+
+    root = ModelDevice("Root")
+    position = Variant("BoxPosition", root, 0.0, ValueDataType.Float)
+    speed = Variant("Speed", root, 0)
+    errors = VariantDataMap("Errors", root)
+    events = []
+    for value in (position, speed, errors):
+        value.add_value_changed_listener(lambda callback, source: events.append(
+            (source.name, callback.old_value, callback.new_value, callback.batch)))
+
+    with root.batch() as batch:
+        position.value = 10.0
+        with root.batch():
+            position.value = 20.0
+        speed.value = 5
+        speed.value = 0
+        errors.set_entry("A", ("A", "Jam"))
+        assert events == []
+
+    assert events == [("BoxPosition", 0.0, 20.0, batch), ("Errors", None, [("A", "Jam")], batch)]
+    assert [change[0] for change in batch.changes] == [position, errors]
+
+    speed.value = 1
+    assert events[-1] == ("Speed", 0, 1, None)
+
+
+def test_batch_merges_replacement_and_explicit_event():
+    from iomodel.common.components import VariantDataMap
+
+    root = ModelDevice("Root")
+    errors = VariantDataMap("Errors", root)
+    errors.set_entry("A", ("A", "Jam"))
+    rows = errors.value
+    events = []
+    errors.add_change_listener(lambda source, old_value, new_value: events.append((old_value, list(new_value))))
+
+    # the rows end up equal, but were replaced and rebuilt
+    with root.batch() as batch:
+        errors.value = []
+        errors.set_entry("A", ("A", "Jam"))
+
+    assert events == [(rows, [("A", "Jam")])]
+    assert batch.changes[0][2] is errors.value
+
+
+def test_dataset_versions_track_changed_rows():
+    from iomodel.common.components import VariantDataMap, VariantDataSet
+
+    root = ModelDevice("Root")
+    errors = VariantDataMap("Errors", root)
+    log = VariantDataSet("Log", root)
+    events = []
+    errors.add_value_changed_listener(lambda callback, source: events.append(source.version))
+
+    for key in ("A", "B", "C"):
+        errors.set_entry(key, (key, "Jam"))
+    version = errors.version
+    errors.set_entry("A", ("A", "Jam"))
+    errors.set_entry("B", ("B", "Overcurrent"))
+    errors.del_entry("A")
+
+    assert errors.value == [("C", "Jam"), ("B", "Overcurrent")]
+    assert errors.get_entry("C") == ("C", "Jam")
+    assert errors.changed_rows(version) == ["B", "A"]
+    assert events == [1, 2, 3, 4, 5]
+
+    errors.set_state(errors.get_state())
+    assert errors.value == [("C", "Jam"), ("B", "Overcurrent")]
+    assert errors.changed_rows(version) is None
+
+    log.append_data([(1, "a"), (2, "b")])
+    log.append_data((3, "c"))
+    assert log.changed_rows(2) == [2]
+
+
+def test_data_map_after_clear_and_replace():
+    from iomodel.common.components import VariantDataMap
+
+    errors = VariantDataMap("Errors", ModelDevice("Root"))
+    errors.set_entry("A", ("A", "Jam"))
+    errors.set_entry("B", ("B", "Jam"))
+    errors.clear_data()
+
+    errors.set_entry("A", ("A", "Overcurrent"))
+    errors.del_entry("B")
+    assert errors.value == [("A", "Overcurrent")]
+    assert errors.map_count == 1
+
+    errors.value = [("X", "Jam")]
+    errors.set_entry("A", ("A", "Jam"))
+    errors.del_entry("A")
+    assert errors.get_entry("A") is None
+    assert errors.value == [("X", "Jam")]
+    assert errors.map_count == 0
+
+    errors.set_entry("A", ("A", "Jam"))
+    errors.set_entry("B", ("B", "Jam"))
+    errors.del_entry("A")
+    assert errors.value == [("X", "Jam"), ("B", "Jam")]
+    errors.del_entry("B")
+    assert errors.value == [("X", "Jam")]
+    assert errors.map_count == 0
+
+
+def test_dispatcher_add_remove_and_fire():
+    from iomodel.common.util_callback import Dispatcher
+
+    dispatcher = Dispatcher()
+    events = []
+    first = lambda event, source: events.append(("first", event.name, source))
+    second = lambda event, source: events.append(("second", event.name, source))
+
+    dispatcher.fire("tick")
+    dispatcher.add_listener("tick", first)
+    dispatcher.add_listener("tick", second)
+    dispatcher.fire("tick", source = 1)
+
+    assert dispatcher.remove_listener("tick", first)
+    assert not dispatcher.remove_listener("tick", first)
+    dispatcher.fire("tick", source = 2)
+    assert dispatcher.remove_listener("tick", second)
+
+    assert not dispatcher.has_listeners("tick")
+    assert events == [("first", "tick", 1), ("second", "tick", 1), ("second", "tick", 2)]
+
+
+def test_change_listener_gets_source_old_and_new():
+    root = ModelDevice("Root")
+    speed = Variant("Speed", root, 0)
+    changes = []
+    listener = lambda source, old_value, new_value: changes.append((source, old_value, new_value))
+    speed.add_change_listener(listener)
+
+    speed.value = 5
+    with root.batch():
+        speed.value = 6
+        speed.value = 7
+    speed.remove_change_listener(listener)
+    speed.value = 8
+
+    assert changes == [(speed, 0, 5), (speed, 5, 7)]
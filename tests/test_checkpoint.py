@@ -0,0 +1,115 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant, VariantDataMap, TemperatureSensor, Switch
+from iomodel.common.checkpoint import Checkpoint
+
+
+class Handler:
+
+    def __init__(self):
+        self.box = None
+
+    def get_state(self):
+        return self.box
+
+    def set_state(self, state):
+        self.box = state
+
+
+def build():
+    plant = ModelDevice("Plant")
+    area = ModelDevice("Area", plant)
+    values = {
+        "int": Variant("Conv/Drive/Encoder", area, 0, ValueDataType.Int),
+        "float": Variant("Conv/BoxPosition", area, 0.0, ValueDataType.Float),
+        "bool": Switch("Conv/Occupied", area, False),
+        "string": Variant("Conv/BoxId", area, "", ValueDataType.String),
+        "big": Variant("Conv/Counter", area, 0, ValueDataType.Int),
+        "map": VariantDataMap("ChildErrors", area),
+        "temp": TemperatureSensor("Temp", plant, 0.0, 80, 10),
+    }
+    return plant, values
+
+
+def test_save_and_restore(tmp_path):
+    plant, values = build()
+    values["int"].value = -42
+    values["float"].value = 512.5
+    values["bool"].value = True
+    values["string"].value = "12345678"
+    values["big"].value = 1 << 70
+    values["map"].set_entry("S1", ("S1", "Jam"))
+    values["temp"].heat(True)
+    for i in range(5):
+        plant.loop(1)
+    handler = Handler()
+    handler.box = ("12345678", 500)
+
+    checkpoint = Checkpoint(plant)
+    checkpoint.register("Area/Conv/TransportHandler", handler)
+    checkpoint.save(tmp_path / "plant.chk")
+
+    restored_plant, restored = build()
+    restored_handler = Handler()
+    events = []
+    restored["float"].add_value_changed_listener(lambda c, s: events.append(s))
+    checkpoint = Checkpoint(restored_plant)
+    checkpoint.register("Area/Conv/TransportHandler", restored_handler)
+    checkpoint.restore(tmp_path / "plant.chk")
+
+    for key in values:
+        assert restored[key].value == values[key].value
+        assert type(restored[key].value) == type(values[key].value)
+    assert restored["map"].map_count == 1
+    assert restored_handler.box == ("12345678", 500)
+    assert events == []
+
+    plant.loop(1)
+    restored_plant.loop(1)
+    assert restored["temp"].value == values["temp"].value
+
+
+def test_restore_rejects_other_structure(tmp_path):
+    plant, _ = build()
+    Checkpoint(plant).save(tmp_path / "plant.chk")
+
+    other, _ = build()
+    Variant("Extra", other, 0)
+
+    with pytest.raises(Exception):
+        Checkpoint(other).restore(tmp_path / "plant.chk")
+
+
+def test_restore_rejects_same_names_of_other_parents_or_types(tmp_path):
+    plant = ModelDevice("Plant")
+    Variant("Speed", ModelDevice("A", plant), 0)
+    ModelDevice("B", plant)
+    Checkpoint(plant).save(tmp_path / "plant.chk")
+
+    moved = ModelDevice("Plant")
+    ModelDevice("A", moved)
+    Variant("Speed", ModelDevice("B", moved), 0)
+
+    retyped = ModelDevice("Plant")
+    Variant("Speed", ModelDevice("A", retyped), 0.0, ValueDataType.Float)
+    ModelDevice("B", retyped)
+
+    for other in (moved, retyped):
+        with pytest.raises(Exception, match = "structure"):
+            Checkpoint(other).restore(tmp_path / "plant.chk")
+
+
+def test_failed_restore_raises_the_original_error(tmp_path):
+    plant, _ = build()
+    Checkpoint(plant).save(tmp_path / "plant.chk")
+    data = (tmp_path / "plant.chk").read_bytes()
+    (tmp_path / "plant.chk").write_bytes(data[:-4] + b"\x00" * 4)
+
+    with pytest.raises(Exception) as error:
+        Checkpoint(build()[0]).restore(tmp_path / "plant.chk")
+    assert not isinstance(error.value, BufferError)
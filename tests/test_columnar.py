@@ -0,0 +1,128 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from iomodel.common import columnar
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant, Switch, VariantDataMap
+from iomodel.common.columnar import ColumnStore, INT, FLOAT, BOOL, OBJECT
+
+
+@pytest.fixture(params = ["list", "numpy"])
+def backend(request, monkeypatch):
+    """
+    Runs a test with list columns and, if installed, with NumPy columns
+    """
+    if request.param == "numpy":
+        monkeypatch.setattr(columnar, "numpy", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(columnar, "numpy", None)
+    return request.param
+
+
+def build():
+    plant = ModelDevice("Plant")
+    conv = ModelDevice("Conv", plant)
+    values = {"speed": Variant("Speed", conv, 0, ValueDataType.Int),
+              "position": Variant("Position", conv, False, ValueDataType.Float),
+              "current": Variant("Current", conv, 0.0, ValueDataType.Float),
+              "photoeye": Switch("Photoeye", conv, False),
+              "name": Variant("Name", conv, "C1", ValueDataType.String),
+              "errors": VariantDataMap("Errors", conv)}
+    return plant, values
+
+
+def test_bound_values_keep_their_behaviour(backend):
+    plant, values = build()
+    store = ColumnStore(plant)
+    changes = []
+    values["speed"].add_value_changed_listener(lambda callback, source: changes.append(callback.new_value))
+
+    assert isinstance(values["speed"], Variant)
+    assert values["position"].value is False
+    assert values["errors"].value == []
+
+    values["speed"].value = 200
+    values["speed"].value = 200
+    values["speed"].value = 2.5
+    values["position"].value = 10.0
+    values["errors"].set_entry("A", ("A", "Jam"))
+
+    assert changes == [200, 2.5]
+    assert values["speed"].value == 2.5
+    assert values["position"].value == 10.0
+    assert values["errors"].value == [("A", "Jam")]
+    # datasets are mutated in place and keep their own storage
+    assert store.view(plant).members(OBJECT) == [values["speed"], values["position"], values["name"]]
+
+
+def test_bulk_read_write_and_changes(backend):
+    plant, values = build()
+    store = ColumnStore(plant)
+    view = store.view(plant)
+    changes = []
+    values["current"].add_value_changed_listener(lambda callback, source: changes.append(callback.new_value))
+
+    snapshot = view.snapshot()
+    view.write(FLOAT, [3.5])
+    view.write(BOOL, [True], notify = False)
+
+    assert list(view.read(FLOAT)) == [3.5]
+    assert changes == [3.5]
+    assert values["photoeye"].value is True
+    assert set(view.changes(snapshot)) == {values["current"], values["photoeye"]}
+
+    # moving a value to the object column is detected as well
+    snapshot = view.snapshot()
+    values["speed"].value = "fast"
+    assert view.changes(snapshot) == [values["speed"]]
+    assert list(view.read(INT)) == []
+
+
+def test_bulk_write_tracks_generations_and_filters(backend):
+    from iomodel.common.util_filter import DeadbandFilter
+    from iomodel.common.versioning import enable_versioning, disable_versioning
+
+    plant = ModelDevice("Plant")
+    speeds = [Variant("Speed" + str(i), plant, 0, ValueDataType.Int) for i in range(3)]
+    speeds[2].value_filter = DeadbandFilter(absolute = 10)
+    view = ColumnStore(plant).view(plant)
+    changes = []
+    for speed in speeds:
+        speed.add_value_changed_listener(lambda callback, source: changes.append((source, callback.new_value)))
+
+    generations = enable_versioning()
+    try:
+        generation = generations.generation
+        view.write(INT, [5, 0, 6])
+        current, changed = generations.changes_since(generation, plant)
+        assert changed == [(speeds[0], 5), (speeds[2], 6)]
+        assert changes == [(speeds[0], 5)]
+
+        view.write(INT, [5, 7, 6], notify = False)
+        assert generations.changes_since(current, plant)[1] == [(speeds[1], 7)]
+        assert changes == [(speeds[0], 5)]
+    finally:
+        disable_versioning()
+
+
+def test_int_written_to_float_value_stays_in_float_column(backend):
+    from iomodel.common.components import TemperatureSensor
+
+    plant = ModelDevice("Plant")
+    sensor = TemperatureSensor("Temperature", plant, 0.0, 100, 2)
+    store = ColumnStore(plant)
+    version = store.version
+
+    sensor.heat()
+    sensor.loop(1)
+    sensor.heat(False)
+    for _ in range(10):
+        sensor.loop(1)
+
+    assert sensor.value == 0 and type(sensor.value) is float
+    sensor.value = 1 << 60
+    assert store.version == version + 1
+    assert sensor.value == 1 << 60 and type(sensor.value) is int
@@ -0,0 +1,114 @@
+import os
+import sys
+import asyncio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant
+from iomodel.sparkplug.connector import AsyncNodeConnector, NoLock
+
+
+def build_node():
+    node = ModelDevice("Node")
+    Variant("Counter", node, 0, ValueDataType.Int)
+    device = ModelDevice("Device", node)
+    Variant("Speed", device, 0.0, ValueDataType.Float)
+    return node
+
+
+def test_async_connector_uses_no_locks():
+    connector = AsyncNodeConnector(build_node(), "Group", ("127.0.0.1", 1, 60))
+
+    assert isinstance(connector._node._lock, NoLock)
+    assert isinstance(connector._node.devices["Device"]._lock, NoLock)
+
+
+def test_async_connector_returns_without_broker():
+    connector = AsyncNodeConnector(build_node(), "Group", ("127.0.0.1", 1, 60))
+
+    asyncio.run(asyncio.wait_for(connector.run(), 5))
+
+
+@pytest.mark.parametrize("use_journal", [False, True])
+def test_lockstep_publishes_state_of_complete_ticks(use_journal):
+    from iomodel.common.base import ModelObject
+    from iomodel.common.clock import SimulationClock
+    from iomodel.common.runner import ModelRunner
+    from iomodel.sparkplug.connector import NodeConnector
+
+    class Ramp(ModelObject):
+
+        def __init__(self, speed):
+            super().__init__("Ramp")
+            self.speed = speed
+
+        def loop(self, tick):
+            speed = self.speed
+            speed.value = speed.value + 1.0
+            speed.value = speed.value + 1.0
+
+    clock = SimulationClock(as_fast_as_possible = True)
+    node = build_node()
+    runner = ModelRunner(0.1, clock = clock)
+    speed = node.children[1].children[0]
+    runner.add_model_object(Ramp(speed))
+    connector = NodeConnector(node, "Group", ("127.0.0.1", 1, 60), clock = clock)
+    connector.attach_runner(runner, use_journal)
+
+    device = connector._node.devices["Device"]
+    published = []
+    device.publishData = lambda metrics, values = None, timestamp = None: published.append(values)
+
+    runner.run_for(0.5)
+    device.loop()
+
+    assert connector.lockstep
+    assert device._lock.locked() is False
+    assert published == [[10.0]]
+    assert (runner.journal is not None) == use_journal
+
+
+def test_inbound_metrics_are_matched_by_name_or_alias():
+    from iomodel.sparkplug.connector import NodeConnector
+    from iomodel.sparkplug import sparkplug_b_pb2
+
+    node = ModelDevice("Node")
+    speed = Variant("Speed", node, 0, ValueDataType.Int, True)
+    limit = Variant("Limit", node, 0, ValueDataType.Int, True)
+    connector = NodeConnector(node, "Group", ("127.0.0.1", 1, 60))
+    sparkplug_node = connector._node
+    alias = [m.alias for m in sparkplug_node.metrics if m.name == "Limit"][0]
+
+    payload = sparkplug_b_pb2.Payload()
+    by_name = payload.metrics.add()
+    by_name.name = "Speed"
+    by_name.int_value = 200
+    by_alias = payload.metrics.add()
+    by_alias.alias = alias
+    by_alias.int_value = 50
+    sparkplug_node.consume_msg(payload)
+
+    assert (speed.value, limit.value) == (200, 50)
+
+
+def test_committed_ticks_are_bounded_without_publishing():
+    from iomodel.sparkplug.connector import NodeConnector
+
+    node = build_node()
+    connector = NodeConnector(node, "Group", ("127.0.0.1", 1, 60))
+    device = connector._node.devices["Device"]
+    device.set_lockstep(True)
+    metric = [m for m in device.metrics if m.name == "Speed"][0]
+    published = []
+    device.publishData = lambda metrics, values = None, timestamp = None: published.append(values)
+
+    for i in range(1, 201):
+        metric.model_io.value = float(i)
+        device.commit_tick()
+
+    assert len(device._committed_ticks) == device.MAX_COMMITTED_TICKS
+    device._publish_committed_ticks()
+    assert published == [[200.0]]
+    assert len(device._committed_ticks) == 0
@@ -0,0 +1,107 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from iomodel.common.base import ModelDevice, ModelObject
+from iomodel.common.components import Variant
+from iomodel.common.clock import SimulationClock
+from iomodel.common.delivery import DeliveryQueue, OverflowPolicy
+from iomodel.common.runner import ModelRunner
+
+
+class Counter(ModelObject):
+
+    def __init__(self, value):
+        super().__init__("Counter")
+        self.value = value
+
+    def loop(self, tick):
+        self.value.value += 1
+        self.value.value += 1
+
+
+def test_deferred_delivery_at_end_of_tick():
+    root = ModelDevice("Root")
+    count = Variant("Count", root, 0)
+    queue = DeliveryQueue(max_depth = 3)
+    events = []
+    listener = lambda source, old_value, new_value: events.append((new_value, queue.depth))
+    count.add_change_listener(listener, delivery = queue)
+
+    runner = ModelRunner(0.1, clock = SimulationClock(as_fast_as_possible = True))
+    runner.add_model_object(Counter(count))
+    queue.attach_runner(runner)
+    runner.run_for(0.2)
+
+    assert events == [(1, 1), (2, 0), (3, 1), (4, 0)]
+    assert (queue.delivered, queue.peak, queue.dropped) == (4, 2, 0)
+
+    for value in range(10, 15):
+        count.value = value
+    assert queue.depth == 3 and queue.dropped == 2
+    queue.drain()
+    assert [e[0] for e in events[4:]] == [12, 13, 14]
+
+    count.remove_change_listener(listener)
+    count.value = 0
+    assert queue.depth == 0
+
+
+def test_executor_delivery_drop_newest():
+    root = ModelDevice("Root")
+    count = Variant("Count", root, 0)
+    release = threading.Event()
+    delivered = []
+
+    def slow(callback, source):
+        release.wait(5)
+        delivered.append(callback.new_value)
+
+    with ThreadPoolExecutor(1) as executor:
+        queue = DeliveryQueue(max_depth = 2, overflow = OverflowPolicy.DropNewest, executor = executor)
+        count.add_value_changed_listener(slow, delivery = queue)
+
+        for value in range(1, 6):
+            count.value = value
+        release.set()
+
+    # the first event may already be taken by the executor
+    assert delivered in ([1, 2], [1, 2, 3])
+    assert queue.dropped == 5 - len(delivered)
+    assert queue.depth == 0
+
+
+def test_block_does_not_wait_for_the_delivering_thread():
+    root = ModelDevice("Root")
+    count = Variant("Count", root, 0)
+    echo = Variant("Echo", root, 0)
+    full = threading.Event()
+    done = threading.Event()
+    echoed = []
+
+    def copy(source, old_value, new_value):
+        # queues into the full queue from its own delivery thread
+        full.wait(5)
+        echo.value = new_value
+        done.set()
+
+    executor = ThreadPoolExecutor(1)
+    queue = DeliveryQueue(max_depth = 1, overflow = OverflowPolicy.Block, executor = executor)
+    count.add_change_listener(copy, delivery = queue)
+    echo.add_change_listener(lambda source, old_value, new_value: echoed.append(new_value), delivery = queue)
+
+    count.value = 1
+    count.value = 2
+    full.set()
+    try:
+        assert done.wait(5)
+    finally:
+        # wakes up a blocked listener if the test failed
+        queue.drain()
+        executor.shutdown()
+
+    assert echoed == [1]
+    assert (queue.delivered, queue.dropped, queue.errors) == (2, 1, 0)
@@ -0,0 +1,92 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant, TemperatureSensor
+from iomodel.common.clock import SimulationClock
+from iomodel.common.util_filter import DeadbandFilter, apply_filter, filter_statistics
+
+
+def record(model_value):
+    events = []
+    model_value.add_value_changed_listener(lambda callback, source: events.append((callback.old_value, callback.new_value)))
+    return events
+
+
+def test_absolute_and_percent_deadband():
+    root = ModelDevice("Root")
+    current = Variant("Current", root, 0.0, ValueDataType.Float, value_filter = DeadbandFilter(absolute = 0.5))
+    temperature = TemperatureSensor("Temperature", root, value_filter = DeadbandFilter(percent = 10))
+    temperature.value = 20.0
+    current_events, temperature_events = record(current), record(temperature)
+
+    for v in (0.2, 0.4, 0.6, 0.9, 1.2):
+        current.value = v
+    for v in (21.0, 22.5, 23.0):
+        temperature.value = v
+
+    assert current.value == 1.2
+    assert current_events == [(0.0, 0.6), (0.6, 1.2)]
+    assert temperature_events == [(20.0, 22.5)]
+    assert (current.value_filter.passed, current.value_filter.suppressed) == (2, 3)
+
+
+def test_min_interval_and_pattern():
+    clock = SimulationClock(as_fast_as_possible = True)
+    root = ModelDevice("Root")
+    area = ModelDevice("Area", root)
+    positions = [Variant(c + "/BoxPosition", area, 0.0, ValueDataType.Float) for c in ("C1", "C2")]
+    Variant("C1/BoxId", area, "")
+
+    assert apply_filter(root, "Area/*/BoxPosition", DeadbandFilter(min_interval = 1.0, clock = clock)) == positions
+
+    events = record(positions[0])
+    for i in range(1, 21):
+        positions[0].value = i * 10.0
+        clock.sleep(0.25)
+
+    assert events == [(0.0, 10.0), (10.0, 50.0), (50.0, 90.0), (90.0, 130.0), (130.0, 170.0)]
+    assert filter_statistics(root) == {"values": 2, "passed": 5, "suppressed": 15, "suppressed_ratio": 0.75}
+
+
+def test_rejected_change_does_not_restart_interval():
+    clock = SimulationClock(as_fast_as_possible = True)
+    current = Variant("Current", ModelDevice("Root"), 0.0, ValueDataType.Float,
+                      value_filter = DeadbandFilter(absolute = 1.0, min_interval = 1.0, clock = clock))
+    events = record(current)
+
+    current.value = 0.1
+    clock.sleep(0.5)
+    current.value = 5.0
+
+    assert events == [(0.0, 5.0)]
+
+
+def test_last_suppressed_change_is_flushed_after_tick():
+    from iomodel.common.base import ModelObject
+    from iomodel.common.runner import ModelRunner
+
+    class Ramp(ModelObject):
+        def __init__(self, current):
+            super().__init__("Ramp")
+            self.current = current
+
+        def loop(self, tick):
+            if self.current.value < 1.0:
+                self.current.value = round(self.current.value + 0.2, 1)
+
+    clock = SimulationClock(as_fast_as_possible = True, start_time = 0)
+    current = Variant("Current", ModelDevice("Root"), 0.0, ValueDataType.Float,
+                      value_filter = DeadbandFilter(absolute = 0.5, min_interval = 2.0, clock = clock))
+    events = record(current)
+    runner = ModelRunner(1.0, clock = clock)
+    runner.add_model_object(Ramp(current))
+
+    runner.run_for(4)
+    assert events == [(0.0, 0.6)]
+    assert current.value_filter.pending
+
+    runner.run_for(3)
+    assert events == [(0.0, 0.6), (0.6, 1.0)]
+    assert not current.value_filter.pending
@@ -0,0 +1,103 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant
+from iomodel.common.clock import SimulationClock
+from iomodel.common.history import ValueHistory, HistoryRecorder
+
+
+def test_ring_buffer_wraps_and_reads_windows():
+    history = ValueHistory(4, ValueDataType.Float)
+
+    for i in range(6):
+        history.append(float(i), i * 10.0)
+
+    segments = history.segments()
+    assert [type(times) for times, values in segments] == [memoryview, memoryview]
+    assert history.to_list() == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0), (5.0, 50.0)]
+    assert history.to_list(3.0, 4.5) == [(3.0, 30.0), (4.0, 40.0)]
+    assert history.latest() == (5.0, 50.0)
+    assert history.size == 64
+
+    ints = ValueHistory(2, ValueDataType.Int)
+    ints.append(0.0, 1)
+    ints.append(1.0, 1.5)
+    assert ints.to_list() == [(0.0, 1), (1.0, 1.5)]
+
+
+def test_recorder_by_pattern_within_memory_limit():
+    clock = SimulationClock(as_fast_as_possible = True, start_time = 1000)
+    root = ModelDevice("Root")
+    area = ModelDevice("Area", root)
+    currents = [Variant(c + "/Drive/Current", area, 0.0, ValueDataType.Float) for c in ("C1", "C2")]
+    Variant("C1/BoxId", area, "", ValueDataType.String)
+
+    recorder = HistoryRecorder(root, memory_limit = 1000, clock = clock)
+    assert recorder.enable("**/Drive/Current", 10) == currents
+    assert recorder.memory == 320
+
+    with pytest.raises(Exception, match = "limit"):
+        recorder.enable("**", 100)
+    assert len(recorder) == 2
+
+    for i in range(3):
+        clock.sleep(1)
+        currents[0].value = float(i + 1)
+
+    assert recorder["Area/C1/Drive/Current"].to_list() == [(1001.0, 1.0), (1002.0, 2.0), (1003.0, 3.0)]
+    assert len(recorder.history(currents[1])) == 0
+
+    recorder.disable("**/Drive/Current")
+    currents[0].value = 5.0
+    assert recorder.history(currents[0]) is None
+    assert recorder.memory == 0
+
+
+def test_booleans_and_values_added_after_enable_are_recorded():
+    clock = SimulationClock(as_fast_as_possible = True, start_time = 1000)
+    root = ModelDevice("Root")
+    area = ModelDevice("Area", root)
+    Variant("C1/Drive/Current", area, 0.0, ValueDataType.Float)
+
+    recorder = HistoryRecorder(root, memory_limit = 300, clock = clock)
+    recorder.enable("**/Drive/*", 10)
+    recorder.enable("**/Drive/Current", 5)
+
+    running = Variant("C2/Drive/Running", area, False, ValueDataType.Boolean)
+    current = Variant("C2/Drive/Current", area, 0.0, ValueDataType.Float)
+    clock.sleep(1)
+    running.value = True
+    current.value = 2.0
+    current.value = 3.0
+
+    assert recorder["Area/C2/Drive/Running"].to_list() == [(1001.0, True)]
+    assert recorder["Area/C2/Drive/Running"].latest() == (1001.0, True)
+    assert recorder["Area/C2/Drive/Current"].to_list() == [(1001.0, 2.0), (1001.0, 3.0)]
+    assert recorder["Area/C2/Drive/Current"].depth == 5
+    assert recorder.memory == 80 + 90 + 80
+
+    # no room left for another history
+    late = Variant("C3/Drive/Current", area, 0.0, ValueDataType.Float)
+    late.value = 1.0
+    assert recorder.history(late) is None
+
+    # still matched by "**/Drive/*", recorded again with its depth
+    recorder.disable("**/Drive/Current")
+    assert recorder.memory == 90
+    current.value = 4.0
+    assert recorder["Area/C2/Drive/Current"].to_list() == [(1001.0, 4.0)]
+    assert recorder.memory == 90 + 160
+
+    # same depth, the history is kept; its list fallback is not charged
+    recorder.enable("**/Running", 10)
+    running.value = "Fault"
+    recorder.disable("**/Running")
+    assert recorder["Area/C2/Drive/Running"].to_list() == [(1001.0, "Fault")]
+    assert recorder.memory == 90 + 160
+
+    recorder.disable("**/Drive/*")
+    assert len(recorder) == 0 and recorder.memory == 0
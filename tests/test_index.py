@@ -0,0 +1,74 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant
+from iomodel.common.index import ModelIndex
+
+
+def build_area(name, parent, conveyors):
+    area = ModelDevice(name, parent)
+    for c in conveyors:
+        Variant(c + "/Drive/Current", area, 0.0, ValueDataType.Float)
+        Variant(c + "/Drive/CurrentSpeed", area, 0, ValueDataType.Int)
+        Variant(c + "/BoxId", area, "", ValueDataType.String)
+    return area
+
+
+def test_exact_prefix_and_glob_queries():
+    plant = ModelDevice("Plant")
+    build_area("3_A3", plant, ["CX331", "CX332"])
+    index = ModelIndex(plant)
+
+    current = index["3_A3/CX331/Drive/Current"]
+    assert current.qualified_name == "CX331/Drive/Current"
+    assert index.path_of(current) == "3_A3/CX331/Drive/Current"
+    assert index.get("3_A3/CX331/Drive") is None
+    assert index.get("3_A3").name == "3_A3"
+
+    assert [v.qualified_name for v in index.find("3_A3/CX331/")] == \
+        ["CX331/Drive/Current", "CX331/Drive/CurrentSpeed", "CX331/BoxId"]
+    assert [index.path_of(v) for v in index.glob("**/Drive/Current")] == \
+        ["3_A3/CX331/Drive/Current", "3_A3/CX332/Drive/Current"]
+    assert len(index.glob("*/CX33?/Drive/*")) == 4
+    assert index.glob("*", devices = True) == [index["3_A3"]]
+
+
+def test_index_follows_add_child():
+    plant = ModelDevice("Plant")
+    index = ModelIndex(plant)
+    area = build_area("4_A4", plant, ["CX441"])
+    Variant("CX442/BoxId", area, "", ValueDataType.String)
+    build_area("Lift", area, ["Conv"])
+
+    assert len(index.find("4_A4")) == 7
+    assert "4_A4/CX442/BoxId" in index
+    assert "4_A4/Lift/Conv/Drive/Current" in index
+
+
+def test_pattern_subscriptions_match_values_added_later():
+    plant = ModelDevice("Plant")
+    area = ModelDevice("A1", plant)
+    first = Variant("211/Drive/Current", area, 0.0, ValueDataType.Float)
+    Variant("211/Drive/Speed", area, 0)
+    changes = []
+
+    by_glob = plant.subscribe("**/Drive/Current", lambda source, old_value, new_value: changes.append(("glob", source, new_value)))
+    by_regex = plant.subscribe(r"A\d/2\d\d/Drive/.*", lambda source, old_value, new_value: changes.append(("regex", source, new_value)), regex = True)
+
+    later = Variant("212/Drive/Current", area, 0.0, ValueDataType.Float)
+    area2 = ModelDevice("A2", plant)
+    Variant("311/Drive/Current", area2, 0.0, ValueDataType.Float).value = 1.0
+
+    first.value = 1.0
+    later.value = 2.0
+    assert changes == [("glob", area2.children[0], 1.0),
+                       ("glob", first, 1.0), ("regex", first, 1.0),
+                       ("glob", later, 2.0), ("regex", later, 2.0)]
+    assert len(by_regex.values) == 3
+
+    by_glob.cancel()
+    by_regex.cancel()
+    first.value = 3.0
+    assert len(changes) == 5
@@ -0,0 +1,71 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ModelObject, ValueDataType
+from iomodel.common.components import Variant
+from iomodel.common.clock import SimulationClock
+from iomodel.common.runner import ModelRunner
+from iomodel.common.util_filter import DeadbandFilter
+
+
+class Mover(ModelObject):
+
+    def __init__(self, position, current):
+        super().__init__("Mover")
+        self.position = position
+        self.current = current
+
+    def loop(self, tick):
+        self.position.value += 1.0
+        self.position.value += 1.0
+        self.current.value += 0.1
+
+
+def test_cursors_read_changes_of_the_runner():
+    clock = SimulationClock(as_fast_as_possible = True, start_time = 0)
+    root = ModelDevice("Root")
+    position = Variant("Position", root, 0.0, ValueDataType.Float)
+    current = Variant("Current", root, 0.0, ValueDataType.Float, value_filter = DeadbandFilter(absolute = 1.0))
+
+    runner = ModelRunner(1.0, clock = clock)
+    runner.add_model_object(Mover(position, current))
+    journal = runner.enable_journal(retained_ticks = 2)
+    every_tick, slow = journal.cursor(), journal.cursor()
+
+    runner.run_for(1)
+    assert every_tick.read() == [(position, 0.0, 1.0, 1.0), (position, 1.0, 2.0, 1.0)]
+
+    runner.run_for(2)
+    assert every_tick.read(coalesce = True) == [(position, 2.0, 6.0, 3.0)]
+
+    # changes outside of the runner are not journaled
+    position.value = 0.0
+    assert every_tick.read() == []
+
+    runner.run_for(1)
+    changes = slow.read()
+    assert slow.lost == 2
+    assert [(c[1], c[2]) for c in changes] == [(4.0, 5.0), (5.0, 6.0), (0.0, 1.0), (1.0, 2.0)]
+    assert changes[-1][3] == 4.0
+    # only changes passing the value filter are journaled
+    assert [c for c in every_tick.read() if c[0] is current] == []
+    assert len(journal) == 4
+
+
+def test_journal_is_deactivated_after_step():
+    from iomodel.common import base
+
+    root = ModelDevice("Root")
+    position = Variant("Position", root, 0.0, ValueDataType.Float)
+    runner = ModelRunner(1.0, clock = SimulationClock(as_fast_as_possible = True))
+    runner.add_model_object(Mover(position, Variant("Current", root, 0.0, ValueDataType.Float)))
+    cursor = runner.enable_journal().cursor()
+
+    runner.step()
+    assert len(cursor.read()) == 3
+
+    for i in range(5):
+        position.value = -i - 1.0
+    assert cursor.read() == []
+    assert base._journals_active == 0
@@ -0,0 +1,74 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+
+import pytest
+
+from iomodel.common.base import ValueDataType
+from iomodel.common.components import Switch, VariantDataMap
+from iomodel.common.loader import ModelLoader, CACHE_DIRECTORY
+
+
+SPEC = {
+    "templates": {
+        "Errors": [{"name": "ErrorActive", "initial": False, "datatype": "Boolean"},
+                   {"name": "ChildErrors", "class": "VariantDataMap",
+                    "columns": [["Reference Designation", "String"], ["Error MSG", "String"]]}],
+        "Conveyor": [{"name": "Photoeye", "class": "Switch"},
+                     {"name": "ReferenceDesignation", "initial": "", "datatype": "String"},
+                     {"include": "Errors", "prefix": "Drive/"}]
+    },
+    "model": {
+        "name": "Plant",
+        "children": [
+            {"name": "1_A1", "children": [
+                {"name": "Type", "initial": "Area", "datatype": "String"},
+                {"template": "Conveyor", "prefixes": ["211/", "212/"], "values": {"ReferenceDesignation": "S1-A1"}}
+            ]}
+        ]
+    }
+}
+
+
+def write(tmp_path, spec, name = "plant.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+def test_load_builds_tree_and_uses_cache(tmp_path):
+    path = write(tmp_path, SPEC)
+    loader = ModelLoader()
+
+    plant = loader.load(path)
+    area = plant.children[0]
+    names = [v.qualified_name for v in area.children]
+
+    assert names == ["Type", "211/Photoeye", "211/ReferenceDesignation", "211/Drive/ErrorActive",
+                     "211/Drive/ChildErrors", "212/Photoeye", "212/ReferenceDesignation",
+                     "212/Drive/ErrorActive", "212/Drive/ChildErrors"]
+    assert isinstance(area.children[1], Switch)
+    assert isinstance(area.children[4], VariantDataMap)
+    assert area.children[4].columns[1] == ("Error MSG", ValueDataType.String)
+    assert area.children[6].value == "S1-A1"
+    assert len(os.listdir(tmp_path / CACHE_DIRECTORY)) == 1
+
+    # a cached compiled form is used without parsing the spec again
+    loader._parse = None
+    cached = loader.load(path)
+    assert [v.qualified_name for v in cached.children[0].children] == names
+
+
+def test_invalid_spec_is_rejected(tmp_path):
+    loader = ModelLoader(use_cache = False)
+
+    with pytest.raises(Exception, match = "Unknown template"):
+        loader.load(write(tmp_path, {"model": {"name": "P", "children": [{"template": "X"}]}}))
+
+    with pytest.raises(Exception, match = "is no ModelValue"):
+        loader.load(write(tmp_path, {"model": {"name": "P", "children": [{"name": "V", "class": "ModelDevice"}]}}))
+
+    with pytest.raises(Exception, match = "Unknown datatype"):
+        loader.load(write(tmp_path, {"model": {"name": "P", "children": [{"name": "V", "datatype": "Real"}]}}))
@@ -0,0 +1,232 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelObject
+from iomodel.common.runner import ModelRunner, OverrunPolicy
+from iomodel.common.clock import SimulationClock
+
+
+class Counter(ModelObject):
+
+    def __init__(self, duration = 0.0):
+        super().__init__("Counter")
+        self.count = 0
+        self.duration = duration
+
+    def loop(self, tick):
+        self.count += 1
+        self.tick = tick
+        if self.duration:
+            time.sleep(self.duration)
+
+
+def test_loop_forever_keeps_period():
+    runner = ModelRunner(0.005)
+    counter = Counter()
+    runner.add_model_object(counter)
+
+    runner.start_loop()
+    time.sleep(0.2)
+    runner.stop_loop()
+
+    # overruns depend on the wake ups of the host, see the next test
+    assert runner.statistics.ticks >= 30
+    assert runner.statistics.jitter_mean < 0.005
+
+
+class OvershootClock(SimulationClock):
+    """
+    As fast as possible clock waking up a fixed time after each deadline
+    """
+    def __init__(self, overshoot):
+        super().__init__(as_fast_as_possible = True, start_time = 0)
+        self.overshoot = overshoot
+
+    def sleep_until(self, deadline, spin_threshold = 0.0):
+        super().sleep_until(deadline + self.overshoot, spin_threshold)
+
+
+def test_late_wake_up_within_period_is_no_overrun():
+    runner = ModelRunner(0.005, clock = OvershootClock(0.004))
+    counter = Counter()
+    runner.add_model_object(counter)
+
+    runner.run_for(1)
+
+    assert counter.count == 200
+    assert runner.statistics.overruns == 0
+    assert abs(runner.statistics.jitter_mean - 0.004) < 1e-9
+
+    runner = ModelRunner(0.005, clock = OvershootClock(0.006))
+    runner.add_model_object(Counter())
+    runner.run_for(1)
+
+    assert runner.statistics.overruns > 0
+
+
+def test_overrun_skip_counts_missed_ticks():
+    runner = ModelRunner(0.01, OverrunPolicy.Skip)
+    runner.add_model_object(Counter(0.025))
+
+    runner.start_loop()
+    time.sleep(0.2)
+    runner.stop_loop()
+
+    assert runner.statistics.overruns > 0
+    assert runner.statistics.skipped >= runner.statistics.overruns
+
+
+def test_overrun_stretch_skips_nothing():
+    runner = ModelRunner(0.01, OverrunPolicy.Stretch)
+    runner.add_model_object(Counter(0.015))
+
+    runner.start_loop()
+    time.sleep(0.1)
+    runner.stop_loop()
+
+    assert runner.statistics.overruns > 0
+    assert runner.statistics.skipped == 0
+
+
+def test_run_for_as_fast_as_possible():
+    clock = SimulationClock(as_fast_as_possible = True, start_time = 0)
+    runner = ModelRunner(0.1, clock = clock)
+    counter = Counter()
+    runner.add_model_object(counter)
+
+    start = time.monotonic()
+    runner.run_for(3600)
+
+    assert counter.count == 36000
+    assert clock.monotonic() == 3600
+    assert clock.time_ms() == 3600000
+    assert time.monotonic() - start < 10
+
+
+def test_scaled_clock_runs_faster():
+    clock = SimulationClock(time_scale = 10)
+    runner = ModelRunner(0.1, clock = clock)
+    counter = Counter()
+    runner.add_model_object(counter)
+
+    start = time.monotonic()
+    runner.run_for(1)
+
+    assert counter.count == 10
+    assert time.monotonic() - start < 0.5
+
+
+def test_task_groups_run_at_their_period():
+    clock = SimulationClock(as_fast_as_possible = True)
+    runner = ModelRunner(0.1, clock = clock)
+    fast, medium, slow = Counter(), Counter(), Counter()
+    runner.add_model_object(slow, period = 5)
+    runner.add_model_object(medium)
+    runner.add_model_object(fast, period = 0.01)
+
+    runner.run_for(10)
+
+    assert [g.period for g in runner.task_groups] == [0.01, 0.1, 5]
+    assert (fast.count, medium.count, slow.count) == (1000, 100, 2)
+    assert (fast.tick, medium.tick, slow.tick) == (0.01, 0.1, 5)
+    assert runner.task_groups[0].statistics.ticks == 1000
+    assert runner.statistics.ticks == 100
+
+
+def test_async_runner_shares_the_event_loop():
+    import asyncio
+    from iomodel.common.runner import AsyncModelRunner
+
+    clock = SimulationClock(as_fast_as_possible = True)
+    runner = AsyncModelRunner(0.1, clock = clock)
+    counter = Counter()
+    runner.add_model_object(counter)
+    other = []
+
+    async def other_task():
+        while counter.count < 100:
+            other.append(counter.count)
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(runner.run(10), other_task())
+
+    asyncio.run(main())
+
+    assert counter.count == 100
+    assert len(other) > 10
+
+
+def test_profiler_records_objects_by_qualified_path():
+    from iomodel.common.base import ModelDevice
+    from iomodel.common.components import Switch
+    from iomodel.common.profiling import TickProfiler
+
+    class Slow(ModelDevice):
+
+        def loop(self, tick):
+            super().loop(tick)
+            time.sleep(0.002)
+
+    plant = ModelDevice("Plant")
+    area = Slow("Area", plant)
+    Switch("Conv/Photoeye", area).set_callback(lambda: True)
+
+    runner = ModelRunner(0.1, clock = SimulationClock(as_fast_as_possible = True))
+    runner.add_model_object(plant)
+    runner.profiler = TickProfiler(sample_interval = 5)
+    runner.run_for(10)
+
+    profiler = runner.profiler
+    assert profiler.sampled_ticks == 20
+    assert [p.name for p in profiler.top(2)] == ["Plant/Area", "Plant/Area/Conv/Photoeye"]
+    assert profiler.top(1)[0].calls == 20
+    assert sum(profiler.top(1)[0].histogram) == 20
+    assert "Plant/Area" in profiler.report()
+    assert len(profiler.dump()["profiles"]) == 2
+
+
+def test_profiler_samples_every_task_group_by_its_own_ticks():
+    from iomodel.common.profiling import TickProfiler
+
+    runner = ModelRunner(0.1, clock = SimulationClock(as_fast_as_possible = True))
+    fast = Counter()
+    slow = Counter()
+    runner.add_model_object(fast, 0.1)
+    runner.add_model_object(slow, 1.0)
+    # every 11th tick of both groups together would only hit slow
+    runner.profiler = TickProfiler(sample_interval = 11)
+    runner.run_for(11)
+
+    assert (fast.count, slow.count) == (110, 11)
+    assert runner.profiler.sampled_ticks == 10 + 1
+    assert sorted(p.calls for p in runner.profiler.profiles()) == [1, 10]
+
+
+def test_batch_ticks_fire_once_per_tick():
+    from iomodel.common.base import ModelDevice
+    from iomodel.common.components import Variant
+
+    class Mover(ModelObject):
+
+        def __init__(self, position):
+            super().__init__("Mover")
+            self.position = position
+
+        def loop(self, tick):
+            self.position.value = self.position.value + 1.0
+            self.position.value = self.position.value + 1.0
+
+    root = ModelDevice("Root")
+    position = Variant("Position", root, 0.0)
+    events = []
+    position.add_value_changed_listener(lambda callback, source: events.append(callback.new_value))
+
+    runner = ModelRunner(0.1, clock = SimulationClock(as_fast_as_possible = True))
+    runner.add_model_object(Mover(position))
+    runner.batch_ticks = True
+    runner.run_for(0.3)
+
+    assert events == [2.0, 4.0, 6.0]
@@ -0,0 +1,106 @@
+import os
+import sys
+import random
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant, CommandToggle
+from iomodel.common.base import ValueAccess
+from iomodel.common.clock import SimulationClock
+from iomodel.common.runner import ModelRunner
+from iomodel.common.sharding import ShardedModelRunner
+
+
+class Area(ModelDevice):
+
+    def __init__(self, name, step = None):
+        super().__init__(name)
+        self.step = step
+        self.infeed = Variant("Infeed", self, 0, ValueDataType.Int)
+        self.outfeed = Variant("Outfeed", self, 0, ValueDataType.Int)
+        self.enable = CommandToggle("Conv/Cmd_Enable_Toggle", self, True)
+        self.drive = ModelDevice("Drive", self)
+        self.position = Variant("Position", self.drive, 0, ValueDataType.Int)
+
+    def loop(self, tick):
+        super().loop(tick)
+        if self.enable.value:
+            self.position.value = self.position.value + (self.step or random.randint(1, 100))
+        self.outfeed.value = self.infeed.value + self.position.value
+
+
+def build_area(name, step = None):
+    return Area(name, step)
+
+
+class LinkedPlant(ModelDevice):
+    """
+    Unsharded plant, the link copies the outfeed of the previous tick
+    """
+    def loop(self, tick):
+        self.children[1].infeed.value = self.children[0].outfeed.value
+        super().loop(tick)
+
+
+def record(runner, a1, a2, history):
+    for tick in range(20):
+        if tick == 10:
+            assert a1.children[2].update_request(False) == ValueAccess.OK
+            assert a1.children[0].update_request(1000) == ValueAccess.DENIED
+        runner.step()
+        history.append([v.value for v in (a1.children[1], a1.children[3].children[0], a2.children[0], a2.children[1])])
+
+
+def run(processes, step = None):
+    runner = ShardedModelRunner(1, seed = 7, processes = processes, clock = SimulationClock(as_fast_as_possible = True))
+    plant = ModelDevice("Plant")
+    a1 = runner.add_shard(plant, build_area, "A1", step)
+    a2 = runner.add_shard(plant, build_area, "A2", step)
+    runner.add_link(a1.children[1], a2.children[0])
+
+    history = []
+    try:
+        record(runner, a1, a2, history)
+    finally:
+        runner.close()
+    return plant, history
+
+
+def run_unsharded(step):
+    runner = ModelRunner(1, clock = SimulationClock(as_fast_as_possible = True))
+    plant = LinkedPlant("Plant")
+    a1, a2 = build_area("A1", step), build_area("A2", step)
+    plant.add_child(a1)
+    plant.add_child(a2)
+    runner.add_model_object(plant)
+
+    history = []
+    record(runner, a1, a2, history)
+    return history
+
+
+def test_shard_copy_has_structure_of_the_shard():
+    plant, history = run(False)
+
+    area = plant.children[0]
+    assert [c.qualified_name for c in plant.children] == ["A1", "A2"]
+    assert [c.qualified_name for c in area.children] == ["Infeed", "Outfeed", "Conv/Cmd_Enable_Toggle", "Drive"]
+    assert area.children[3].children[0].qualified_name == "Position"
+
+
+def test_processes_match_single_process_tick_for_tick():
+    _, single = run(False)
+    _, sharded = run(True)
+
+    assert single == sharded
+    # the update request stops the position of A1 after tick 10
+    assert single[11][1] == single[19][1]
+    # the link delivers the outfeed of A1 one tick later
+    assert single[5][2] == single[4][0]
+
+
+def test_sharded_run_matches_unsharded_runner():
+    _, sharded = run(True, step = 7)
+
+    assert run_unsharded(7) == sharded
+    assert sharded[19][1] == 10 * 7
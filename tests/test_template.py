@@ -0,0 +1,130 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice, ValueDataType
+from iomodel.common.components import Variant, VariantDataMap, Switch
+from iomodel.common.index import ModelIndex
+from iomodel.common.template import DeviceTemplate
+from iomodel.common.util_filter import DeadbandFilter
+
+
+def make_template():
+    errors = DeviceTemplate("ErrorHandler")
+    errors.add(Variant, "ErrorActive", False, ValueDataType.Boolean)
+    errors.add(VariantDataMap, "ChildErrors", [("Reference Designation", ValueDataType.String), ("Error MSG", ValueDataType.String)])
+
+    conveyor = DeviceTemplate("Conveyor")
+    conveyor.add(Variant, "Drive/Current", 0.0, ValueDataType.Float, value_filter = DeadbandFilter(absolute = 0.5))
+    conveyor.add(Switch, "Photoeye", False, False)
+    conveyor.include(errors, "Drive/")
+    return conveyor
+
+
+def test_stamped_values_share_metadata_only():
+    template = make_template()
+    area = ModelDevice("Area")
+    index = ModelIndex(area)
+
+    first = template.stamp(area, "211/")
+    second = template.stamp(area, "212/")
+
+    assert template.names == ["Drive/Current", "Photoeye", "Drive/ErrorActive", "Drive/ChildErrors"]
+    assert [v.qualified_name for v in second] == ["212/Drive/Current", "212/Photoeye", "212/Drive/ErrorActive", "212/Drive/ChildErrors"]
+    assert area.children == first + second
+    assert index["212/Drive/ChildErrors"] is second[3]
+    assert all(v.parent is area for v in first)
+
+    maps = (first[template.position("Drive/ChildErrors")], second[3])
+    assert maps[0].columns is maps[1].columns
+    maps[0].set_entry("K1", ("K1", "Jam"))
+    assert maps[0].map_count == 1 and maps[1].map_count == 0
+    assert maps[1].value == []
+
+    events = []
+    first[0].add_value_changed_listener(lambda callback, source: events.append(source))
+    first[0].value = 0.2
+    first[0].value = 1.0
+    second[0].value = 1.0
+    assert events == [first[0]]
+    assert first[0].value_filter is not second[0].value_filter
+
+
+def test_instantiate_device_and_from_device():
+    template = make_template()
+    plant = ModelDevice("Plant")
+    conveyor = template.instantiate("211", plant)
+
+    assert conveyor.parent is plant
+    assert conveyor.children[0].qualified_name is template.names[0]
+
+    conveyor.children[1].value = True
+    copy = DeviceTemplate.from_device(conveyor).instantiate("212", plant)
+    assert copy.children[1].value is True
+    assert copy.children[1].datatype == ValueDataType.Boolean
+
+
+def test_stamped_sensors_behave_independently():
+    from iomodel.common.components import TemperatureSensor
+
+    template = DeviceTemplate("Oven")
+    template.add(TemperatureSensor, "Temperature", 0.0, 100, 2)
+    area = ModelDevice("Area")
+    first = template.stamp(area, "1/")[0]
+    second = template.stamp(area, "2/")[0]
+
+    assert first._pt1 is not second._pt1
+    first.heat()
+    for _ in range(10):
+        first.loop(0.5)
+        second.loop(0.5)
+
+    assert first.value > 80
+    assert second.value == 0
+    second.heat()
+    second.loop(0.5)
+    assert second.value < first.value
+
+
+def test_stamp_from_column_bound_device():
+    from iomodel.common.columnar import ColumnStore
+
+    plant = ModelDevice("Plant")
+    conveyor = make_template().instantiate("211", plant)
+    conveyor.children[0].value = 150.0
+    ColumnStore(plant)
+
+    template = DeviceTemplate.from_device(conveyor)
+    first = template.instantiate("212", plant)
+    second = template.instantiate("213", plant)
+    first.children[0].value = 300.0
+
+    assert type(first.children[0]) is Variant
+    assert second.children[0].value == 150.0
+    assert conveyor.children[0].value == 150.0
+
+
+def test_lazy_instance_creates_values_on_first_use():
+    template = make_template()
+    plant = ModelDevice("Plant")
+    conveyor = template.instantiate("211", plant, lazy = True, initials = {0: 2.0})
+    current = conveyor.value(0)
+
+    assert not conveyor.created
+    assert conveyor.value(0) is current and current.parent is conveyor
+    assert (current.value, current.initial) == (2.0, 2.0)
+
+    # only the photoeye has an own loop
+    plant.loop(1)
+    assert [v is not None for v in conveyor._values] == [True, True, False, False]
+
+    photoeye = conveyor.value(1)
+    assert conveyor.children[0:2] == [current, photoeye]
+    assert conveyor.created
+    assert [v.qualified_name for v in conveyor.children] == template.names
+    assert plant.loop_schedule == [photoeye]
+
+    index = ModelIndex(plant)
+    assert index["211/Drive/ErrorActive"] is conveyor.value(2)
+    Variant("Extra", conveyor, 0)
+    assert len(conveyor.children) == 5
@@ -0,0 +1,36 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from iomodel.common.base import ModelDevice
+from iomodel.common.components import Variant
+from iomodel.common.versioning import enable_versioning, disable_versioning
+
+
+def test_changes_since_returns_changed_values_once():
+    root = ModelDevice("Root")
+    other = ModelDevice("Other")
+    a = Variant("A", root, 0)
+    b = Variant("B", root, 0)
+    c = Variant("C", other, 0)
+
+    generations = enable_versioning()
+    try:
+        generation, values = generations.snapshot(root)
+        assert values == [(a, 0), (b, 0)]
+
+        b.value = 1
+        a.value = 1
+        b.value = 2
+        c.value = 1
+
+        current, changes = generations.changes_since(generation, root)
+        assert changes == [(a, 1), (b, 2)]
+        assert generations.generation_of(b) == current - 1
+        assert generations.generation_of(a) > generation
+
+        assert generations.changes_since(current, root) == (current, [])
+        a.set_value_silent(5)
+        assert generations.changes_since(current) == (current + 1, [(a, 5)])
+    finally:
+        disable_versioning()